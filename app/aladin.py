@@ -0,0 +1,125 @@
+import os
+import time
+import random
+import asyncio
+import httpx
+from dotenv import load_dotenv
+from app import metrics
+
+load_dotenv()
+ALADIN_TTB_KEY = os.getenv("ALADIN_API_KEY")
+ALADIN_BASE_URL = os.getenv("ALADIN_BASE_URL", "http://www.aladin.co.kr/ttb/api")  # 벤치마크 시 가짜 서버로 교체
+
+# 타임아웃/재시도/커넥션 풀/호출 속도 제한 설정
+ALADIN_TIMEOUT = float(os.getenv("ALADIN_TIMEOUT", "3"))
+ALADIN_CONNECT_TIMEOUT = float(os.getenv("ALADIN_CONNECT_TIMEOUT", "2"))
+ALADIN_MAX_RETRIES = int(os.getenv("ALADIN_MAX_RETRIES", "2"))
+ALADIN_RETRY_BASE = float(os.getenv("ALADIN_RETRY_BASE", "0.2"))
+ALADIN_MAX_CONNECTIONS = int(os.getenv("ALADIN_MAX_CONNECTIONS", "20"))
+ALADIN_RATE_PER_SEC = float(os.getenv("ALADIN_RATE_PER_SEC", "10"))  # 클라이언트 측 초당 호출 상한
+ALADIN_RATE_BURST = int(os.getenv("ALADIN_RATE_BURST", "10"))
+ALADIN_LOOKUP_BATCH = int(os.getenv("ALADIN_LOOKUP_BATCH", "10"))  # ItemLookUp 한 번에 묶을 ISBN 수
+
+
+class TokenBucket:
+    """초당 rate 개의 토큰이 차오르는 버킷. 토큰이 없으면 다음 토큰이 찰 때까지 기다립니다."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AladinClient:
+    """
+    알라딘 TTB API 비동기 클라이언트.
+    keep-alive 커넥션 풀을 공유하고, 호출마다 속도 제한 → 타임아웃 → 지터 재시도를 적용합니다.
+    """
+
+    def __init__(self, base_url: str = ALADIN_BASE_URL, ttb_key: str | None = ALADIN_TTB_KEY,
+                 rate: float = ALADIN_RATE_PER_SEC, burst: int = ALADIN_RATE_BURST):
+        self.base_url = base_url.rstrip("/")
+        self.ttb_key = ttb_key
+        self.limiter = TokenBucket(rate, burst)
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(ALADIN_TIMEOUT, connect=ALADIN_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=ALADIN_MAX_CONNECTIONS,
+                                    max_keepalive_connections=ALADIN_MAX_CONNECTIONS),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, endpoint: str, params: dict, timeout: float | None = None) -> dict:
+        """공통 GET. 네트워크 오류/429/5xx 는 지수 백오프 + full jitter 로 재시도합니다."""
+        params = {"ttbkey": self.ttb_key, "Output": "js", "Version": "20131101", **params}
+        url = f"{self.base_url}/{endpoint}"
+        for attempt in range(ALADIN_MAX_RETRIES + 1):
+            await self.limiter.acquire()
+            try:
+                with metrics.span(f"aladin.{endpoint.removesuffix('.aspx')}"):
+                    res = await self.client.get(url, params=params, timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+                if res.status_code == 429 or res.status_code >= 500:
+                    raise httpx.HTTPStatusError(f"Aladin {res.status_code}", request=res.request, response=res)
+                res.raise_for_status()
+                return res.json()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or \
+                    e.response.status_code == 429 or e.response.status_code >= 500
+                if not retryable or attempt == ALADIN_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(random.uniform(0, ALADIN_RETRY_BASE * (2 ** attempt)))
+
+    async def item_lookup(self, isbns: list, opt_result: str = "usedList") -> list[dict]:
+        """ItemLookUp: ISBN 목록을 ALADIN_LOOKUP_BATCH 단위로 묶어 동시에 조회합니다."""
+        chunks = [isbns[i:i + ALADIN_LOOKUP_BATCH] for i in range(0, len(isbns), ALADIN_LOOKUP_BATCH)]
+        responses = await asyncio.gather(*(
+            self.get("ItemLookUp.aspx", {"ItemId": ",".join(chunk), "ItemIdType": "ISBN13", "OptResult": opt_result})
+            for chunk in chunks
+        ))
+        return [item for data in responses for item in data.get("item", [])]
+
+    async def item_list_page(self, query_type: str, category_id: int, start: int, max_results: int = 50,
+                             timeout: float | None = None, **params) -> dict:
+        """ItemList 원본 응답 (item 과 함께 totalResults 등 페이지 정보 포함)"""
+        return await self.get("ItemList.aspx", {
+            "QueryType": query_type, "MaxResults": max_results, "start": start,
+            "SearchTarget": "Book", "CategoryId": category_id, **params
+        }, timeout=timeout)
+
+    async def item_list(self, query_type: str, category_id: int, start: int, max_results: int = 50,
+                        timeout: float | None = None, **params) -> list[dict]:
+        """ItemList: 베스트셀러/신간 목록 한 페이지"""
+        data = await self.item_list_page(query_type, category_id, start, max_results, timeout, **params)
+        return data.get("item", [])
+
+    async def item_search(self, query: str, max_results: int = 5, **params) -> list[dict]:
+        data = await self.get("ItemSearch.aspx", {
+            "Query": query, "QueryType": "Keyword", "MaxResults": max_results, "SearchTarget": "Book", **params
+        })
+        return data.get("item", [])
+
+
+# 프로세스 전역 공유 클라이언트
+aladin = AladinClient()
@@ -1,18 +1,69 @@
 import os
 import json
+import time
+import asyncio
+import httpx
 from pathlib import Path
-from openai import OpenAI
+from typing import AsyncIterator
+from openai import AsyncOpenAI
 from mcp import ClientSession
 from dotenv import load_dotenv
 from app.api.schemas import ChatMessage
+from app.api.mcp_pool import to_openai_tools
+from app.api.context import build_history, message_tokens
+from app import metrics
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 load_dotenv(dotenv_path=BASE_DIR / ".env")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")  # 벤치마크 시 가짜 서버로 교체
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
 
-client = OpenAI(
+# LLM 호출 타임아웃/재시도/커넥션 풀 설정
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+
+# 한 턴의 도구 호출 병렬 실행 설정 (동시 실행 상한, 도구별 타임아웃)
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))
+TOOL_TIMEOUTS = {"search_books": TOOL_TIMEOUT, "get_details": TOOL_TIMEOUT, "status": 2.0}
+# search_books 결과 형식: compact 는 필드 헤더 + 한 줄에 한 권인 표 (text 는 예전의 장식된 설명형)
+SEARCH_RESULT_FORMAT = os.getenv("SEARCH_RESULT_FORMAT", "compact")
+
+# 멀티스텝 에이전트 루프 예산 (도구 라운드 수, 요청당 전체 시간)
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "3"))
+AGENT_DEADLINE = float(os.getenv("AGENT_DEADLINE", "45"))
+FINAL_ANSWER_GRACE = float(os.getenv("FINAL_ANSWER_GRACE", "10"))  # 예산 소진 후 최종 답변에 허용하는 시간
+# 도구를 부를 수 있는 라운드의 본문은 이 글자 수를 넘을 때까지 모아 두었다가 보냅니다.
+# 도구 호출 앞의 짧은 말("검색해 볼게요")은 답변이 아니므로 그 라운드가 도구를 부르면 버립니다.
+# 넘은 뒤에 도구 호출이 오면 {"type": "reset"} 으로 클라이언트가 받은 본문을 지우게 합니다.
+AGENT_PREAMBLE_CHARS = int(os.getenv("AGENT_PREAMBLE_CHARS", "60"))
+
+# 스트리밍 모드에서 도구 실행 중 사용자에게 보여줄 진행 상태 문구
+TOOL_STATUS_MESSAGES = {
+    "search_books": "📚 책을 검색하고 실시간 가격/재고를 확인하는 중...",
+    "get_details": "📖 도서 상세 정보를 확인하는 중...",
+    "status": "🔧 시스템 상태를 확인하는 중...",
+}
+
+# /metrics 지표: LLM 토큰 수(prompt/completion 은 API usage, prompt_estimate 는 전송 전 추정치), 도구 호출 결과
+LLM_TOKENS = metrics.Counter("llm_tokens_total", "LLM tokens by kind", ("kind",))
+TOOL_CALLS = metrics.Counter("tool_calls_total", "MCP tool calls from the agent", ("tool", "status"))
+
+# 모든 요청이 하나의 커넥션 풀(keep-alive)을 공유합니다.
+http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+)
+
+# 비동기 클라이언트: LLM 응답을 기다리는 동안 이벤트 루프가 다른 /chat 요청을 처리합니다.
+client = AsyncOpenAI(
     api_key=GROQ_API_KEY,  # 1. Groq API 키로 변경
-    base_url="https://api.groq.com/openai/v1"  # 2. Groq 공식 엔드포인트
+    base_url=GROQ_BASE_URL,  # 2. Groq 공식 엔드포인트
+    http_client=http_client,
+    max_retries=LLM_MAX_RETRIES,
 )
 
 # app/api/agent.py
@@ -46,11 +97,15 @@ SYSTEM_PROMPT = """
 각 도구의 역할과 한계를 명확히 이해하고 사용하세요.
 
 - **search_books (목록 검색):** - 여러 권의 책을 추천할 때 사용합니다. 
-    - 책의 핵심 정보(제목, 저자, 가격, 판매지수)만 요약되어 반환됩니다.
+    - 책의 핵심 정보만 표로 반환됩니다. 첫 줄은 열 이름(예: `isbn|title|author|price|used|src|rating|sales|keywords`)이고, 그 아래 한 줄이 한 권입니다.
+    - price 는 새책 가격(원), used 는 알라딘 중고 재고(비어 있으면 정보 없음), src 는 가격 정보의 출처(live/cache 는 실시간, stale 은 API 지연으로 최신이 아닐 수 있음, db 는 수집 시점 값), rating 은 평점(0~10), sales 는 판매지수(50,000 이상 초대박 베스트셀러, 10,000 이상 인기), keywords 는 책 소개의 핵심어입니다.
+    - 필요한 열만 받으려면 `fields`를 지정하세요 (예: 분야가 필요하면 "category", 출간일은 "pub_date").
     - 목차나 서평 같은 깊은 정보가 필요하면 이 도구 결과의 ISBN을 이용해 `get_details`를 호출해야 합니다.
 
 - **get_details (상세 조회):** - 사용자가 특정 책에 대해 "목차를 알려줘", "책 소개 더 자세히 해줘"라고 할 때 사용합니다.
     - **반드시** `search_books`를 통해 얻은 **ISBN**이 있어야 호출할 수 있습니다. (상상해서 넣지 마세요)
+    - 같은 질문 안에서 `search_books` 결과를 받은 뒤 바로 이어서 `get_details`를 호출해도 됩니다. (사용자에게 다시 묻지 마세요)
+    - 여러 권의 상세 정보가 필요하면 `isbns`에 ISBN을 모두 넣어 **한 번만** 호출하세요.
 
 ### [4. 데이터 해석 및 답변 가이드 (필독)]
 도구에서 반환된 데이터를 해석하여 사용자에게 전달할 때는, **반드시 아래 포맷을 엄격하게 준수**하세요.
@@ -75,42 +130,255 @@ SYSTEM_PROMPT = """
 """
 
 
-async def run_ai_agent(user_query: str, chat_history: list[ChatMessage], session: ClientSession) -> str:
+def describe_filters(filters: dict | None) -> str:
+    """필터 → 사람이 읽는 한 줄 (예: "최대 20,000원 · 평점 8.0 이상")"""
+    filters = filters or {}
+    parts = []
+    if filters.get("category_name"): parts.append(f"분야 {filters['category_name']}")
+    if filters.get("max_price"): parts.append(f"최대 {int(filters['max_price']):,}원")
+    if filters.get("min_rating"): parts.append(f"평점 {filters['min_rating']} 이상")
+    if filters.get("min_pub_date"): parts.append(f"{filters['min_pub_date']} 이후 출간")
+    return " · ".join(parts)
+
+
+async def call_tool(session: ClientSession, tool_call: dict, sem: asyncio.Semaphore, deadline: float,
+                    filters: dict | None = None) -> dict:
+    """
+    도구 하나를 타임아웃 안에서 실행합니다. 실패해도 모델에게 돌려줄 tool 메시지를 만듭니다.
+    filters(요청에 담겨 온 사이드바 필터)는 search_books 목록 검색(context)에 기본값으로 합칩니다 (모델이 넣은 값이 우선).
+    제목/저자로 특정 책을 찾는 keyword 검색에는 붙이지 않습니다 (찾는 책이 필터에 걸려 사라지지 않도록).
+    """
+    t_name = tool_call["function"]["name"]
+    timeout = max(0.1, min(TOOL_TIMEOUTS.get(t_name, TOOL_TIMEOUT), deadline - time.perf_counter()))
     try:
-        mcp_tools = await session.list_tools()
-        openai_tools = [{"type": "function",
-                         "function": {"name": t.name, "description": t.description, "parameters": t.inputSchema}} for t
-                        in mcp_tools.tools]
-
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}] + \
-                   [{"role": m.role, "content": m.content} for m in chat_history] + \
-                   [{"role": "user", "content": user_query}]
-
-        response = client.chat.completions.create(
-            # 3. 모델명 변경 (예: llama-3.3-70b-versatile, llama3-70b-8192 등)
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            tools=openai_tools
-        )
-        assistant_msg = response.choices[0].message
-
-        if assistant_msg.tool_calls:
-            messages.append(assistant_msg)
-            for tool_call in assistant_msg.tool_calls:
-                t_name = tool_call.function.name
-                t_args = json.loads(tool_call.function.arguments)
-                print(f"🤖 Tool Call: {t_name} | Args: {t_args}")
+        t_args = json.loads(tool_call["function"]["arguments"] or "{}")
+        if t_name == "search_books" and SEARCH_RESULT_FORMAT:
+            t_args.setdefault("format", SEARCH_RESULT_FORMAT)
+        if t_name == "search_books" and filters and t_args.get("search_type", "context") == "context":
+            t_args["filters"] = {**filters, **(t_args.get("filters") or {})}
+        print(f"🤖 Tool Call: {t_name} | Args: {t_args}")
+        async with sem:
+            # trace id 는 MCP 요청의 _meta 로 넘겨 서버 쪽 span 과 이어지게 합니다
+            with metrics.span(f"tool.{t_name}"):
+                result = await asyncio.wait_for(
+                    session.call_tool(t_name, arguments=t_args, meta={"trace_id": metrics.current_trace_id()}),
+                    timeout)
+        content = result.content[0].text
+        TOOL_CALLS.inc(tool=t_name, status="ok")
+    except asyncio.TimeoutError:
+        print(f"⏱️ Tool Timeout: {t_name} ({timeout}s)")
+        TOOL_CALLS.inc(tool=t_name, status="timeout")
+        content = f"[도구 오류] {t_name} 응답 시간 초과 ({timeout}초). 이 결과 없이 답변하세요."
+    except Exception as e:
+        print(f"⚠️ Tool Error: {t_name} | {e}")
+        TOOL_CALLS.inc(tool=t_name, status="error")
+        content = f"[도구 오류] {t_name} 실행 실패: {e}. 이 결과 없이 답변하세요."
+    return {"role": "tool", "tool_call_id": tool_call["id"], "content": content}
+
+
+async def _run_tool_calls(session: ClientSession, tool_calls: list[dict], deadline: float,
+                          filters: dict | None = None) -> list[dict]:
+    """한 턴의 독립적인 도구 호출들을 동시에 실행합니다 (결과 순서는 호출 순서 유지)."""
+    sem = asyncio.Semaphore(TOOL_CONCURRENCY)
+    return await asyncio.gather(*(call_tool(session, tc, sem, deadline, filters) for tc in tool_calls))
+
+
+def log_timings(timings: list[dict], started: float, ttft_ms: float | None):
+    total_ms = (time.perf_counter() - started) * 1000
+    rounds = " | ".join(
+        f"R{t['round']} llm={t['llm_ms']:.0f}ms tok={t.get('prompt_tokens', 0)} "
+        f"tools={t['tools_ms']:.0f}ms({t['tool_calls']})" for t in timings
+    )
+    ttft = f"{ttft_ms:.0f}ms" if ttft_ms is not None else "-"
+    print(f"⏱️ Agent: total={total_ms:.0f}ms ttft={ttft} | {rounds}")
+    print(f"🧭 {metrics.trace_summary()}")
+
+
+def _count_usage(usage):
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, kind="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens or 0, kind="completion")
 
-                result = await session.call_tool(t_name, arguments=t_args)
-                messages.append({"role": "tool", "tool_call_id": tool_call.id, "content": result.content[0].text})
 
-            final_res = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",  # 👈 여기만 변경!
-                messages=messages
-            )
-            return final_res.choices[0].message.content
+async def complete(messages: list, tools: list | None, timeout: float, stream: bool,
+                   model: str | None = None) -> AsyncIterator[tuple]:
+    """
+    LLM 호출 한 번. ("token", 텍스트) 를 흘려보내고 마지막에 ("message", assistant 메시지 dict) 를 냅니다.
+    stream=True 이면 토큰이 도착하는 대로 전달하고, 조각난 tool_calls 는 index 기준으로 다시 합칩니다.
+    timeout 은 재시도와 스트림 전체를 합친 예산입니다. OpenAI 클라이언트의 timeout 은 시도마다(스트리밍이면 청크 사이)
+    적용되므로, 기다리는 곳마다 남은 시간으로 asyncio.wait_for 를 걸어 넘으면 TimeoutError 를 냅니다.
+    """
+    deadline = time.perf_counter() + timeout
+    kwargs = {"model": model or LLM_MODEL, "messages": messages, "timeout": timeout}
+    if tools is not None:
+        kwargs["tools"] = tools
 
-        return assistant_msg.content
+    def left() -> float:
+        return max(deadline - time.perf_counter(), 0.0)
+
+    if not stream:
+        response = await asyncio.wait_for(client.chat.completions.create(**kwargs), left())
+        _count_usage(response.usage)
+        msg = response.choices[0].message
+        tool_calls = [{"id": tc.id, "type": "function",
+                       "function": {"name": tc.function.name, "arguments": tc.function.arguments}}
+                      for tc in msg.tool_calls or []]
+        if msg.content and not tool_calls:
+            yield "token", msg.content
+        yield "message", {"role": "assistant", "content": msg.content, "tool_calls": tool_calls}
+        return
+
+    content, calls = [], {}
+    # include_usage 를 요청해야 마지막 청크(choices 없음)에 usage 가 옵니다
+    response = await asyncio.wait_for(
+        client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs), left())
+    try:
+        chunks = aiter(response)
+        while True:
+            try:
+                chunk = await asyncio.wait_for(anext(chunks), left())
+            except StopAsyncIteration:
+                break
+            _count_usage(getattr(chunk, "usage", None))
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+                yield "token", delta.content
+            for tc in delta.tool_calls or []:
+                acc = calls.setdefault(tc.index, {"id": "", "type": "function",
+                                                  "function": {"name": "", "arguments": ""}})
+                if tc.id:
+                    acc["id"] = tc.id
+                if tc.function and tc.function.name:
+                    acc["function"]["name"] += tc.function.name
+                if tc.function and tc.function.arguments:
+                    acc["function"]["arguments"] += tc.function.arguments
+    finally:
+        await response.close()  # 예산 초과/중단 시에도 연결을 풀에 돌려줌
+    yield "message", {"role": "assistant", "content": "".join(content) or None,
+                      "tool_calls": [calls[i] for i in sorted(calls)]}
+
+
+async def stream_ai_agent(user_query: str, chat_history: list[ChatMessage], session: ClientSession,
+                          timings: list[dict] | None = None, stream: bool = True,
+                          openai_tools: list[dict] | None = None,
+                          filters: dict | None = None) -> AsyncIterator[dict]:
+    """
+    제한된 에이전트 루프: 모델이 도구를 더 부르지 않을 때까지 (최대 MAX_TOOL_ROUNDS 라운드,
+    AGENT_DEADLINE 초 이내) 도구 호출과 추론을 반복합니다. 라운드별 소요 시간은 timings에 기록됩니다.
+    session 은 ClientSession 또는 MCPSessionPool (call_tool/list_tools 만 사용하므로 풀이면 도구 호출 동안만 세션을 대여).
+    openai_tools 를 넘기면(세션 풀의 캐시) 요청마다 list_tools 를 다시 호출하지 않습니다.
+    filters(구조화된 사이드바 필터)는 모델에게 알려주고 search_books 호출에 그대로 적용합니다.
+
+    이벤트(dict)를 순서대로 내보냅니다:
+    - {"type": "status", "message": ...}  도구 진행 상황
+    - {"type": "token", "content": ...}   최종 답변 토큰
+    - {"type": "reset"}                   지금까지 받은 답변 토큰 버리기 (답변처럼 흘려보낸 말 뒤에 모델이 도구를 부른 경우)
+    - {"type": "done", "ttft_ms": ..., "total_ms": ..., "timings": [...], "error": bool}
+    """
+    started = time.perf_counter()
+    deadline = started + AGENT_DEADLINE
+    timings = [] if timings is None else timings
+    ttft_ms = None
+    failed = False
+    try:
+        if openai_tools is None:
+            openai_tools = to_openai_tools((await session.list_tools()).tools)
+
+        # 이전 대화는 토큰 예산 안으로: 최근 메시지는 원문, 오래된 메시지는 요약 한 건으로
+        history, ctx = build_history([{"role": m.role, "content": m.content} for m in chat_history])
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}] + history
+        if filters:
+            messages.append({"role": "system", "content": f"[사용자 필터] {describe_filters(filters)} "
+                                                          "(search_books 목록 검색에 자동으로 적용됩니다)"})
+        messages.append({"role": "user", "content": user_query})
+        print(f"🧮 Context: history {ctx['messages_in']} msgs → verbatim={ctx['verbatim']} "
+              f"summarized={ctx['summarized']} ({ctx['tokens']} tok)")
+
+        round_no = 0
+        while True:
+            round_no += 1
+            remaining = deadline - time.perf_counter()
+            # 라운드/시간 예산 소진 시: 지금까지의 도구 결과로 최종 답변 생성 (도구 없이)
+            final_only = round_no > MAX_TOOL_ROUNDS or remaining <= 0
+            if final_only and remaining <= 0:
+                print(f"⏱️ Agent deadline reached before round {round_no}")
+
+            t0 = time.perf_counter()
+            assistant_msg = None
+            # 도구를 줄 수 있는 라운드는 본문 앞부분을 모아 둡니다 (AGENT_PREAMBLE_CHARS)
+            held = [] if openai_tools and not final_only else None
+            sent_tokens = False
+            prompt_tokens = message_tokens(messages)  # 턴마다 보내는 토큰 수를 기록
+            async for kind, payload in complete(
+                    messages, None if final_only else openai_tools,
+                    max(remaining, FINAL_ANSWER_GRACE) if final_only else remaining, stream):
+                if kind == "token" and held is not None:
+                    held.append(payload)
+                    if sum(map(len, held)) <= AGENT_PREAMBLE_CHARS:
+                        continue
+                    payload, held = "".join(held), None
+                if kind == "token":
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                    sent_tokens = True
+                    yield {"type": "token", "content": payload}
+                else:
+                    assistant_msg = payload
+            if assistant_msg["tool_calls"] and sent_tokens and not final_only:
+                ttft_ms = None
+                yield {"type": "reset"}
+            elif held and not assistant_msg["tool_calls"]:
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - started) * 1000
+                yield {"type": "token", "content": "".join(held)}
+            llm_ms = (time.perf_counter() - t0) * 1000
+            metrics.record("llm", llm_ms / 1000)
+            LLM_TOKENS.inc(prompt_tokens, kind="prompt_estimate")
+
+            # 모델이 도구를 더 호출하지 않으면 조기 종료
+            if final_only or not assistant_msg["tool_calls"]:
+                timings.append({"round": round_no, "llm_ms": llm_ms, "tools_ms": 0.0, "tool_calls": 0,
+                                "prompt_tokens": prompt_tokens})
+                break
+
+            messages.append(assistant_msg)
+            for tc in assistant_msg["tool_calls"]:
+                yield {"type": "status", "message": TOOL_STATUS_MESSAGES.get(tc["function"]["name"],
+                                                                             f"🔧 {tc['function']['name']} 실행 중...")}
+            t1 = time.perf_counter()
+            # 병렬 실행: 전체 지연 ≈ 가장 느린 도구 하나의 지연
+            messages.extend(await _run_tool_calls(session, assistant_msg["tool_calls"], deadline, filters))
+            timings.append({
+                "round": round_no, "llm_ms": llm_ms, "prompt_tokens": prompt_tokens,
+                "tools_ms": (time.perf_counter() - t1) * 1000, "tool_calls": len(assistant_msg["tool_calls"])
+            })
     except Exception as e:
         print(f"❌ Error: {e}")
-        return "죄송합니다, 처리 중 오류가 발생했습니다."
\ No newline at end of file
+        failed = True
+        yield {"type": "token", "content": "죄송합니다, 처리 중 오류가 발생했습니다."}
+    finally:
+        log_timings(timings, started, ttft_ms)
+    yield {"type": "done", "ttft_ms": ttft_ms, "total_ms": (time.perf_counter() - started) * 1000,
+           "timings": timings, "trace_id": metrics.current_trace_id(), "error": failed}
+
+
+async def run_ai_agent(user_query: str, chat_history: list[ChatMessage], session: ClientSession,
+                       timings: list[dict] | None = None, openai_tools: list[dict] | None = None,
+                       filters: dict | None = None) -> str:
+    """비스트리밍 버전: 같은 에이전트 루프를 돌리고 최종 답변 문자열만 돌려줍니다."""
+    tokens = []
+    async for event in stream_ai_agent(user_query, chat_history, session, timings, stream=False,
+                                       openai_tools=openai_tools, filters=filters):
+        if event["type"] == "token":
+            tokens.append(event["content"])
+        elif event["type"] == "reset":
+            tokens.clear()
+    return "".join(tokens)
+
+
+async def close_client():
+    """공유 HTTP 커넥션 풀을 정리합니다 (API 종료 시 호출)."""
+    await client.close()
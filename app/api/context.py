@@ -0,0 +1,101 @@
+import os
+import re
+import hashlib
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+# 대화 맥락 예산 (시스템 프롬프트를 제외한 이전 대화에 쓸 토큰 수)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "400"))  # 그중 오래된 대화 요약에 쓸 최대 토큰
+CONTEXT_MESSAGE_TOKENS = int(os.getenv("CONTEXT_MESSAGE_TOKENS", "800"))  # 원문으로 남기는 메시지 하나의 최대 토큰
+
+_HANGUL = re.compile(r"[가-힣ㄱ-ㅎㅏ-ㅣ]")
+_BOLD = re.compile(r"\*\*([^*\n]+)\*\*")
+MESSAGE_OVERHEAD = 4  # 메시지마다 붙는 role/구분 토큰
+
+
+def estimate_tokens(text: str | None) -> int:
+    """
+    토크나이저 없이 쓰는 근사치. 한글은 대략 글자당 1토큰, 그 외(영문/숫자/기호)는 4글자당 1토큰으로 셉니다.
+    추세(턴마다 얼마나 늘어나는지)를 보는 용도라 모델별 정확한 값일 필요는 없습니다.
+    """
+    if not text:
+        return 0
+    hangul = len(_HANGUL.findall(text))
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+def message_tokens(messages: list[dict]) -> int:
+    total = 0
+    for m in messages:
+        total += MESSAGE_OVERHEAD + estimate_tokens(m.get("content"))
+        for tc in m.get("tool_calls") or []:
+            total += estimate_tokens(tc["function"]["name"]) + estimate_tokens(tc["function"]["arguments"])
+    return total
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 한글 기준(글자당 1토큰)으로 잘라도 예산을 넘지 않습니다
+    return text[:max_tokens] + " …(생략)"
+
+
+# 메시지 한 건 → 요약 한 줄. 같은 메시지는 매 턴 다시 오므로 캐시해 두고 재사용합니다 (rolling summary).
+_summary_lines: OrderedDict = OrderedDict()
+_SUMMARY_CACHE_MAX = 10000
+
+
+def _summary_line(message: dict) -> str:
+    key = hashlib.blake2b(f"{message['role']}\0{message['content']}".encode(), digest_size=16).digest()
+    line = _summary_lines.get(key)
+    if line is None:
+        content = " ".join((message["content"] or "").split())
+        if message["role"] == "user":
+            line = f"- 사용자: {content[:80]}"
+        else:
+            # 답변에서는 추천한 책 제목(굵게 표시된 부분)만 남깁니다
+            titles = [t.strip() for t in _BOLD.findall(message["content"] or "") if not t.strip().endswith(":")]
+            line = f"  → 추천: {', '.join(dict.fromkeys(titles))[:160]}" if titles else f"  → 답변: {content[:60]}"
+        _summary_lines[key] = line
+        while len(_summary_lines) > _SUMMARY_CACHE_MAX:
+            _summary_lines.popitem(last=False)
+    return line
+
+
+def summarize(messages: list[dict], max_tokens: int = CONTEXT_SUMMARY_TOKENS) -> str | None:
+    """오래된 대화를 한 줄씩 요약합니다. 예산을 넘으면 가장 오래된 줄부터 버립니다."""
+    lines = [_summary_line(m) for m in messages]
+    while lines and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    if not lines:
+        return None
+    return "[이전 대화 요약]\n" + "\n".join(lines)
+
+
+def build_history(history: list[dict], budget: int | None = None) -> tuple[list[dict], dict]:
+    """
+    토큰 예산(기본 CONTEXT_TOKEN_BUDGET) 안의 이전 대화 메시지 목록.
+    최근 메시지부터 원문으로 채우고, 예산을 넘는 오래된 메시지는 요약 한 건(system 메시지)으로 압축합니다.
+    이전 대화는 user/assistant 메시지만 오므로(QueryRequest.history) 이전 질문의 도구 결과는 다시 보내지 않습니다.
+    지금 질문의 도구 결과는 최종 답변의 근거이므로 줄이지 않고 모두 보냅니다.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    kept, used = [], 0
+    verbatim_budget = budget - CONTEXT_SUMMARY_TOKENS if len(history) > 1 else budget
+    for m in reversed(history):
+        msg = {"role": m["role"], "content": _truncate(m["content"] or "", CONTEXT_MESSAGE_TOKENS)}
+        cost = message_tokens([msg])
+        if kept and used + cost > verbatim_budget:
+            break
+        kept.append(msg)
+        used += cost
+    kept.reverse()
+
+    older = history[:len(history) - len(kept)]
+    summary = summarize(older) if older else None
+    messages = ([{"role": "system", "content": summary}] if summary else []) + kept
+    info = {"messages_in": len(history), "verbatim": len(kept), "summarized": len(older),
+            "tokens": message_tokens(messages)}
+    return messages, info
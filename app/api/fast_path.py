@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+from dotenv import load_dotenv
+from mcp.client.session import ClientSession
+from app import metrics
+from app.api.schemas import QueryRequest
+from app.api.context import message_tokens
+import app.api.agent as agent
+
+load_dotenv()
+# LLM 우회 경로: 키워드 칩/필터 검색은 도구 선택용 LLM 호출 없이 search_books 를 바로 부르고 결과를 그립니다.
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") == "1"
+# template: LLM 호출 없이 템플릿으로 / llm: 검색 결과를 넣어 FAST_PATH_MODEL 로 답변 한 번만 생성 (도구 없이)
+FAST_PATH_RENDER = os.getenv("FAST_PATH_RENDER", "template")
+FAST_PATH_MODEL = os.getenv("FAST_PATH_MODEL", agent.LLM_MODEL)
+FAST_PATH_FIELDS = ["isbn", "title", "author", "price", "used", "src", "rating", "sales", "keywords"]
+FAST_PATH_DEFAULT_QUERY = "추천 도서"  # 질문 없이 필터만 있을 때의 검색어 (분야 필터가 있으면 분야 이름)
+
+# UI 키워드 칩 → search_books 인자 ("🏆 베스트셀러 추천해줘" 처럼 뒤에 붙는 "추천해줘" 는 떼고 찾습니다)
+CHIP_PRESETS = {
+    "🏆 베스트셀러": {"query": "요즘 많이 팔리는 베스트셀러", "search_type": "context"},
+    "🆕 최신 IT 트렌드": {"query": "최신 IT 기술 트렌드", "search_type": "context", "recent_days": 365},
+    "💎 숨겨진 명작": {"query": "오래 읽히는 숨겨진 명작", "search_type": "context", "filters": {"min_rating": 9}},
+    "☕️ 자바 입문서": {"query": "자바", "search_type": "keyword"},
+}
+
+RENDER_PROMPT = """
+당신은 알라딘 서점의 'AI 도서 큐레이터'입니다.
+아래 검색 결과 표(첫 줄은 열 이름, 한 줄이 한 권)에 있는 책만 사용해 답변하세요. 표에 없는 책은 지어내지 마세요.
+- 책 목록은 번호가 매겨진 목록으로, 책 사이에는 빈 줄을 넣고, 제목은 굵게(`**제목**`) 처리하세요.
+- 각 책마다 `👉 **추천 이유:**` 한 줄을 keywords 와 사용자의 요청을 바탕으로 쓰세요.
+"""
+
+
+def _chip_key(query: str) -> str:
+    return " ".join(query.split()).removesuffix("추천해줘").strip()
+
+
+def plan(request: QueryRequest) -> dict | None:
+    """
+    LLM 없이 바로 검색할 요청이면 검색 계획 {query, search_type, filters, title}, 아니면 None.
+    intent=browse 이거나, intent 없이 키워드 칩 문구이거나 질문 없이 필터만 있는 요청이 대상입니다.
+    """
+    if not FAST_PATH_ENABLED or request.intent == "chat":
+        return None
+    filters = request.filters.to_tool_args() if request.filters else {}
+    chip = _chip_key(request.query)
+    preset = CHIP_PRESETS.get(chip)
+    if preset:
+        base = dict(preset.get("filters", {}))
+        if preset.get("recent_days"):
+            base["min_pub_date"] = (datetime.now() - timedelta(days=preset["recent_days"])).strftime("%Y-%m-%d")
+        # 칩이 정한 조건(💎 평점 9 이상 등)이 칩의 뜻이므로 사이드바 값보다 우선합니다
+        return {"query": preset["query"], "search_type": preset["search_type"], "filters": {**filters, **base},
+                "title": chip}
+    query = request.query.strip()
+    if request.intent == "browse" or (not query and filters):
+        return {"query": query or filters.get("category_name") or FAST_PATH_DEFAULT_QUERY, "search_type": "context",
+                "filters": filters, "title": query or None}
+    return None
+
+
+def parse_table(text: str) -> tuple[list[dict], list[str]]:
+    """compact 검색 결과 → (행 dict 목록, 표 밖의 안내 줄). 표가 아니면(결과 없음/오류) 원문 줄만 돌려줍니다."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines or "|" not in lines[0]:
+        return [], lines
+    header = lines[0].split("|")
+    rows, notes = [], []
+    for line in lines[1:]:
+        values = line.split("|")
+        if len(values) == len(header):
+            rows.append(dict(zip(header, values)))
+        else:
+            notes.append(line)
+    return rows, notes
+
+
+def _sales_badge(sales: str) -> str:
+    sp = int(sales) if str(sales).isdigit() else 0
+    if sp > 50000: return "🔥 [초대박 베스트셀러]"
+    if sp > 10000: return "👍 [인기]"
+    return ""
+
+
+def render(rows: list[dict], notes: list[str], search: dict) -> str:
+    """답변 예시 포맷(번호 목록, 굵은 제목, 빈 줄 구분)을 따른 템플릿 답변"""
+    if not rows:
+        return "\n".join(notes) or "조건에 맞는 책을 찾을 수 없습니다."
+    head = f"{search['title']} 도서를 찾아보았습니다." if search.get("title") else "요청하신 조건에 맞는 책들을 찾아보았습니다."
+    if search["filters"]:
+        head += f" (조건: {agent.describe_filters(search['filters'])})"
+    lines = [head, ""]
+    for i, r in enumerate(rows, start=1):
+        price = f" ({int(r['price']):,}원)" if r.get("price", "").isdigit() else ""
+        lines.append(f"{i}. **{r.get('title', '')}** - {r.get('author', '')}{price}")
+        badges = [_sales_badge(r.get("sales", "")),
+                  f"⭐ 평점 {r['rating']}" if r.get("rating") else "",
+                  f"📦 중고 {r['used']}" if r.get("used") and r["used"] != "없음" else "",
+                  "⚠️ 가격 지연" if r.get("src") == "stale" else ""]
+        if any(badges):
+            lines.append("   " + " | ".join(b for b in badges if b))
+        if r.get("keywords"):
+            lines.append(f"   👉 **키워드:** {r['keywords'].replace(',', ', ')}")
+        lines.append("")
+    lines += notes
+    lines.append("위 책들 중 더 자세한 목차나 리뷰가 궁금한 책이 있다면 말씀해 주세요!")
+    return "\n".join(lines)
+
+
+async def stream_search(search: dict, session: ClientSession, timings: list[dict] | None = None,
+                        stream: bool = True) -> AsyncIterator[dict]:
+    """
+    search_books 를 한 번 직접 호출하고 결과를 그립니다. stream_ai_agent 와 같은 이벤트(status → token → done)를 냅니다.
+    FAST_PATH_RENDER=template 이면 LLM 을 전혀 부르지 않습니다.
+    """
+    started = time.perf_counter()
+    timings = [] if timings is None else timings
+    ttft_ms = None
+    failed = False
+    try:
+        yield {"type": "status", "message": agent.TOOL_STATUS_MESSAGES["search_books"]}
+        args = {"query": search["query"], "search_type": search["search_type"], "format": "compact",
+                "fields": FAST_PATH_FIELDS}
+        if search["filters"]:
+            args["filters"] = search["filters"]
+        tool_call = {"id": "fast_path", "type": "function",
+                     "function": {"name": "search_books", "arguments": json.dumps(args, ensure_ascii=False)}}
+        t0 = time.perf_counter()
+        result = await agent.call_tool(session, tool_call, asyncio.Semaphore(1), started + agent.AGENT_DEADLINE)
+        tools_ms = (time.perf_counter() - t0) * 1000
+
+        t1 = time.perf_counter()
+        prompt_tokens = 0
+        if FAST_PATH_RENDER == "llm":
+            messages = [{"role": "system", "content": RENDER_PROMPT},
+                        {"role": "user", "content": f"요청: {search['title'] or search['query']}\n"
+                                                    f"조건: {agent.describe_filters(search['filters']) or '없음'}\n"
+                                                    f"검색 결과:\n{result['content']}"}]
+            prompt_tokens = message_tokens(messages)
+            async for kind, payload in agent.complete(messages, None, agent.LLM_TIMEOUT, stream, FAST_PATH_MODEL):
+                if kind == "token":
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                    yield {"type": "token", "content": payload}
+            metrics.record("llm", time.perf_counter() - t1)
+        else:
+            with metrics.span("render"):
+                answer = render(*parse_table(result["content"]), search)
+            ttft_ms = (time.perf_counter() - started) * 1000
+            for line in answer.splitlines(keepends=True):
+                yield {"type": "token", "content": line}
+        timings.append({"round": 0, "llm_ms": (time.perf_counter() - t1) * 1000, "tools_ms": tools_ms,
+                        "tool_calls": 1, "prompt_tokens": prompt_tokens})
+    except Exception as e:
+        print(f"❌ Fast path error: {e}")
+        failed = True
+        yield {"type": "token", "content": "죄송합니다, 처리 중 오류가 발생했습니다."}
+    finally:
+        print(f"⚡ Fast path: {search['search_type']} '{search['query']}' filters={search['filters']} "
+              f"render={FAST_PATH_RENDER}")
+        agent.log_timings(timings, started, ttft_ms)
+    yield {"type": "done", "ttft_ms": ttft_ms, "total_ms": (time.perf_counter() - started) * 1000,
+           "timings": timings, "trace_id": metrics.current_trace_id(), "mode": "fast", "error": failed}
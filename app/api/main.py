@@ -1,34 +1,132 @@
+import os
+import json
+import time
+import asyncio
 import uvicorn
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
-from mcp.client.sse import sse_client
-from mcp.client.session import ClientSession
+from fastapi.responses import StreamingResponse, Response
 from app.api.schemas import QueryRequest
+from app.api.mcp_pool import MCPSessionPool, MCPUnavailable, MCPPoolSaturated
 import app.api.agent as agent_service
+import app.api.fast_path as fast_path
+from app import metrics
 
-MCP_SERVER_URL = "http://localhost:8081/sse"
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8081/sse")
+
+CHAT_REQUESTS = metrics.Counter("chat_requests_total", "Chat requests", ("endpoint", "mode", "status"))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print(f"🔌 Connecting to MCP: {MCP_SERVER_URL}")
+    # 세션 풀: 연결이 끊기면 풀이 알아서 재연결하므로 API 재시작이 필요 없습니다.
+    pool = MCPSessionPool(MCP_SERVER_URL)
+    await pool.start()
+    app.state.mcp_pool = pool
+    metrics.Collected("mcp_pool", "MCP session pool state",
+                      lambda: {(k,): v for k, v in pool.stats().items()}, ("field",))
     try:
-        async with sse_client(MCP_SERVER_URL) as streams:
-            async with ClientSession(streams[0], streams[1]) as session:
-                await session.initialize()
-                app.state.mcp_session = session
-                print("✅ MCP Session Ready!")
-                yield
-    except Exception as e:
-        print(f"❌ Connection Failed: {e}")
         yield
+    finally:
+        await pool.close()
+        await agent_service.close_client()
 
 app = FastAPI(lifespan=lifespan)
 
+async def _tools_or_503(pool: MCPSessionPool, endpoint: str, mode: str) -> list[dict]:
+    """도구 스키마 (세션별 캐시). 연결된 세션이 없거나 풀이 포화면 503 으로 구분해서 응답합니다."""
+    try:
+        return await pool.openai_tools()
+    except MCPPoolSaturated:
+        CHAT_REQUESTS.inc(endpoint=endpoint, mode=mode, status="saturated")
+        raise HTTPException(status_code=503, detail="MCP pool saturated")
+    except MCPUnavailable:
+        CHAT_REQUESTS.inc(endpoint=endpoint, mode=mode, status="unavailable")
+        raise HTTPException(status_code=503, detail="MCP Disconnected")
+
+def _outcome(done: dict | None) -> str:
+    """chat_requests_total 의 status: 에이전트/fast path 가 오류 답변으로 끝났으면 error"""
+    return "error" if done is None or done.get("error") else "ok"
+
 @app.post("/chat")
 async def chat_endpoint(request: QueryRequest, req: Request):
-    if not hasattr(req.app.state, "mcp_session"):
-        raise HTTPException(status_code=503, detail="MCP Disconnected")
-    return {"response": await agent_service.run_ai_agent(request.query, request.history, req.app.state.mcp_session)}
+    trace_id = metrics.start_trace()
+    pool = req.app.state.mcp_pool
+    # 키워드 칩/필터 검색은 LLM 도구 선택 없이 바로 검색 (fast), 나머지는 에이전트 루프 (agent)
+    search = fast_path.plan(request)
+    mode = "fast" if search else "agent"
+    filters = request.filters.to_tool_args() if request.filters else None
+    tools = await _tools_or_503(pool, "chat", mode)
+    # 세션은 도구 호출마다 풀에서 잠깐 대여합니다 (LLM 응답을 기다리는 동안에는 잡지 않음)
+    timings, tokens, done = [], [], None
+    status = "error"
+    try:
+        with metrics.span("chat"):
+            if search:
+                events = fast_path.stream_search(search, pool, timings, stream=False)
+            else:
+                events = agent_service.stream_ai_agent(request.query, request.history, pool, timings, stream=False,
+                                                       openai_tools=tools, filters=filters)
+            async for event in events:
+                if event["type"] == "token":
+                    tokens.append(event["content"])
+                elif event["type"] == "reset":
+                    tokens.clear()
+                elif event["type"] == "done":
+                    done = event
+        status = _outcome(done)
+    except asyncio.CancelledError:  # 클라이언트가 응답 전에 끊음
+        status = "cancelled"
+        raise
+    finally:
+        CHAT_REQUESTS.inc(endpoint="chat", mode=mode, status=status)
+    answer = "".join(tokens)
+    return {"response": answer, "timings": timings, "trace_id": trace_id, "mode": mode}
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: QueryRequest, req: Request):
+    """SSE 스트리밍: 도구 진행 상태(status) → 답변 토큰(token) → 완료(done, TTFT/전체 시간) 순으로 전송"""
+    pool = req.app.state.mcp_pool
+    search = fast_path.plan(request)
+    mode = "fast" if search else "agent"
+    filters = request.filters.to_tool_args() if request.filters else None
+    # 연결 확인은 응답을 시작하기 전에 (여기서는 세션을 대여한 채로 두지 않으므로 클라이언트가 먼저 끊어도 새는 것이 없음)
+    tools = await _tools_or_503(pool, "chat_stream", mode)
+
+    async def event_source():
+        # 응답 본문은 별도 태스크에서 흘러가므로 trace 도 여기서 시작합니다
+        metrics.start_trace()
+        started = time.perf_counter()
+        done, status = None, "error"
+        try:
+            if search:
+                events = fast_path.stream_search(search, pool)
+            else:
+                events = agent_service.stream_ai_agent(request.query, request.history, pool,
+                                                       openai_tools=tools, filters=filters)
+            async for event in events:
+                if event["type"] == "done":
+                    done = event
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            status = _outcome(done)
+        except (asyncio.CancelledError, GeneratorExit):  # 스트림 도중 클라이언트가 끊음
+            status = "cancelled"
+            raise
+        finally:
+            metrics.record("chat", time.perf_counter() - started)
+            CHAT_REQUESTS.inc(endpoint="chat_stream", mode=mode, status=status)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/health")
+async def health_endpoint(req: Request):
+    """MCP 세션 풀 상태 및 도구 목록 재조회 횟수"""
+    return req.app.state.mcp_pool.stats()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus 스크레이프용 지표 (단계별 지연 히스토그램, LLM 토큰, 도구 호출, 세션 풀)"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,221 @@
+import os
+import random
+import asyncio
+import mcp.types as types
+from contextlib import asynccontextmanager
+from mcp.client.sse import sse_client
+from mcp.client.session import ClientSession
+
+# MCP 세션 풀 설정
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "4"))
+# 세션 하나에 동시에 대여할 수 있는 도구 호출 수 (0 = 제한 없음). MCP 세션은 요청을 다중화하므로 기본은 제한 없이
+# 가장 한가한 세션을 고르기만 합니다.
+MCP_SESSION_MAX_INFLIGHT = int(os.getenv("MCP_SESSION_MAX_INFLIGHT", "0"))
+MCP_CHECKOUT_TIMEOUT = float(os.getenv("MCP_CHECKOUT_TIMEOUT", "5"))
+MCP_HEALTH_INTERVAL = float(os.getenv("MCP_HEALTH_INTERVAL", "10"))
+MCP_HEALTH_TIMEOUT = float(os.getenv("MCP_HEALTH_TIMEOUT", "3"))
+MCP_RECONNECT_MIN = float(os.getenv("MCP_RECONNECT_MIN", "0.5"))
+MCP_RECONNECT_MAX = float(os.getenv("MCP_RECONNECT_MAX", "30"))
+
+# 도구 목록을 서버에서 다시 받아온 횟수 (세션당 1회 + 서버의 tools/list_changed 알림 시)
+TOOL_LIST_FETCHES = 0
+
+
+def to_openai_tools(mcp_tools: list[types.Tool]) -> list[dict]:
+    """MCP 도구 목록 → OpenAI function calling 스키마"""
+    return [{"type": "function",
+             "function": {"name": t.name, "description": t.description, "parameters": t.inputSchema}}
+            for t in mcp_tools]
+
+
+class MCPUnavailable(Exception):
+    """대여 가능한(연결된) MCP 세션이 없을 때 발생합니다."""
+
+
+class MCPPoolSaturated(MCPUnavailable):
+    """연결된 세션은 있지만 모두 MCP_SESSION_MAX_INFLIGHT 만큼 사용 중이라 제한 시간 안에 대여하지 못했을 때 발생합니다."""
+
+
+class PooledSession:
+    """
+    풀에 속한 MCP 연결 하나.
+    sse_client/ClientSession 컨텍스트는 같은 태스크에서 열고 닫아야 하므로 전용 태스크(_run)가 소유하고,
+    끊기거나 헬스체크에 실패하면 백오프 후 스스로 다시 연결합니다.
+    """
+
+    def __init__(self, url: str, index: int, on_change):
+        self.url = url
+        self.index = index
+        self.session: ClientSession | None = None
+        self.in_flight = 0
+        self._tools: list[dict] | None = None  # 세션별 도구 스키마 캐시
+        self._on_change = on_change
+        self._wake = asyncio.Event()
+        self._closed = False
+        self._task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.session is not None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def reconnect(self):
+        """현재 연결을 버리고 다시 연결하도록 요청합니다."""
+        self._wake.set()
+
+    async def openai_tools(self) -> list[dict]:
+        """캐시된 도구 스키마. 재연결 또는 서버의 목록 변경 알림 이후에만 다시 조회합니다."""
+        if self._tools is None:
+            global TOOL_LIST_FETCHES
+            TOOL_LIST_FETCHES += 1
+            result = await self.session.list_tools()
+            self._tools = to_openai_tools(result.tools)
+        return self._tools
+
+    async def _handle_message(self, message):
+        if isinstance(message, types.ServerNotification) and \
+                isinstance(message.root, types.ToolListChangedNotification):
+            print(f"🧰 MCP Session #{self.index} tool list changed")
+            self._tools = None
+
+    async def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._task:
+            await self._task
+
+    async def _run(self):
+        backoff = MCP_RECONNECT_MIN
+        while not self._closed:
+            try:
+                async with sse_client(self.url) as streams:
+                    async with ClientSession(streams[0], streams[1], message_handler=self._handle_message) as session:
+                        await session.initialize()
+                        self.session = session
+                        backoff = MCP_RECONNECT_MIN
+                        print(f"✅ MCP Session #{self.index} Ready!")
+                        await self._on_change()
+                        await self._wake.wait()
+            except Exception as e:
+                print(f"❌ MCP Session #{self.index} Connection Failed: {e}")
+            finally:
+                self.session = None
+                self._tools = None
+                self._wake.clear()
+
+            if self._closed:
+                break
+            # 지터를 섞은 지수 백오프로 재연결 (서버 재시작 시 동시에 몰리지 않도록)
+            delay = backoff * (0.5 + random.random())
+            print(f"🔄 MCP Session #{self.index} reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, MCP_RECONNECT_MAX)
+
+
+class MCPSessionPool:
+    """
+    N개의 MCP 세션 풀. 도구 호출 단위로 가장 한가한 세션을 대여(checkout)/반납(checkin)하고,
+    주기적으로 `status` 도구를 호출해 죽은 연결을 찾아 재연결합니다.
+    call_tool / list_tools 를 그대로 제공하므로 에이전트에는 ClientSession 대신 풀을 넘기면 됩니다
+    (LLM 응답을 기다리는 동안에는 세션을 잡고 있지 않음).
+    """
+
+    def __init__(self, url: str, size: int = MCP_POOL_SIZE):
+        self.url = url
+        self._cond = asyncio.Condition()
+        self._members = [PooledSession(url, i, self._notify) for i in range(size)]
+        self._health_task: asyncio.Task | None = None
+
+    @property
+    def ready_count(self) -> int:
+        return sum(1 for m in self._members if m.ready)
+
+    async def _notify(self):
+        async with self._cond:
+            self._cond.notify_all()
+
+    async def start(self, wait: float = MCP_CHECKOUT_TIMEOUT):
+        """모든 세션 연결을 시작하고, 최소 하나가 준비될 때까지 잠시 기다립니다 (실패해도 계속 재시도)."""
+        print(f"🔌 Connecting to MCP: {self.url} (pool={len(self._members)})")
+        for m in self._members:
+            m.start()
+        self._health_task = asyncio.create_task(self._health_loop())
+        try:
+            async with self._cond:
+                await asyncio.wait_for(self._cond.wait_for(lambda: self.ready_count > 0), wait)
+        except asyncio.TimeoutError:
+            print("⚠️ MCP 서버에 아직 연결되지 않았습니다. 백그라운드에서 재시도합니다.")
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+        await asyncio.gather(*(m.close() for m in self._members), return_exceptions=True)
+
+    async def acquire(self, timeout: float = MCP_CHECKOUT_TIMEOUT) -> PooledSession:
+        """준비된 세션 중 진행 중 요청이 가장 적은 것을 대여합니다."""
+
+        def pick():
+            candidates = [m for m in self._members
+                          if m.ready and (MCP_SESSION_MAX_INFLIGHT <= 0 or m.in_flight < MCP_SESSION_MAX_INFLIGHT)]
+            return min(candidates, key=lambda m: m.in_flight) if candidates else None
+
+        try:
+            async with self._cond:
+                member = await asyncio.wait_for(self._cond.wait_for(pick), timeout)
+                member.in_flight += 1
+                return member
+        except asyncio.TimeoutError:
+            if self.ready_count:
+                raise MCPPoolSaturated(f"all {self.ready_count} MCP sessions busy for {timeout}s")
+            raise MCPUnavailable(f"no MCP session available within {timeout}s")
+
+    async def release(self, member: PooledSession):
+        async with self._cond:
+            member.in_flight -= 1
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def checkout(self, timeout: float = MCP_CHECKOUT_TIMEOUT):
+        member = await self.acquire(timeout)
+        try:
+            yield member
+        finally:
+            await self.release(member)
+
+    async def call_tool(self, name: str, arguments: dict | None = None, meta: dict | None = None):
+        """ClientSession.call_tool 과 같은 인터페이스. 이 호출 동안만 세션을 대여합니다."""
+        async with self.checkout() as member:
+            return await member.session.call_tool(name, arguments=arguments, meta=meta)
+
+    async def list_tools(self):
+        async with self.checkout() as member:
+            return await member.session.list_tools()
+
+    async def openai_tools(self) -> list[dict]:
+        """세션별 캐시된 도구 스키마 (연결된 세션이 없으면 MCPUnavailable)"""
+        async with self.checkout() as member:
+            return await member.openai_tools()
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": len(self._members),
+            "ready": self.ready_count,
+            "in_flight": sum(m.in_flight for m in self._members),
+            "tool_list_fetches": TOOL_LIST_FETCHES,
+        }
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(MCP_HEALTH_INTERVAL)
+            await asyncio.gather(*(self._check(m) for m in self._members if m.ready))
+
+    async def _check(self, member: PooledSession):
+        try:
+            res = await asyncio.wait_for(member.session.call_tool("status", arguments={}), MCP_HEALTH_TIMEOUT)
+            if res.isError:
+                raise RuntimeError(res.content[0].text if res.content else "status error")
+        except Exception as e:
+            print(f"💔 MCP Session #{member.index} health check failed: {e!r}")
+            member.reconnect()
@@ -1,10 +1,24 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 class ChatMessage(BaseModel):
     role: str
     content: str
 
+class SearchFilters(BaseModel):
+    """사이드바 필터 (search_books 의 filters 와 같은 이름)"""
+    max_price: Optional[int] = None
+    category_name: Optional[str] = None
+    min_rating: Optional[float] = None
+    min_pub_date: Optional[str] = None  # YYYY-MM-DD
+
+    def to_tool_args(self) -> dict:
+        # 값이 없는 키는 아예 보내지 않습니다 (0/빈 문자열도 '조건 없음')
+        return {k: v for k, v in self.model_dump().items() if v}
+
 class QueryRequest(BaseModel):
     query: str
-    history: List[ChatMessage] = []
\ No newline at end of file
+    history: List[ChatMessage] = []
+    filters: Optional[SearchFilters] = None
+    # browse: LLM 없이 바로 검색 (키워드 칩/필터 검색), chat: 항상 에이전트, 생략: 칩·필터만 있는 질문이면 browse
+    intent: Optional[Literal["browse", "chat"]] = None
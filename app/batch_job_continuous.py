@@ -1,20 +1,55 @@
 import os
 import time
 import json
-import requests
-import chromadb
-from chromadb.utils import embedding_functions
+import asyncio
+import hashlib
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from app import embeddings, snapshot
+from app.aladin import AladinClient
+from app.store import bump_books_version, get_collection
+from app.details import detail_store, DETAIL_OPT_RESULT
+from app.mcp_server.columns import to_int_date
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # .env 로드
 load_dotenv()
-ALADIN_TTB_KEY = os.getenv("ALADIN_API_KEY")
-CHROMA_DB_PATH = "./chroma_db"
-STATE_FILE = "batch_state.json"  # 👈 여기에 마지막 페이지 번호를 저장합니다.
+# 👈 여기에 카테고리별 다음 페이지 번호를 저장합니다. 실행 위치와 무관하도록 기본값은 프로젝트 루트의 절대 경로
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_FILE = os.path.abspath(os.getenv("BATCH_STATE_PATH", os.path.join(PROJECT_ROOT, "batch_state.json")))
 
 # 한 번 실행할 때 카테고리별로 몇 페이지씩 더 긁을지 설정
 PAGES_PER_RUN = 3  # (예: 실행 시마다 분야별 3페이지씩 추가 수집)
 
+# 수집 모드: incremental = 실행마다 PAGES_PER_RUN 페이지씩 / full = 목록 끝(totalResults)까지 전부
+BATCH_MODE = os.getenv("BATCH_MODE", "incremental")
+# 수집할 목록 종류 (베스트셀러, 신간 전체, 주목할 만한 신간)
+BATCH_QUERY_TYPES = [q.strip() for q in os.getenv(
+    "BATCH_QUERY_TYPES", "Bestseller" if BATCH_MODE == "incremental" else "Bestseller,ItemNewAll,ItemNewSpecial"
+).split(",") if q.strip()]
+BATCH_PAGE_SIZE = int(os.getenv("BATCH_PAGE_SIZE", "50"))
+BATCH_CATEGORIES_FILE = os.getenv("BATCH_CATEGORIES_FILE")  # 카테고리 트리 JSON (없으면 아래 기본 목록)
+BATCH_INTERVAL_MINUTES = float(os.getenv("BATCH_INTERVAL_MINUTES", "0"))  # 0 보다 크면 주기적으로 반복 실행
+# 이미 저장된 책 재조회: 갱신된 지 BATCH_REFRESH_AGE_HOURS 가 지난 책을 판매지수 순으로 최대 BATCH_REFRESH_LIMIT 권
+BATCH_REFRESH_LIMIT = int(os.getenv("BATCH_REFRESH_LIMIT", "0" if BATCH_MODE == "incremental" else "1000"))
+BATCH_REFRESH_AGE_HOURS = float(os.getenv("BATCH_REFRESH_AGE_HOURS", "24"))
+
+# 파이프라인 설정: 전역 API 호출 속도, 단계 사이 큐 크기(백프레셔), 임베딩 배치 크기
+BATCH_RATE_PER_SEC = float(os.getenv("BATCH_RATE_PER_SEC", "2"))  # 기존 time.sleep(1) 대신 전역 토큰 버킷
+BATCH_RATE_BURST = int(os.getenv("BATCH_RATE_BURST", "2"))
+BATCH_FETCH_TIMEOUT = float(os.getenv("BATCH_FETCH_TIMEOUT", "10"))
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "8"))  # 큐가 차면 앞 단계가 기다립니다
+BATCH_EMBED_SIZE = int(os.getenv("BATCH_EMBED_SIZE", "256"))
+# 한 워커가 동시에 수집할 카테고리 수 (0 = 전부). 여러 워커를 띄우면 남은 카테고리를 락으로 나눠 가집니다.
+BATCH_CATEGORY_CONCURRENCY = int(os.getenv("BATCH_CATEGORY_CONCURRENCY", "0"))
+# 수집이 끝나면 books 컬렉션을 메모리 맵 벡터 스냅샷으로 내보냅니다 (MCP 서버의 VECTOR_BACKEND=auto/snapshot 이 읽음)
+BATCH_EXPORT_SNAPSHOT = os.getenv("BATCH_EXPORT_SNAPSHOT", "1") == "1"
+
 # 수집할 카테고리 ID 목록
 TARGET_CATEGORIES = {
     "종합": 0,
@@ -27,44 +62,112 @@ TARGET_CATEGORIES = {
 }
 
 
-def load_state():
-    """저장된 페이지 번호 상태를 불러옵니다."""
-    if os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-
-def save_state(state):
-    """현재 페이지 번호 상태를 파일에 저장합니다."""
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=4, ensure_ascii=False)
-
-
-def fetch_books_by_category(category_id, page):
-    """API 호출"""
-    url = "http://www.aladin.co.kr/ttb/api/ItemList.aspx"
-    params = {
-        "ttbkey": ALADIN_TTB_KEY,
-        "QueryType": "Bestseller",  # 또는 ItemNewAll (신간 전체)
-        "MaxResults": 50,
-        "start": page,
-        "SearchTarget": "Book",
-        "CategoryId": category_id,
-        "Output": "js",
-        "Version": "20131101",
-        "Cover": "Big"
-    }
-
+def flatten_categories(tree: dict, prefix: str = "") -> dict:
+    """
+    카테고리 트리 → {"경로": cid}. 값은 cid 정수이거나 {"id": cid, "children": {...}} 형태입니다.
+    (id 가 없는 노드는 묶음용으로만 쓰이고 수집하지 않습니다)
+    """
+    flat = {}
+    for name, node in tree.items():
+        path = f"{prefix}/{name}" if prefix else name
+        if isinstance(node, dict):
+            if node.get("id") is not None:
+                flat[path] = int(node["id"])
+            flat.update(flatten_categories(node.get("children", {}), path))
+        else:
+            flat[path] = int(node)
+    return flat
+
+
+def load_categories() -> dict:
+    if not BATCH_CATEGORIES_FILE:
+        return TARGET_CATEGORIES
+    with open(BATCH_CATEGORIES_FILE, "r", encoding="utf-8") as f:
+        return flatten_categories(json.load(f))
+
+
+def _try_lock(f, blocking: bool) -> bool:
+    """열린 파일에 배타적 OS 락을 겁니다. 프로세스가 죽으면 OS 가 자동으로 풀어 줍니다."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+class BatchState:
+    """
+    배치 진행 상태 저장소 (카테고리 ID → 다음에 수집할 페이지).
+    - 저장은 임시 파일 + fsync + os.replace 로 원자적으로 (중간에 죽어도 이전 상태가 남음)
+    - 카테고리마다 락 파일을 잡은 워커만 그 카테고리를 수집 (여러 워커가 카테고리를 나눠 가짐)
+    - 체크포인트는 상태 파일 락 안에서 최신 파일을 다시 읽어 자기 카테고리만 갱신 (다른 워커 진행분 보존)
+    """
+
+    def __init__(self, path: str = STATE_FILE):
+        self.path = path
+        self.lock_dir = path + ".locks"
+        self._held = {}  # cid_str -> 락을 잡고 있는 파일 객체
+
+    def load(self) -> dict:
+        """저장된 페이지 번호 상태를 불러옵니다."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, state: dict):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.lock_dir, exist_ok=True)
+        with open(os.path.join(self.lock_dir, "state.lock"), "a+") as f:
+            _try_lock(f, blocking=True)
+            yield  # 파일을 닫으면 락도 풀립니다
+
+    def claim(self, cid_str: str) -> bool:
+        """카테고리 락을 잡습니다. 다른 워커가 이미 수집 중이면 False."""
+        os.makedirs(self.lock_dir, exist_ok=True)
+        f = open(os.path.join(self.lock_dir, f"category-{cid_str.replace(':', '_')}.lock"), "a+")
+        if not _try_lock(f, blocking=False):
+            f.close()
+            return False
+        self._held[cid_str] = f
+        return True
+
+    def release_all(self):
+        for f in self._held.values():
+            f.close()
+        self._held.clear()
+
+    def checkpoint(self, updates: dict):
+        """현재 페이지 번호 상태를 파일에 저장합니다 (이 워커가 잡은 카테고리만)."""
+        assert all(cid in self._held for cid in updates), "claim() 하지 않은 카테고리는 저장할 수 없습니다"
+        with self._file_lock():
+            state = self.load()
+            state.update(updates)
+            self._write(state)
+
+
+async def fetch_books_by_category(client: AladinClient, category_id, page, query_type="Bestseller"):
+    """API 호출. (책 목록, 전체 건수) 를 반환하며, 실패하면 전체 건수가 None 입니다."""
     try:
-        response = requests.get(url, params=params)
-        data = response.json()
-        if "item" in data:
-            return data["item"]
-        return []
+        data = await client.item_list_page(
+            query_type, category_id, page, max_results=BATCH_PAGE_SIZE, timeout=BATCH_FETCH_TIMEOUT, Cover="Big"
+        )
+        return data.get("item", []), int(data.get("totalResults") or 0)
     except Exception as e:
         print(f"❌ Connection Error: {e}")
-        return []
+        return [], None
 
 
 def format_book_context(book):
@@ -76,87 +179,313 @@ def format_book_context(book):
     )
 
 
-def run_continuous_batch():
-    print("🚀 [Continuous Batch] 이어달리기 수집을 시작합니다...")
-
-    # 1. DB 및 상태 로드
-    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name="paraphrase-multilingual-MiniLM-L12-v2"
-    )
-    collection = client.get_or_create_collection(
-        name="books",
-        embedding_function=sentence_transformer_ef
-    )
-
-    state = load_state()
-    total_new_books = 0
-
-    # 2. 카테고리별 순회
-    for cat_name, cid in TARGET_CATEGORIES.items():
-        cid_str = str(cid)  # JSON 키는 문자열이어야 함
-
-        # 저장된 페이지가 없으면 1페이지부터 시작
-        start_page = state.get(cid_str, 1)
-        end_page = start_page + PAGES_PER_RUN
-
-        print(f"\n📂 [{cat_name}] (CID:{cid}) - {start_page}페이지부터 수집 시작...")
-
-        current_page = start_page
-
-        while current_page < end_page:
-            books = fetch_books_by_category(cid, current_page)
-
-            # 더 이상 데이터가 없으면 중단 (끝까지 다 긁음)
-            if not books:
-                print(f"   ⚠️ 더 이상 데이터가 없습니다. (Page {current_page})")
-                break
-
-            ids, documents, metadatas = [], [], []
-
-            for book in books:
-                isbn = book.get('isbn13')
-                if not isbn: continue
-
-                # [수정] 날짜 문자열("2023-01-01")을 숫자(20230101)로 변환
-                raw_date = book.get('pubDate', '')
-                pub_date_int = 0
-                if raw_date:
-                    # "-" 제거 후 정수 변환 (예: "2023-10-25" -> 20231025)
-                    pub_date_int = int(raw_date.replace("-", ""))
-
-                # 메타데이터 구성
-                meta = {
-                    "isbn": isbn,
-                    "title": book.get('title', ''),
-                    "author": book.get('author', ''),
-                    "category": book.get('categoryName', ''),
-                    "price": book.get('priceSales', 0),
-                    "link": book.get('link', ''),
-                    "rating": float(book.get('customerReviewRank', 0)),
-                    "pub_date": pub_date_int  # 👈 [추가] 숫자형 날짜 저장
-                }
-
-                ids.append(isbn)
-                documents.append(format_book_context(book))
-                metadatas.append(meta)
-
-            # DB 저장
-            if ids:
-                collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
-                total_new_books += len(ids)
-                print(f"   ✅ Page {current_page} 완료 ({len(ids)}권 저장)")
-
-            # 상태 업데이트 및 저장 (중간에 꺼져도 기록되도록)
-            current_page += 1
-            state[cid_str] = current_page
-            save_state(state)
+def doc_hash(document: str) -> str:
+    """임베딩 대상 문서(format_book_context)의 내용 해시. 같으면 다시 임베딩할 필요가 없습니다."""
+    return hashlib.sha1(document.encode("utf-8")).hexdigest()
+
+
+def build_record(book):
+    """알라딘 item → (id, 문서, 메타데이터). ISBN 이 없으면 None"""
+    isbn = book.get('isbn13')
+    if not isbn: return None
+    document = format_book_context(book)
+
+    # [수정] 날짜 문자열("2023-01-01")을 숫자(20230101)로 변환 (형식이 깨진 pubDate 는 0: 책 한 권 때문에 배치가 멈추지 않도록)
+    pub_date_int = to_int_date(book.get('pubDate', '')) or 0
+
+    # 메타데이터 구성
+    meta = {
+        "isbn": isbn,
+        "title": book.get('title', ''),
+        "author": book.get('author', ''),
+        "category": book.get('categoryName', ''),
+        "price": book.get('priceSales', 0),
+        "link": book.get('link', ''),
+        "rating": float(book.get('customerReviewRank', 0)),
+        "pub_date": pub_date_int,  # 👈 [추가] 숫자형 날짜 저장
+        "sales_point": book.get('salesPoint', 0),
+        "doc_hash": doc_hash(document),  # 👈 증분 임베딩 판단용
+        "updated_at": int(time.time())  # 👈 재조회 우선순위 판단용
+    }
+    return isbn, document, meta
+
+
+class StageStats:
+    """파이프라인 단계별 처리량 (실제로 일한 시간 기준 books/sec)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.books = 0
+        self.busy = 0.0
+
+    def add(self, books, seconds):
+        self.books += books
+        self.busy += seconds
+
+    def __str__(self):
+        rate = self.books / self.busy if self.busy else 0.0
+        return f"{self.name:>6}: {self.books}권 / {self.busy:.1f}s 작업 → {rate:.1f} books/sec"
+
+
+def state_key(query_type: str, cid) -> str:
+    """상태 파일 키. 기존 베스트셀러 진행 상태와 호환되도록 Bestseller 는 카테고리 ID 그대로 씁니다."""
+    return str(cid) if query_type == "Bestseller" else f"{query_type}:{cid}"
+
+
+class Page:
+    """파이프라인을 흐르는 단위: 한 목록(카테고리 × 목록 종류)의 한 페이지. key 가 None 이면 재조회 묶음"""
+
+    def __init__(self, key, page, records, query_type, next_page=None, items=(), full=False):
+        self.key = key
+        self.page = page
+        self.records = records
+        self.items = items  # 알라딘 item 원본 (상세 저장소에 그대로 저장)
+        self.full = full  # items 가 ItemLookUp 상세 응답인지 (목록 응답이면 False)
+        self.query_type = query_type
+        self.next_page = next_page  # 저장 후 상태에 기록할 다음 페이지 (목록 끝이면 1 로 되돌려 다음 주기에 처음부터)
+        self.embeddings = []  # records 와 같은 순서, 변경 없는 책은 None (메타데이터만 갱신)
+
+
+async def fetch_stage(client, cat_name, cid, query_type, store: BatchState, out_q, stats, seen: set):
+    """[1단계] 목록 하나를 페이지 순서대로 수집해 큐에 넣습니다 (큐가 차면 대기)."""
+    key = state_key(query_type, cid)  # JSON 키는 문자열이어야 함
+
+    # 저장된 페이지가 없으면 1페이지부터 시작 (락을 잡은 뒤에 읽어야 다른 워커의 최신 체크포인트를 봅니다)
+    start_page = (await asyncio.to_thread(store.load)).get(key, 1)
+    end_page = start_page + PAGES_PER_RUN if BATCH_MODE == "incremental" else None
+
+    print(f"\n📂 [{cat_name}] (CID:{cid}, {query_type}) - {start_page}페이지부터 수집 시작...")
+
+    current_page = start_page
+    while end_page is None or current_page < end_page:
+        t0 = time.perf_counter()
+        books, total = await fetch_books_by_category(client, cid, current_page, query_type)
+        stats.add(len(books), time.perf_counter() - t0)
+
+        # 오류면 상태를 그대로 두고 다음 실행에서 이어서 수집
+        if total is None:
+            break
+        # 더 이상 데이터가 없으면 중단 (끝까지 다 긁음) → 다음 주기에는 처음부터 다시 (목록이 계속 바뀌므로)
+        last = not books or current_page * BATCH_PAGE_SIZE >= total
+        if not books:
+            print(f"   ⚠️ [{cat_name}] 더 이상 데이터가 없습니다. (Page {current_page})")
+
+        records = [r for r in (build_record(b) for b in books) if r]
+        seen.update(r[0] for r in records)
+        await out_q.put(Page(key, current_page, records, query_type, 1 if last else current_page + 1, items=books))
+        if last:
+            break
+        current_page += 1
+
+
+async def refresh_stage(collection, client, out_q, stats, seen: set):
+    """[1단계-재조회] 이번 수집에서 다루지 않은 기존 책을 판매지수가 높은 순으로 ItemLookUp 해 최신화합니다."""
+    cutoff = time.time() - BATCH_REFRESH_AGE_HOURS * 3600
+
+    def candidates():
+        found = collection.get(include=["metadatas"])
+        stale = [m for m in found["metadatas"]
+                 if m and m.get("isbn") not in seen and m.get("updated_at", 0) < cutoff]
+        stale.sort(key=lambda m: m.get("sales_point", 0) or 0, reverse=True)
+        return [m["isbn"] for m in stale[:BATCH_REFRESH_LIMIT]]
+
+    isbns = await asyncio.to_thread(candidates)
+    if not isbns:
+        return
+    print(f"\n🔄 기존 도서 {len(isbns)}권 재조회 (판매지수 순)...")
+    for i in range(0, len(isbns), BATCH_PAGE_SIZE):
+        t0 = time.perf_counter()
+        try:
+            # 재조회는 상세 정보(목차/책소개)까지 받아 상세 저장소도 함께 채웁니다
+            books = await client.item_lookup(isbns[i:i + BATCH_PAGE_SIZE], opt_result=DETAIL_OPT_RESULT)
+        except Exception as e:
+            print(f"❌ Refresh Error: {e}")
+            continue
+        stats.add(len(books), time.perf_counter() - t0)
+        records = [r for r in (build_record(b) for b in books) if r]
+        await out_q.put(Page(None, i // BATCH_PAGE_SIZE + 1, records, "Refresh", items=books, full=True))
+
+
+def existing_hashes(collection, ids) -> dict:
+    """이미 저장된 책들의 doc_hash (없으면 키 없음)"""
+    found = collection.get(ids=list(dict.fromkeys(ids)), include=["metadatas"])
+    return {i: (m or {}).get("doc_hash") for i, m in zip(found["ids"], found["metadatas"])}
+
+
+async def embed_stage(collection, in_q, out_q, stats, counts):
+    """[2단계] 여러 페이지의 문서를 모아, 새로 들어왔거나 내용이 바뀐 문서만 한 번에 임베딩합니다."""
+    # 이번 실행에서 이미 임베딩해 쓰기 단계로 보낸 해시 (쓰기 단계는 순서대로 처리하므로 DB 에 먼저 반영됨)
+    sent = {}
+    done = False
+    while not done:
+        pages = [await in_q.get()]
+        # 이미 도착해 있는 페이지를 배치 크기까지 더 모읍니다
+        while sum(len(p.records) for p in pages if p) < BATCH_EMBED_SIZE and not in_q.empty():
+            pages.append(in_q.get_nowait())
+        if None in pages:
+            done = True
+            pages = [p for p in pages if p is not None]
+
+        ids = [r[0] for p in pages for r in p.records]
+        known = await asyncio.to_thread(existing_hashes, collection, ids) if ids else {}
+        known.update({i: sent[i] for i in ids if i in sent})
+        # 새 책이거나 문서 해시가 달라진 책만 (여러 카테고리에 걸친 같은 책은 한 번만) 임베딩
+        targets = {r[0]: r[1] for p in pages for r in p.records if known.get(r[0]) != r[2]["doc_hash"]}
+        counts["skipped"] += len(set(ids)) - len(targets)
+        counts["embedded"] += len(targets)
+
+        vectors = {}
+        if targets:
+            t0 = time.perf_counter()
+            encoded = await asyncio.to_thread(embeddings.encode, list(targets.values()))
+            stats.add(len(targets), time.perf_counter() - t0)
+            vectors = {isbn: v.tolist() for isbn, v in zip(targets, encoded)}
+        for p in pages:
+            p.embeddings = [vectors.get(r[0]) for r in p.records]
+            sent.update({r[0]: r[2]["doc_hash"] for r in p.records})
+        for p in pages:
+            await out_q.put(p)
+    await out_q.put(None)
+
+
+async def write_stage(collection, in_q, store: BatchState, stats, written: dict):
+    """[3단계] 페이지들을 한 번에 upsert 하고, 저장이 끝난 페이지까지만 상태를 전진시킵니다."""
+    done = False
+    while not done:
+        pages = [await in_q.get()]
+        while not in_q.empty():
+            pages.append(in_q.get_nowait())
+        if None in pages:
+            done = True
+            pages = [p for p in pages if p is not None]
+
+        ids = [r[0] for p in pages for r in p.records]
+        if ids:
+            t0 = time.perf_counter()
+            # 같은 ISBN 이 여러 페이지에 나오면 마지막 메타데이터를 쓰되, 앞서 계산된 임베딩은 유지합니다
+            unique = {}
+            for p in pages:
+                for r, e in zip(p.records, p.embeddings):
+                    prev = unique.get(r[0])
+                    unique[r[0]] = (r, e if e is not None or prev is None else prev[1])
+            changed = [(r, e) for r, e in unique.values() if e is not None]
+            unchanged = [r for r, e in unique.values() if e is None]
+            if changed:
+                await asyncio.to_thread(
+                    collection.upsert,
+                    ids=[r[0] for r, _ in changed],
+                    embeddings=[e for _, e in changed],
+                    documents=[r[1] for r, _ in changed],
+                    metadatas=[r[2] for r, _ in changed],
+                )
+            if unchanged:
+                # 문서가 그대로면 가격/평점/판매지수 메타데이터만 갱신 (임베딩 계산 없음)
+                await asyncio.to_thread(
+                    collection.update, ids=[r[0] for r in unchanged], metadatas=[r[2] for r in unchanged]
+                )
+            # 상세 저장소에 원본 일괄 저장 (MCP 서버의 get_details 가 API 호출 없이 읽음)
+            for full in (False, True):
+                items = [item for p in pages if p.full == full for item in p.items]
+                if items:
+                    await asyncio.to_thread(detail_store.put_many, items, full)
+            bump_books_version()  # MCP 서버의 검색 결과 캐시 무효화
+            stats.add(len(ids), time.perf_counter() - t0)
+
+        # 상태 업데이트 및 저장 (중간에 꺼져도 기록되도록)
+        # 카테고리별 페이지는 순서대로 흐르므로 저장된 페이지의 다음 번호가 곧 이어달리기 지점입니다.
+        # upsert 가 끝난 뒤에만 전진하므로 페이지가 빠지지 않고, 저장 직전에 죽으면 그 페이지만 다시 (멱등) 처리됩니다.
+        updates = {}
+        for p in pages:
+            written[p.query_type] = written.get(p.query_type, 0) + len(p.records)
+            if p.key is not None:
+                updates[p.key] = p.next_page
+            print(f"   ✅ [{p.key or p.query_type}] Page {p.page} 완료 ({len(p.records)}권 저장)")
+        if updates:
+            await asyncio.to_thread(store.checkpoint, updates)
+
+
+async def run_pipeline():
+    # 1. DB 및 상태 로드 (임베딩 모델은 MCP 서버와 같은 app.embeddings 설정을 공유)
+    collection = get_collection()
+    store = BatchState()
+    client = AladinClient(rate=BATCH_RATE_PER_SEC, burst=BATCH_RATE_BURST)
+    embed_q = asyncio.Queue(maxsize=BATCH_QUEUE_SIZE)
+    write_q = asyncio.Queue(maxsize=BATCH_QUEUE_SIZE)
+    stats = {name: StageStats(name) for name in ("fetch", "embed", "write")}
+    counts = {"embedded": 0, "skipped": 0}
+    # 목록 종류별 처리량 (API 수집 시간 기준 / 저장된 권수)
+    by_type = {qt: StageStats(qt) for qt in [*BATCH_QUERY_TYPES, "Refresh"]}
+    written = {}
+
+    pending = [(qt, name, cid) for qt in BATCH_QUERY_TYPES for name, cid in load_categories().items()]
+    skipped = []
+    seen = set()  # 이번 실행에서 목록으로 수집한 ISBN (재조회 대상에서 제외)
+
+    async def fetch_worker():
+        # 남은 목록 중 락을 잡을 수 있는 것을 하나씩 가져와 수집 (락은 쓰기 단계가 끝날 때까지 유지)
+        while pending:
+            query_type, cat_name, cid = pending.pop(0)
+            if not store.claim(state_key(query_type, cid)):
+                skipped.append(f"{cat_name}({query_type})")
+                continue
+            fetch_stats = by_type[query_type]
+            await fetch_stage(client, cat_name, cid, query_type, store, embed_q, fetch_stats, seen)
+
+    async def produce():
+        # 2. 목록별 수집을 동시에 (호출 속도는 클라이언트의 전역 토큰 버킷이 제한)
+        await asyncio.gather(*(fetch_worker() for _ in range(BATCH_CATEGORY_CONCURRENCY or len(pending))))
+        if skipped:
+            print(f"🔒 다른 워커가 수집 중인 목록 건너뜀: {', '.join(skipped)}")
+        if BATCH_REFRESH_LIMIT > 0 and store.claim("refresh"):
+            await refresh_stage(collection, client, embed_q, by_type["Refresh"], seen)
+        for s in by_type.values():
+            stats["fetch"].add(s.books, s.busy)
+        await embed_q.put(None)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(
+            produce(),
+            embed_stage(collection, embed_q, write_q, stats["embed"], counts),
+            write_stage(collection, write_q, store, stats["write"], written),
+        )
+    finally:
+        await client.aclose()
+        store.release_all()
+    return stats, counts, by_type, written, time.perf_counter() - started
 
-            time.sleep(1)  # API 매너 타임
 
-    print(f"\n🎉 [완료] 총 {total_new_books}권이 추가되었습니다.")
-    print(f"💾 현재 상태가 'batch_state.json'에 저장되었습니다.")
+def run_continuous_batch():
+    """한 번 수집합니다. run_pipeline 의 결과(단계별 통계, 임베딩 건수, 목록별 통계, 저장 권수, 소요 시간)를 돌려줍니다."""
+    print(f"🚀 [Continuous Batch] 이어달리기 수집을 시작합니다... (mode={BATCH_MODE}, {', '.join(BATCH_QUERY_TYPES)})")
+
+    stats, counts, by_type, written, elapsed = asyncio.run(run_pipeline())
+    total_new_books = stats["write"].books
+
+    print(f"\n🎉 [완료] 총 {total_new_books}권이 추가되었습니다. ({elapsed:.1f}s, {total_new_books / elapsed:.1f} books/sec)")
+    print(f"   🧠 신규/변경 임베딩: {counts['embedded']}권 | ♻️ 변경 없음(메타데이터만 갱신): {counts['skipped']}권")
+    for s in stats.values():
+        print(f"   📊 {s}")
+    for qt, s in by_type.items():
+        if s.books or qt in written:
+            print(f"   📈 [{qt}] 저장 {written.get(qt, 0)}권 ({written.get(qt, 0) / elapsed:.1f} books/sec) | 수집 {s}")
+    print(f"💾 현재 상태가 '{STATE_FILE}'에 저장되었습니다.")
+    # 바뀐 책이 있거나 아직 스냅샷이 없을 때만 (새 디렉터리에 쓰고 CURRENT 를 바꾸므로 서버는 다음 검색부터 새 스냅샷을 씀)
+    if BATCH_EXPORT_SNAPSHOT and (total_new_books or snapshot.current() is None):
+        snapshot.export_snapshot(get_collection())
+    return stats, counts, by_type, written, elapsed
+
+
+def main():
+    if BATCH_INTERVAL_MINUTES <= 0:
+        run_continuous_batch()
+        return
+    # 주기 실행: 한 번 끝난 시점부터 간격을 재므로 실행이 길어져도 겹치지 않습니다.
+    while True:
+        run_continuous_batch()
+        print(f"⏰ {BATCH_INTERVAL_MINUTES:g}분 후 다시 실행합니다.")
+        time.sleep(BATCH_INTERVAL_MINUTES * 60)
 
 
 if __name__ == "__main__":
-    run_continuous_batch()
\ No newline at end of file
+    main()
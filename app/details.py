@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from dotenv import load_dotenv
+from app.store import CHROMA_DB_PATH
+
+load_dotenv()
+# 도서 상세 저장소: 알라딘 item 원본(JSON, zlib 압축)을 ISBN 별로 보관합니다.
+# 배치 작업이 목록 응답을 일괄 저장하고, MCP 서버는 목차/책소개가 없는 책만 ItemLookUp 으로 채웁니다.
+DETAILS_DB_PATH = os.getenv("DETAILS_DB_PATH", os.path.join(CHROMA_DB_PATH, "details.sqlite3"))
+# 상세 조회 시 ItemLookUp 에 요청할 부가 정보 (목차, 책소개, 전체 설명, 저자, 평점)
+DETAIL_OPT_RESULT = os.getenv("DETAIL_OPT_RESULT", "Toc,Story,fulldescription,authors,ratingInfo")
+
+
+class DetailStore:
+    """
+    ISBN → 알라딘 item 원본 (SQLite 한 파일).
+    full=1 은 ItemLookUp(DETAIL_OPT_RESULT) 결과, full=0 은 목록(ItemList) 응답이라 목차 등이 없는 상태입니다.
+    배치 작업(쓰기)과 MCP 서버(읽기)가 동시에 열 수 있도록 WAL 모드를 씁니다.
+    """
+
+    def __init__(self, path: str = DETAILS_DB_PATH):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self.reads = self.hits = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS details ("
+                "isbn TEXT PRIMARY KEY, payload BLOB NOT NULL, full INTEGER NOT NULL, fetched_at INTEGER NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def put_many(self, items: list[dict], full: bool):
+        """item 들을 저장합니다. 목록 응답(full=False)은 이미 있는 상세(full=1) 항목을 덮어쓰지 않습니다."""
+        rows = [
+            (item["isbn13"], zlib.compress(json.dumps(item, ensure_ascii=False).encode("utf-8")), int(full),
+             int(time.time()))
+            for item in items if item.get("isbn13")
+        ]
+        if not rows:
+            return
+        sql = "INSERT INTO details (isbn, payload, full, fetched_at) VALUES (?, ?, ?, ?) ON CONFLICT(isbn) DO UPDATE SET " \
+              "payload=excluded.payload, full=excluded.full, fetched_at=excluded.fetched_at"
+        if not full:
+            sql += " WHERE details.full = 0"
+        with self._lock, self.conn:
+            self.conn.executemany(sql, rows)
+
+    def get_many(self, isbns: list) -> dict:
+        """ISBN → (item, full, fetched_at). 한 번의 쿼리로 읽습니다."""
+        isbns = list(dict.fromkeys(isbns))
+        if not isbns:
+            return {}
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT isbn, payload, full, fetched_at FROM details WHERE isbn IN ({','.join('?' * len(isbns))})",
+                isbns,
+            ).fetchall()
+        self.reads += len(isbns)
+        self.hits += len(rows)
+        return {isbn: (json.loads(zlib.decompress(payload)), bool(full), fetched_at)
+                for isbn, payload, full, fetched_at in rows}
+
+    def stats(self) -> dict:
+        with self._lock:
+            total, full = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(full), 0) FROM details").fetchone()
+        return {"rows": total, "full": full, "reads": self.reads, "hits": self.hits}
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# 프로세스 전역 공유 저장소 (연결은 처음 사용할 때 엽니다)
+detail_store = DetailStore()
@@ -0,0 +1,197 @@
+import os
+import time
+import asyncio
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+load_dotenv()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+# torch: 기본 PyTorch / onnx: ONNX Runtime / onnx-int8: int8 양자화 ONNX (콜드 스타트·메모리 절감)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "1") == "1"  # 서버 시작 시 백그라운드에서 미리 로드
+
+# 마이크로 배칭: 짧은 시간(max wait) 안에 들어온 질의들을 한 번에 임베딩합니다.
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))  # 동시에 돌릴 배치 수 (torch 는 추론 중 GIL 을 놓음)
+
+_model = None
+_lock = threading.Lock()
+_ready = threading.Event()
+_load_seconds: float | None = None
+_load_error: str | None = None
+
+
+def _load():
+    # sentence_transformers(torch) import 자체가 무거우므로 실제로 필요할 때까지 미룹니다.
+    from sentence_transformers import SentenceTransformer
+
+    kwargs = {}
+    if EMBEDDING_BACKEND == "onnx":
+        kwargs["backend"] = "onnx"
+    elif EMBEDDING_BACKEND == "onnx-int8":
+        kwargs.update(backend="onnx", model_kwargs={"file_name": EMBEDDING_ONNX_INT8_FILE})
+    elif EMBEDDING_BACKEND != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {EMBEDDING_BACKEND}")
+    return SentenceTransformer(EMBEDDING_MODEL, device="cpu", **kwargs)
+
+
+def get_model():
+    """프로세스 전역 임베딩 모델 (처음 호출될 때 한 번만 로드)"""
+    global _model, _load_seconds, _load_error
+    if _model is None:
+        with _lock:
+            if _model is None:
+                started = time.perf_counter()
+                print(f"🧠 Loading embedding model: {EMBEDDING_MODEL} ({EMBEDDING_BACKEND})")
+                try:
+                    _model = _load()
+                except Exception as e:
+                    _load_error = str(e)
+                    raise
+                _load_seconds = time.perf_counter() - started
+                _ready.set()
+                print(f"✅ Embedding model ready ({_load_seconds:.1f}s)")
+    return _model
+
+
+def encode(texts: list[str]) -> list[np.ndarray]:
+    embeddings = get_model().encode(list(texts), convert_to_numpy=True)
+    return [np.asarray(e, dtype=np.float32) for e in embeddings]
+
+
+def warm_up(background: bool = True):
+    """모델을 미리 로드하고 한 번 추론해 둡니다. background=True 면 즉시 반환합니다."""
+
+    def run():
+        try:
+            encode(["warm up"])
+        except Exception as e:
+            print(f"❌ Embedding warm-up failed: {e}")
+
+    if background:
+        threading.Thread(target=run, name="embedding-warmup", daemon=True).start()
+    else:
+        run()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def status() -> dict:
+    return {"model": EMBEDDING_MODEL, "backend": EMBEDDING_BACKEND, "ready": is_ready(),
+            "load_seconds": _load_seconds, "error": _load_error}
+
+
+class EmbeddingBatcher:
+    """
+    비동기 질의 임베딩 실행기.
+    embed() 로 들어온 질의를 큐에 모았다가 (최대 max_batch 개, 최대 max_wait_ms 대기) 스레드 풀에서 한 번에
+    encode 하고, 각 벡터를 호출자에게 돌려줍니다. 워커가 모두 바쁘면 그동안 큐에 쌓인 만큼 배치가 커집니다.
+    """
+
+    def __init__(self, max_batch: int = EMBEDDING_MAX_BATCH, max_wait_ms: float = EMBEDDING_MAX_WAIT_MS,
+                 workers: int = EMBEDDING_WORKERS):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(workers)
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="embed")
+        self._task: asyncio.Task | None = None
+        self.batches = self.items = 0
+
+    async def embed(self, text: str) -> np.ndarray:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, fut))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: list):
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                self._executor, encode, [text for text, _ in batch])
+            self.batches += 1
+            self.items += len(batch)
+            for (_, fut), vec in zip(batch, vectors):
+                if not fut.done():
+                    fut.set_result(vec)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "items": self.items,
+                "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0}
+
+
+_batcher: EmbeddingBatcher | None = None
+_batcher_loop = None
+
+
+def get_batcher() -> EmbeddingBatcher:
+    """현재 이벤트 루프용 공유 배처 (asyncio 큐는 루프에 묶이므로 루프가 바뀌면 새로 만듭니다)."""
+    global _batcher, _batcher_loop
+    loop = asyncio.get_running_loop()
+    if _batcher is None or _batcher_loop is not loop:
+        _batcher, _batcher_loop = EmbeddingBatcher(), loop
+    return _batcher
+
+
+def batcher_stats() -> dict:
+    return _batcher.stats() if _batcher is not None else {"batches": 0, "items": 0, "avg_batch": 0.0}
+
+
+class LazySentenceTransformerEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """
+    Chroma 용 임베딩 함수. 기존 컬렉션 설정(sentence_transformer)과 호환되도록 같은 이름/설정을 쓰지만,
+    생성 시 모델을 로드하지 않고 이 모듈의 공유 모델에 위임합니다.
+    """
+
+    def __init__(self):
+        self.model_name = EMBEDDING_MODEL
+        self.device = "cpu"
+        self.normalize_embeddings = False
+        self.kwargs = {}
+
+    @property
+    def _model(self):
+        return get_model()
+
+    def __call__(self, input):
+        return encode(input)
+
+    @staticmethod
+    def build_from_config(config: dict) -> "LazySentenceTransformerEmbeddingFunction":
+        # Chroma 가 컬렉션 생성 시 설정 검증용으로 호출합니다. 기본 구현은 여기서 모델을 즉시 로드합니다.
+        return LazySentenceTransformerEmbeddingFunction()
+
+
+embedding_function = LazySentenceTransformerEmbeddingFunction()
@@ -0,0 +1,153 @@
+import time
+import asyncio
+from collections import OrderedDict
+
+FRESH, CACHED, STALE = "fresh", "cached", "stale"
+
+
+class CacheResult:
+    """캐시 조회 결과 한 건 (값 + 나이 + 출처)"""
+    __slots__ = ("value", "age", "state")
+
+    def __init__(self, value, age: float, state: str):
+        self.value = value
+        self.age = age
+        self.state = state
+
+
+class TTLCache:
+    """
+    TTL + LRU 캐시. 여러 키를 한꺼번에 조회하면서
+    - TTL 이내 항목은 캐시에서 바로 반환 (cached)
+    - 다른 요청이 이미 가져오는 중인 키는 그 요청을 기다림 (coalescing)
+    - 나머지 miss 만 모아서 loader 를 한 번 호출 (fresh)
+    - loader 가 실패하면 TTL 이 지났더라도 stale_ttl 이내의 마지막 값을 반환 (stale)
+    """
+
+    def __init__(self, ttl: float, maxsize: int, stale_ttl: float):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self._data: OrderedDict = OrderedDict()  # key -> (value, fetched_at)
+        self._inflight: dict = {}  # key -> Future
+        self.hits = self.misses = self.coalesced = self.stale_served = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _lookup(self, key, max_age: float):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        age = time.monotonic() - entry[1]
+        if age > max_age:
+            return None
+        self._data.move_to_end(key)
+        return entry[0], age
+
+    def peek(self, key, max_age: float | None = None) -> CacheResult | None:
+        """loader 호출 없이 캐시만 조회합니다 (기본: stale 허용)."""
+        found = self._lookup(key, self.stale_ttl if max_age is None else max_age)
+        if found is None:
+            return None
+        value, age = found
+        return CacheResult(value, age, CACHED if age <= self.ttl else STALE)
+
+    def put(self, key, value):
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get_many(self, keys: list, loader) -> dict:
+        """keys 에 대한 CacheResult 맵. loader(miss_keys) -> {key: value} 는 miss 가 있을 때 한 번만 호출됩니다."""
+        results, waiting, misses = {}, {}, []
+        for key in dict.fromkeys(keys):
+            found = self._lookup(key, self.ttl)
+            if found is not None:
+                self.hits += 1
+                results[key] = CacheResult(found[0], found[1], CACHED)
+            elif key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[key]
+            else:
+                self.misses += 1
+                misses.append(key)
+
+        if misses:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in misses}
+            self._inflight.update(futures)
+            loaded = {}
+            try:
+                loaded = await loader(misses)
+            except Exception as e:
+                print(f"⚠️ Cache loader failed: {e}")
+            finally:
+                # 취소되더라도 기다리는 요청들이 멈추지 않도록 항상 future 를 완료시킵니다.
+                for key, fut in futures.items():
+                    self._inflight.pop(key, None)
+                    value = loaded.get(key)
+                    if value is not None:
+                        self.put(key, value)
+                        results[key] = CacheResult(value, 0.0, FRESH)
+                    if not fut.done():
+                        fut.set_result(value)
+
+        for key, fut in waiting.items():
+            # shield: 기다리던 요청이 취소되어도 공유 future 는 취소되지 않게
+            value = await asyncio.shield(fut)
+            if value is not None:
+                results[key] = CacheResult(value, 0.0, FRESH)
+
+        # 끝내 값을 얻지 못한 키는 만료된(stale) 값이라도 반환
+        for key in keys:
+            if key not in results:
+                stale = self.peek(key)
+                if stale is not None:
+                    self.stale_served += 1
+                    results[key] = CacheResult(stale.value, stale.age, STALE)
+        return results
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data), "hits": self.hits, "misses": self.misses,
+            "coalesced": self.coalesced, "stale_served": self.stale_served,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class LRUCache:
+    """만료 없는 단순 LRU 캐시 (쿼리 임베딩, 검색 결과 캐시용)"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
@@ -0,0 +1,76 @@
+import numpy as np
+from functools import cached_property
+
+
+def to_int_date(value) -> int | None:
+    """날짜 → YYYYMMDD 정수 (예: "2023-01-21" → 20230121, 해석할 수 없으면 None)"""
+    digits = str(value).replace("-", "")
+    return int(digits) if digits.isdigit() else None
+
+
+def category_matches(stored: str, wanted: str) -> bool:
+    """분야 필터: 전체 경로가 같거나 경로의 한 단계와 같으면 일치 (예: "경제경영" ↔ "국내도서>경제경영>마케팅")"""
+    return stored == wanted or wanted in stored.split(">")
+
+
+class MetadataColumns:
+    """
+    books 메타데이터의 열 지향 인덱스 (가격/평점/출간일/분야).
+    필터를 NumPy 마스크로 한 번에 계산해, 조건에 맞는 후보 ID 집합과 선택도를 미리 알 수 있게 합니다.
+    행 순서는 생성 시 받은 ids 와 같습니다 (BM25Index 와 같은 순서로 만들면 doc index 를 그대로 공유).
+    """
+
+    def __init__(self, ids: list, metas: list):
+        self.ids = ids
+        self.price = np.array([m.get("price") or 0 for m in metas], dtype=np.int64)
+        self.rating = np.array([m.get("rating") or 0 for m in metas], dtype=np.float32)
+        self.pub_date = np.array([m.get("pub_date") or 0 for m in metas], dtype=np.int64)
+        categories = [m.get("category") or "" for m in metas]
+        self.category_names = list(dict.fromkeys(categories))
+        codes = {name: c for c, name in enumerate(self.category_names)}
+        self.category = np.array([codes[name] for name in categories], dtype=np.int32)
+
+    @classmethod
+    def from_arrays(cls, ids, price, rating, pub_date, category, category_names: list) -> "MetadataColumns":
+        """이미 만들어진 열 배열로 (스냅샷의 메모리 맵 배열을 복사 없이 그대로 씀)"""
+        columns = cls.__new__(cls)
+        columns.ids, columns.price, columns.rating, columns.pub_date = ids, price, rating, pub_date
+        columns.category, columns.category_names = category, list(category_names)
+        return columns
+
+    @cached_property
+    def rows(self) -> dict:
+        """ID → 행 번호"""
+        return {i: r for r, i in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mask(self, filters: dict | None) -> np.ndarray | None:
+        """filters(max_price, category_name, min_rating, min_pub_date) 를 만족하는 행 마스크. 조건이 없으면 None"""
+        if not filters: return None
+        mask = None
+
+        def narrow(cond):
+            nonlocal mask
+            mask = cond if mask is None else mask & cond
+
+        if filters.get("max_price"):
+            narrow(self.price <= int(filters["max_price"]))
+        if filters.get("category_name"):
+            wanted = str(filters["category_name"])
+            codes = [c for c, name in enumerate(self.category_names) if category_matches(name, wanted)]
+            narrow(np.isin(self.category, codes))
+        if filters.get("min_rating"):
+            narrow(self.rating >= float(filters["min_rating"]))
+        if filters.get("min_pub_date"):
+            min_date = to_int_date(filters["min_pub_date"])
+            if min_date is not None:
+                narrow(self.pub_date >= min_date)
+        return mask
+
+    def candidate_ids(self, mask: np.ndarray) -> list:
+        return [self.ids[r] for r in np.flatnonzero(mask)]
+
+    def stats(self) -> dict:
+        return {"rows": len(self.ids), "categories": len(self.category_names)}
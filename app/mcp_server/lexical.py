@@ -0,0 +1,211 @@
+import re
+import math
+import heapq
+import unicodedata
+import numpy as np
+from collections import defaultdict
+
+# 필드별 가중치 (제목이 일치하는 것이 저자/분야보다 중요)
+FIELD_WEIGHTS = {"title": 3.0, "author": 2.0, "category": 1.0}
+
+_WORD = re.compile(r"[가-힣]+|[^\W_가-힣]+")
+_HANGUL = re.compile(r"[가-힣]")
+# 핵심어 추출용: 어절 끝에서 떼어 낼 조사/어미 (긴 것부터)와 뜻이 약한 단어
+_PARTICLES = sorted("은 는 이 가 을 를 의 에 에서 에게 께 으로 로 와 과 도 만 까지 부터 보다 처럼 이나 나 이란 이라는 라는 "
+                    "으로서 로서 하는 하고 하며 했던 적인 들".split(), key=len, reverse=True)
+_SHORT_PARTICLES = frozenset("은 는 을 를".split())  # 한 음절 단어에 붙어도 떼는 조사 ("책은" → "책")
+_STOPWORDS = frozenset("그 이 저 것 수 등 위한 위해 통해 대한 대해 있는 없는 모든 우리 가장 그리고 하지만 또한 바로 "
+                       "이번 지금 다시 함께 어떻게 무엇 the and for with from that this".split())
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    한국어 친화 토크나이저. 한글은 띄어쓰기/조사와 무관하게 매칭되도록 음절 bigram 으로,
+    그 외(영문/숫자)는 단어 단위로 자릅니다. 예) "해리포터와 마법사" → 해리 리포 포터 터와 마법 법사
+    """
+    tokens = []
+    for word in _WORD.findall(unicodedata.normalize("NFC", text or "").lower()):
+        if _HANGUL.match(word) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def content_words(text: str) -> list[str]:
+    """
+    핵심어 후보 단어들. 어절 끝 조사/어미를 떼고 불용어, 숫자로 시작하는 말(연도 등), 한 글자 단어를 뺍니다.
+    예) "2025년 트렌드를 다룬 책은" → 트렌드 다룬
+    """
+    words = []
+    for word in _WORD.findall(unicodedata.normalize("NFC", text or "").lower()):
+        if _HANGUL.match(word):
+            for p in _PARTICLES:
+                stem = len(word) - len(p)
+                if word.endswith(p) and (stem >= 2 or (stem == 1 and p in _SHORT_PARTICLES)):
+                    word = word[:stem]
+                    break
+        if len(word) > 1 and word not in _STOPWORDS and not word[0].isdigit():
+            words.append(word)
+    return words
+
+
+def _field_text(meta: dict, field: str) -> str:
+    value = str(meta.get(field, ""))
+    if field == "category" and ">" in value:
+        # 분야 경로의 최상위("국내도서>")는 거의 모든 책에 같아서 색인하지 않습니다
+        # ("도서" bigram 이 모든 문서에 걸려 "추천 도서" 같은 질의가 전체 posting 을 훑게 됨)
+        value = value.split(">", 1)[1]
+    return value
+
+
+def weighted_terms(meta: dict) -> tuple[dict, float]:
+    """문서 하나의 (term → 필드 가중 tf, 가중 길이)"""
+    tf, length = {}, 0.0
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in tokenize(_field_text(meta, field)):
+            tf[term] = tf.get(term, 0.0) + weight
+            length += weight
+    return tf, length
+
+
+def _bm25_idf(total: int, df: int) -> float:
+    return math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+
+class BM25Index:
+    """
+    books 메타데이터(제목/저자/분야) 위의 BM25 역색인.
+    필드 가중치를 곱한 term frequency 를 쓰는 단순화된 BM25F 입니다.
+    """
+
+    def __init__(self, ids: list, metas: list, k1: float = 1.2, b: float = 0.75):
+        self.ids = ids
+        self.metas = metas
+        self.k1 = k1
+        self.b = b
+        self.postings: dict = defaultdict(dict)  # term -> {doc index: 가중 tf}
+        self.lengths = []
+        for d, meta in enumerate(metas):
+            tf, length = weighted_terms(meta)
+            for term, w in tf.items():
+                self.postings[term][d] = w
+            self.lengths.append(length)
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def meta(self, d: int) -> dict:
+        return self.metas[d]
+
+    def search(self, query: str, n: int, allowed=None, min_match: float = 0.0) -> list[tuple[int, float]]:
+        """
+        (doc index, score) 상위 n 개.
+        allowed(doc index 별 bool 마스크)가 False 인 문서는 제외하고, 질의 토큰 중 min_match 비율 이상 일치한 문서만 남깁니다.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.ids:
+            return []
+        scores, matched = defaultdict(float), defaultdict(int)
+        total = len(self.ids)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = _bm25_idf(total, len(postings))
+            for d, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[d] / self.avg_length)
+                scores[d] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[d] += 1
+        need = min_match * len(terms)
+        candidates = (
+            (d, s) for d, s in scores.items()
+            if matched[d] >= need and (allowed is None or allowed[d])
+        )
+        return heapq.nlargest(n, candidates, key=lambda x: x[1])
+
+    def stats(self) -> dict:
+        return {"docs": len(self.ids), "terms": len(self.postings)}
+
+
+class PostingsBuilder:
+    """문서를 하나씩 받아 역색인을 CSR 배열(terms/offsets/docs/tfs/lengths)로 만듭니다 (스냅샷 저장용)."""
+
+    def __init__(self):
+        self.postings: dict = defaultdict(list)  # term -> [(doc index, 가중 tf)]
+        self.lengths = []
+
+    def add(self, meta: dict):
+        d = len(self.lengths)
+        tf, length = weighted_terms(meta)
+        for term, w in tf.items():
+            self.postings[term].append((d, w))
+        self.lengths.append(length)
+
+    def arrays(self) -> dict:
+        terms = sorted(self.postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(self.postings[t]) for t in terms])
+        docs = np.fromiter((d for t in terms for d, _ in self.postings[t]), dtype=np.int32, count=int(offsets[-1]))
+        tfs = np.fromiter((w for t in terms for _, w in self.postings[t]), dtype=np.float32, count=int(offsets[-1]))
+        width = max((len(t) for t in terms), default=1)
+        return {"terms": np.array(terms, dtype=f"U{width}"), "offsets": offsets, "docs": docs, "tfs": tfs,
+                "lengths": np.array(self.lengths, dtype=np.float32)}
+
+
+class PackedBM25Index:
+    """
+    CSR 배열(보통 스냅샷의 메모리 맵)로 된 BM25 역색인. BM25Index 와 점수/인터페이스가 같지만
+    문서별 파이썬 객체를 만들지 않고, 메타데이터는 meta_fn 으로 필요한 행만 읽습니다 (워커끼리 페이지 공유).
+    """
+
+    def __init__(self, ids, arrays: dict, meta_fn, k1: float = 1.2, b: float = 0.75):
+        self.ids = ids
+        self.terms, self.offsets = arrays["terms"], arrays["offsets"]
+        self.docs, self.tfs, self.lengths = arrays["docs"], arrays["tfs"], arrays["lengths"]
+        self.meta = meta_fn
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(np.mean(self.lengths)) if len(self.lengths) else 0.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query: str, n: int, allowed=None, min_match: float = 0.0) -> list[tuple[int, float]]:
+        """BM25Index.search 와 같은 결과를 NumPy 로 (질의 토큰별 posting 구간만 읽음)"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not len(self.ids) or not len(self.terms):
+            return []
+        total = len(self.ids)
+        found_docs, found_scores = [], []
+        for term, p in zip(terms, np.searchsorted(self.terms, terms)):
+            if p >= len(self.terms) or self.terms[p] != term:
+                continue
+            start, end = int(self.offsets[p]), int(self.offsets[p + 1])
+            docs, tf = np.asarray(self.docs[start:end]), np.asarray(self.tfs[start:end], dtype=np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[docs] / self.avg_length)
+            found_docs.append(docs)
+            found_scores.append(_bm25_idf(total, end - start) * tf * (self.k1 + 1) / (tf + norm))
+        if not found_docs:
+            return []
+        docs, inverse = np.unique(np.concatenate(found_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(found_scores))
+        keep = np.bincount(inverse) >= min_match * len(terms)
+        if allowed is not None:
+            keep &= np.asarray(allowed)[docs]
+        docs, scores = docs[keep], scores[keep]
+        top = np.argsort(-scores, kind="stable")[:n]
+        return [(int(docs[i]), float(scores[i])) for i in top]
+
+    def stats(self) -> dict:
+        return {"docs": len(self.ids), "terms": len(self.terms)}
+
+
+def reciprocal_rank_fusion(rankings: list[list], k: int = 60) -> list:
+    """여러 순위 목록(id 리스트)을 RRF 로 합칩니다. score = Σ 1 / (k + rank)"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
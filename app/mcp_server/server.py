@@ -1,17 +1,35 @@
+import os
+import time
 import uvicorn
 import mcp.types as types
+from contextlib import asynccontextmanager
 from mcp.server import Server
 from mcp.server.sse import SseServerTransport
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from app.mcp_server.tools import (
     search_books_by_context, search_book_specifically,
-    get_book_details, get_system_status
+    get_book_details, get_system_status, RESULT_FIELDS
 )
+from app.aladin import aladin
+from app.details import detail_store
+from app import embeddings, metrics
 
-app = FastAPI(title="Aladin Book MCP Server")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 모델 로드는 백그라운드에서: 서버는 바로 요청을 받고, status 도구가 준비 여부를 알려줍니다.
+    if embeddings.EMBEDDING_WARMUP:
+        embeddings.warm_up(background=True)
+    yield
+    await aladin.aclose()  # 알라딘 keep-alive 커넥션 풀 정리
+    detail_store.close()
+
+app = FastAPI(title="Aladin Book MCP Server", lifespan=lifespan)
 mcp_server = Server("AladinBookServer")
 sse = SseServerTransport("/messages")
 
+TOOL_REQUESTS = metrics.Counter("mcp_tool_requests_total", "MCP tool requests handled", ("tool", "status"))
+
 @mcp_server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     return [
@@ -31,31 +49,61 @@ async def handle_list_tools() -> list[types.Tool]:
                             "min_rating": {"type": "number", "description": "최소 평점 (0~10)"},
                             "min_pub_date": {"type": "string", "description": "YYYY-MM-DD 이후 출간"}
                         }
-                    }
+                    },
+                    "format": {"type": "string", "enum": ["text", "compact"],
+                               "description": "compact: 필드 헤더 + 한 줄에 한 권인 표"},
+                    "fields": {"type": "array", "items": {"type": "string", "enum": list(RESULT_FIELDS)},
+                               "description": "compact 결과에 담을 열 (생략하면 기본 열)"}
                 },
                 "required": ["query"]
             },
         ),
         types.Tool(
             name="get_details",
-            description="ISBN으로 상세 정보 조회",
-            inputSchema={"type": "object", "properties": {"isbn": {"type": "string"}}, "required": ["isbn"]},
+            description="ISBN으로 상세 정보(책 소개, 목차 등) 조회. 여러 권이면 isbns 에 한 번에 넣으세요.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "isbns": {"type": "array", "items": {"type": "string"}, "description": "ISBN13 목록 (최대 10개)"},
+                    "isbn": {"type": "string", "description": "ISBN13 하나 (isbns 대신 사용 가능)"}
+                }
+            },
         ),
         types.Tool(name="status", description="상태 확인", inputSchema={"type": "object", "properties": {}})
     ]
 
 @mcp_server.call_tool()
 async def handle_call_tool(name: str, arguments: dict | None) -> list[types.TextContent]:
+    # API 가 _meta 로 넘긴 trace id 를 이어받아, 이 호출 안의 단계(embed/chroma/aladin...)를 같은 trace 로 기록
+    meta = mcp_server.request_context.meta
+    metrics.start_trace(getattr(meta, "trace_id", None) if meta else None)
+    started = time.perf_counter()
+    status = "error"
+    try:
+        result = await _dispatch_tool(name, arguments or {})
+        status = "ok"
+        return result
+    finally:
+        metrics.record(f"tool.{name}", time.perf_counter() - started)
+        TOOL_REQUESTS.inc(tool=name, status=status)
+        if name != "status":  # 헬스 체크는 로그에서 제외
+            print(f"🧭 {name} {metrics.trace_summary()}")
+
+
+async def _dispatch_tool(name: str, arguments: dict) -> list[types.TextContent]:
     if name == "search_books":
         q = arguments.get("query")
         stype = arguments.get("search_type", "context")
         filters = arguments.get("filters", {})
-        res = search_book_specifically(q, filters) if stype == "keyword" else search_books_by_context(q, filters)
+        fmt, fields = arguments.get("format", "text"), arguments.get("fields")
+        res = await (search_book_specifically(q, filters, fmt, fields) if stype == "keyword"
+                     else search_books_by_context(q, filters, fmt, fields))
         return [types.TextContent(type="text", text=res)]
     elif name == "get_details":
-        return [types.TextContent(type="text", text=get_book_details(arguments["isbn"]))]
+        isbns = arguments.get("isbns") or [arguments.get("isbn", "")]
+        return [types.TextContent(type="text", text=await get_book_details(isbns))]
     elif name == "status":
-        return [types.TextContent(type="text", text=get_system_status())]
+        return [types.TextContent(type="text", text=await get_system_status())]
     raise ValueError(f"Unknown tool: {name}")
 
 # SSE Endpoints
@@ -69,5 +117,11 @@ async def handle_messages(request: Request):
 app.add_route("/sse", handle_sse, methods=["GET"])
 app.add_route("/messages", handle_messages, methods=["POST"])
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus 스크레이프용 지표 (도구/단계별 지연, 캐시 적중률, 폴백 횟수)"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8081)
\ No newline at end of file
+    # 한 호스트에 워커 여러 개를 띄울 때는 MCP_PORT 를 달리해서 (벡터 스냅샷 페이지는 워커끼리 공유)
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("MCP_PORT", "8081")))
\ No newline at end of file
@@ -1,129 +1,455 @@
 import os
-import requests
-import chromadb
-from chromadb.utils import embedding_functions
+import json
+import time
+import asyncio
+import math
+import re
+import hashlib
+import unicodedata
+import numpy as np
+from collections import Counter
 from dotenv import load_dotenv
+from app import embeddings, metrics, snapshot
+from app.aladin import aladin
+from app.store import books_version, get_collection
+from app.details import detail_store, DETAIL_OPT_RESULT
+from app.mcp_server.cache import TTLCache, LRUCache, FRESH, CACHED, STALE
+from app.mcp_server.lexical import BM25Index, PackedBM25Index, content_words, reciprocal_rank_fusion
+from app.mcp_server.columns import MetadataColumns, to_int_date
 
 load_dotenv()
-ALADIN_TTB_KEY = os.getenv("ALADIN_API_KEY")
-CHROMA_DB_PATH = "./chroma_db"
-
-chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="paraphrase-multilingual-MiniLM-L12-v2"
-)
-collection = chroma_client.get_or_create_collection(
-    name="books", embedding_function=sentence_transformer_ef
-)
-
-
-def _build_chroma_filter(filters: dict) -> dict:
-    """필터 조건 생성 (가격, 카테고리, 평점, 출간일)"""
-    if not filters: return None
-    conditions = []
-
-    if filters.get("max_price"):
-        conditions.append({"price": {"$lte": int(filters["max_price"])}})
-    if filters.get("category_name"):
-        conditions.append({"category": filters["category_name"]})
-    if filters.get("min_rating"):
-        conditions.append({"rating": {"$gte": float(filters["min_rating"])}})
-
-    # [수정] 날짜 필터 처리 (String -> Int 변환)
-    if filters.get("min_pub_date"):
-        # "2023-01-21" 같은 문자열에서 하이픈 제거 후 숫자로 변환
-        date_str = filters["min_pub_date"].replace("-", "")
-        if date_str.isdigit():
-            conditions.append({"pub_date": {"$gte": int(date_str)}})
-
-    if not conditions: return None
-    if len(conditions) == 1: return conditions[0]
-    return {"$and": conditions}
-
-
-def fetch_realtime_infos(isbns: list) -> dict:
-    """[Hybrid] 여러 ISBN의 최신 정보(가격, 판매지수, 중고재고)를 API로 조회"""
-    if not isbns: return {}
-    url = "http://www.aladin.co.kr/ttb/api/ItemLookUp.aspx"
-    params = {
-        "ttbkey": ALADIN_TTB_KEY,
-        "ItemId": ",".join(isbns),
-        "ItemIdType": "ISBN13",
-        "Output": "js",
-        "Version": "20131101",
-        "OptResult": "usedList"  # 👈 [중요] ebookList -> usedList로 변경해야 중고 정보가 옵니다.
-    }
-    realtime_map = {}
+
+# 실시간 가격/중고재고 캐시 (가격은 분 단위로 변하므로 짧은 TTL 로 충분)
+REALTIME_CACHE_TTL = float(os.getenv("REALTIME_CACHE_TTL", "300"))
+REALTIME_CACHE_MAX = int(os.getenv("REALTIME_CACHE_MAX", "5000"))
+REALTIME_STALE_TTL = float(os.getenv("REALTIME_STALE_TTL", "86400"))  # API 장애 시 이 시간까지는 이전 값을 사용
+realtime_cache = TTLCache(REALTIME_CACHE_TTL, REALTIME_CACHE_MAX, REALTIME_STALE_TTL)
+# 검색 응답에서 실시간 병합에 기다려줄 최대 시간. 넘기면 마지막으로 알려진 값으로 응답하고 갱신은 백그라운드에서 계속합니다.
+REALTIME_BUDGET = float(os.getenv("REALTIME_BUDGET", "0.8"))
+_background_refreshes: set[asyncio.Task] = set()
+budget_timeouts = 0
+
+# 맥락 검색 캐시: 정규화된 질의 → 임베딩, (임베딩, where, n_results) → Chroma 결과
+# 결과 캐시는 배치 작업이 books 컬렉션을 갱신하면(books.version 변경) 비워집니다.
+QUERY_EMBED_CACHE_MAX = int(os.getenv("QUERY_EMBED_CACHE_MAX", "4096"))
+SEARCH_RESULT_CACHE_MAX = int(os.getenv("SEARCH_RESULT_CACHE_MAX", "1024"))
+embedding_cache = LRUCache(QUERY_EMBED_CACHE_MAX)
+result_cache = LRUCache(SEARCH_RESULT_CACHE_MAX)
+_result_cache_version = books_version()
+
+# 하이브리드 검색: 로컬 BM25(제목/저자/분야) + 벡터 검색을 RRF 로 합칩니다.
+# 역색인은 books 컬렉션 메타데이터로 만들고, 배치 작업이 books.version 을 갱신하면 백그라운드에서 다시 만듭니다.
+# 배치 작업은 쓸 때마다 버전을 올리므로 버전이 LOCAL_INDEX_REBUILD_DELAY 초 동안 그대로일 때(쓰기가 잠잠해졌을 때) 한 번 만들고,
+# 계속 쓰는 중이어도 LOCAL_INDEX_REBUILD_MAX_DELAY 초가 지나면 만듭니다. 그동안은 이전 인덱스로 검색합니다.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # 각 검색에서 가져올 후보 수
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+LOCAL_INDEX_REBUILD_DELAY = float(os.getenv("LOCAL_INDEX_REBUILD_DELAY", "5"))
+LOCAL_INDEX_REBUILD_MAX_DELAY = float(os.getenv("LOCAL_INDEX_REBUILD_MAX_DELAY", "300"))
+LEXICAL_MIN_MATCH = float(os.getenv("LEXICAL_MIN_MATCH", "0.6"))  # 키워드 검색: 질의 토큰 중 일치해야 하는 비율
+# 필터 처리: 열 지향 메타데이터 인덱스로 후보 수를 먼저 센 뒤
+# - 후보가 PREFILTER_MAX_IDS 이하면 그 ID 집합 안에서만 벡터 검색 (pre-filter)
+# - 더 많으면 필터 없이 (n / 선택도 × OVERFETCH_FACTOR) 개를 가져와 거르고, 모자라면 두 배씩 늘려 다시 (최대 OVERFETCH_MAX)
+PREFILTER_MAX_IDS = int(os.getenv("PREFILTER_MAX_IDS", "5000"))
+OVERFETCH_FACTOR = float(os.getenv("OVERFETCH_FACTOR", "1.5"))
+OVERFETCH_MAX = int(os.getenv("OVERFETCH_MAX", "2000"))
+KEYWORD_FALLBACK_FETCH = int(os.getenv("KEYWORD_FALLBACK_FETCH", "50"))  # 필터가 있을 때 알라딘에서 받아올 결과 수
+# 벡터 검색 경로: chroma / snapshot (배치 작업이 내보낸 메모리 맵 스냅샷을 프로세스 안에서 NumPy 로 검색)
+# auto 는 스냅샷이 있으면 snapshot, 없으면 chroma. 스냅샷을 쓰면 로컬 인덱스도 스냅샷에서 만들어 Chroma 를 열지 않습니다.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "auto")
+
+# 로컬 인덱스 (BM25 역색인 + 메타데이터 열). 같은 행 순서로 함께 만들고 books 버전이 바뀌면 함께 다시 만듭니다.
+_lexical_index: BM25Index | PackedBM25Index | None = None
+_columns: MetadataColumns | None = None
+_lexical_version = None
+_lexical_lock = asyncio.Lock()
+_lexical_build_seconds = 0.0
+_lexical_rebuild: asyncio.Task | None = None
+_lexical_rebuilds = 0
+keyword_local_hits = keyword_fallbacks = 0
+filter_stats = {"prefilter": 0, "overfetch": 0, "overfetch_retries": 0, "snapshot": 0, "empty": 0}
+
+# 상세 조회: 한 번에 조회할 최대 ISBN 수, 항목별 최대 글자 수
+DETAILS_MAX_ISBNS = int(os.getenv("DETAILS_MAX_ISBNS", "10"))
+DETAILS_MAX_CHARS = int(os.getenv("DETAILS_MAX_CHARS", "600"))
+details_lookups = 0
+
+# 간결 결과(format="compact"): 필드 이름 헤더 한 줄 + 책마다 한 줄인 표로 돌려줘 LLM 프롬프트 토큰을 줄입니다.
+# 호출마다 fields 로 필요한 열만 고를 수 있고, 지정하지 않으면 COMPACT_FIELDS 를 씁니다.
+# src 는 가격/판매지수/중고 정보의 출처: live(방금 조회) / cache(실시간 캐시) / stale(API 지연으로 마지막 값) / db(배치 시점 값)
+RESULT_FIELDS = ("isbn", "title", "author", "category", "price", "used", "src", "rating", "sales", "pub_date",
+                 "keywords", "link")
+COMPACT_FIELDS = tuple(f.strip() for f in os.getenv(
+    "COMPACT_FIELDS", "isbn,title,author,price,used,src,rating,sales,keywords").split(",") if f.strip())
+COMPACT_KEYWORDS = int(os.getenv("COMPACT_KEYWORDS", "3"))  # 책 소개에서 뽑을 핵심어 수
+
+
+def _active_snapshot() -> snapshot.VectorSnapshot | None:
+    """VECTOR_BACKEND 에 따라 쓸 스냅샷 (chroma 경로면 None)"""
+    if VECTOR_BACKEND == "chroma":
+        return None
     try:
-        res = requests.get(url, params=params, timeout=3)
-        data = res.json()
-        for item in data.get('item', []):
-            # 중고 정보 파싱 (subInfo -> usedList)
-            sub_info = item.get('subInfo', {})
-            used_list = sub_info.get('usedList', {})
-
-            # 알라딘 직배송 중고 확인
-            aladin_used = used_list.get('aladinUsed', {})
-            used_count = aladin_used.get('itemCount', 0)
-            used_min_price = aladin_used.get('minPrice', 0)
-
-            realtime_map[item['isbn13']] = {
-                "price": item.get('priceSales', 0),
-                "sales_point": item.get('salesPoint', 0),
-                # "stock": item.get('stockStatus', ''), # 새책 재고는 보통 '예약판매' 아니면 다 있음
-                "used_count": used_count,  # 👈 중고 재고 수량
-                "used_price": used_min_price  # 👈 중고 최저가
-            }
+        snap = snapshot.current()
     except Exception as e:
-        print(f"⚠️ 실시간 조회 실패: {e}")
+        if VECTOR_BACKEND == "snapshot":
+            raise
+        print(f"⚠️ Snapshot error, Chroma 로 검색합니다: {e}")
+        return None
+    if snap is None and VECTOR_BACKEND == "snapshot":
+        raise RuntimeError(f"벡터 스냅샷이 없습니다 ({snapshot.SNAPSHOT_DIR}). 배치 작업을 먼저 실행하세요.")
+    return snap
+
+
+def _build_local_index(snap: snapshot.VectorSnapshot | None) -> tuple[BM25Index | PackedBM25Index, MetadataColumns]:
+    if snap is not None:
+        # 열과 역색인 모두 스냅샷의 메모리 맵 배열을 그대로 공유합니다 (메타데이터는 검색된 행만 읽음)
+        return snap.lexical_index(), snap.columns
+    found = get_collection().get(include=["metadatas"])
+    metas = [m or {} for m in found["metadatas"]]
+    return BM25Index(found["ids"], metas), MetadataColumns(found["ids"], metas)
+
+
+def _local_version(snap: snapshot.VectorSnapshot | None):
+    return f"snapshot:{snap.version}" if snap is not None else books_version()
+
+
+async def _build_and_swap():
+    """지금 버전으로 로컬 인덱스를 만든 뒤 (인덱스, 열) 을 한 번에 바꿉니다. 만드는 동안 검색은 이전 것을 씁니다."""
+    global _lexical_index, _columns, _lexical_version, _lexical_build_seconds
+    async with _lexical_lock:
+        snap = _active_snapshot()
+        version = _local_version(snap)
+        if _lexical_index is not None and version == _lexical_version:
+            return
+        started = time.perf_counter()
+        with metrics.span("local_index.build"):
+            built = await asyncio.to_thread(_build_local_index, snap)
+        _lexical_index, _columns = built
+        _lexical_version = version
+        _lexical_build_seconds = time.perf_counter() - started
+        print(f"🔤 Local index built: {len(_lexical_index)} books ({_lexical_build_seconds:.2f}s)")
+
+
+async def _rebuild_local_index():
+    """debounce: 버전이 바뀔 때마다 LOCAL_INDEX_REBUILD_DELAY 를 다시 기다렸다가 (최대 LOCAL_INDEX_REBUILD_MAX_DELAY) 한 번 빌드"""
+    global _lexical_rebuild, _lexical_rebuilds
+    try:
+        started = time.perf_counter()
+        seen = _local_version(_active_snapshot())
+        while True:
+            await asyncio.sleep(LOCAL_INDEX_REBUILD_DELAY)
+            version = _local_version(_active_snapshot())
+            if version == seen or time.perf_counter() - started >= LOCAL_INDEX_REBUILD_MAX_DELAY:
+                break
+            seen = version
+        await _build_and_swap()
+        _lexical_rebuilds += 1
+    except Exception as e:
+        print(f"⚠️ Local index rebuild failed, 이전 인덱스로 계속 검색합니다: {e}")
+    finally:
+        _lexical_rebuild = None
+
+
+async def _get_local_index() -> tuple[BM25Index | PackedBM25Index, MetadataColumns]:
+    """
+    로컬 인덱스 (인덱스, 열). 처음에는 만들어질 때까지 기다리고(동시 요청은 한 번의 빌드를 기다림),
+    이후 books 버전(스냅샷을 쓰면 스냅샷 버전)이 바뀌면 이전 인덱스를 바로 돌려주고 백그라운드에서 다시 만듭니다.
+    """
+    global _lexical_rebuild
+    if _lexical_index is None:
+        await _build_and_swap()
+    elif _local_version(_active_snapshot()) != _lexical_version and _lexical_rebuild is None:
+        _lexical_rebuild = asyncio.create_task(_rebuild_local_index())
+    return _lexical_index, _columns
+
+
+def _normalize_query(text: str) -> str:
+    """캐시 키용 정규화: 유니코드 NFC, 공백 정리, 소문자"""
+    return " ".join(unicodedata.normalize("NFC", text).split()).lower()
+
+
+async def _embed_query(query_text: str) -> np.ndarray:
+    key = _normalize_query(query_text)
+    emb = embedding_cache.get(key)
+    if emb is None:
+        # 동시에 들어온 질의들과 묶어서(마이크로 배칭) 이벤트 루프 밖 스레드 풀에서 임베딩
+        with metrics.span("embed"):
+            emb = await embeddings.get_batcher().embed(key)
+        embedding_cache.put(key, emb)
+    return emb
+
+
+async def _query_books(query_text: str, where: dict | None, n_results: int) -> dict:
+    """임베딩 캐시 + 결과 캐시를 거쳐 Chroma 를 조회합니다."""
+    global _result_cache_version
+    version = books_version()
+    if version != _result_cache_version:
+        result_cache.clear()
+        _result_cache_version = version
+
+    emb = await _embed_query(query_text)
+    # where 는 후보 ID 목록을 담을 수 있어 길어지므로 해시로 키를 만듭니다
+    where_key = hashlib.blake2b(json.dumps(where, sort_keys=True).encode(), digest_size=16).digest()
+    key = (hashlib.blake2b(emb.tobytes(), digest_size=16).digest(), where_key, n_results)
+    results = result_cache.get(key)
+    if results is None:
+        with metrics.span("chroma.query"):
+            results = await asyncio.to_thread(
+                get_collection().query, query_embeddings=[emb.tolist()], n_results=n_results, where=where
+            )
+        result_cache.put(key, results)
+    return results
+
+
+def _unpack(results: dict) -> tuple[list, list, list]:
+    return results['ids'][0], results['metadatas'][0], results['documents'][0]
+
+
+async def _snapshot_search(snap: snapshot.VectorSnapshot, query_text: str, filters: dict,
+                           n_results: int) -> tuple[list, list, list]:
+    """스냅샷에서 마스크 + NumPy top-k. 검색이 수 ms 라 결과 캐시는 거치지 않습니다 (질의 임베딩 캐시는 공유)."""
+    emb = await _embed_query(query_text)
+    mask = snap.columns.mask(filters)
+    if mask is not None:
+        filter_stats["snapshot"] += 1
+        if not mask.any():
+            filter_stats["empty"] += 1
+            return [], [], []
+    with metrics.span("snapshot.query"):
+        rows, _ = await asyncio.to_thread(snap.search, emb, n_results, mask)
+    return snap.records(rows)
+
+
+async def _vector_search(query_text: str, filters: dict, n_results: int,
+                         columns: MetadataColumns) -> tuple[list, list, list]:
+    """필터를 만족하는 책 중 벡터 유사도 상위 n_results 의 (ids, 메타데이터, 문서)"""
+    snap = _active_snapshot()
+    if snap is not None:
+        return await _snapshot_search(snap, query_text, filters, n_results)
+
+    mask = columns.mask(filters)
+    if mask is None:
+        return _unpack(await _query_books(query_text, None, n_results))
+
+    count = int(mask.sum())
+    if count == 0:
+        filter_stats["empty"] += 1
+        return [], [], []
+    if count <= PREFILTER_MAX_IDS:
+        # 조건이 까다로우면 후보 ID 집합 안에서만 검색 (Chroma 가 후보 밖의 결과를 훑고 버리지 않도록)
+        filter_stats["prefilter"] += 1
+        where = {"isbn": {"$in": columns.candidate_ids(mask)}}
+        return _unpack(await _query_books(query_text, where, min(n_results, count)))
+
+    # 조건이 느슨하면 필터 없이 선택도만큼 넉넉히 가져와 마스크로 거릅니다 (모자라면 두 배씩 늘려 재시도)
+    filter_stats["overfetch"] += 1
+    limit = min(len(columns), OVERFETCH_MAX)
+    fetch = min(limit, math.ceil(n_results * len(columns) / count * OVERFETCH_FACTOR))
+    while True:
+        ids, metas, docs = _unpack(await _query_books(query_text, None, fetch))
+        kept = [(i, m, d) for i, m, d in zip(ids, metas, docs)
+                if (row := columns.rows.get(i)) is not None and mask[row]]
+        if len(kept) >= n_results or fetch >= limit:
+            break
+        filter_stats["overfetch_retries"] += 1
+        fetch = min(limit, fetch * 2)
+    kept = kept[:n_results]
+    return [k[0] for k in kept], [k[1] for k in kept], [k[2] for k in kept]
+
+
+async def _hybrid_search(query_text: str, filters: dict, n_results: int) -> tuple[list, list]:
+    """
+    벡터 검색 + BM25 검색 결과를 RRF 로 합친 상위 n_results 의 (메타데이터, 문서) 목록.
+    BM25 에만 나온 책의 문서 본문은 Chroma 에서 ID 로 가져옵니다.
+    """
+    lexical_index, columns = await _get_local_index()
+    if not HYBRID_SEARCH:
+        _, metas, docs = await _vector_search(query_text, filters, n_results, columns)
+        return metas, docs
+
+    vector_task = asyncio.create_task(_vector_search(query_text, filters, HYBRID_CANDIDATES, columns))
+    # BM25 는 posting 을 파이썬/NumPy 로 훑어 카탈로그에 비례하므로 이벤트 루프 밖에서 (벡터 검색과 동시에)
+    with metrics.span("lexical.search"):
+        lexical = await asyncio.to_thread(lexical_index.search, query_text, HYBRID_CANDIDATES,
+                                          allowed=columns.mask(filters))
+    vector_ids, vector_metas, vector_docs = await vector_task
+
+    found = {}  # id -> (meta, document)
+    for i, meta, doc in zip(vector_ids, vector_metas, vector_docs):
+        found[i] = (meta, doc)
+    lexical_ids = [str(lexical_index.ids[d]) for d, _ in lexical]
+    fused = reciprocal_rank_fusion([vector_ids, lexical_ids], k=HYBRID_RRF_K)[:n_results]
+
+    missing = [i for i in fused if i not in found]
+    snap = _active_snapshot()
+    if missing and snap is not None:
+        ids, metas, docs = snap.records(snap.rows_of(missing).values())
+        found.update((i, (meta, doc)) for i, meta, doc in zip(ids, metas, docs))
+        missing = [i for i in missing if i not in found]
+    if missing:
+        with metrics.span("chroma.get"):
+            extra = await asyncio.to_thread(get_collection().get, ids=missing, include=["metadatas", "documents"])
+        for i, meta, doc in zip(extra['ids'], extra['metadatas'], extra['documents']):
+            found[i] = (meta, doc)
+    fused = [i for i in fused if i in found]
+    return [found[i][0] for i in fused], [found[i][1] for i in fused]
+
+
+async def _lookup_realtime(isbns: list) -> dict:
+    """알라딘 ItemLookUp 원본 조회 (실패 시 예외를 그대로 올려 캐시가 stale 값으로 대체하게 합니다)"""
+    realtime_map = {}
+    # 👈 [중요] ebookList -> usedList로 변경해야 중고 정보가 옵니다.
+    items = await aladin.item_lookup(isbns, opt_result="usedList")
+    for item in items:
+        # 중고 정보 파싱 (subInfo -> usedList)
+        sub_info = item.get('subInfo', {})
+        used_list = sub_info.get('usedList', {})
+
+        # 알라딘 직배송 중고 확인
+        aladin_used = used_list.get('aladinUsed', {})
+        used_count = aladin_used.get('itemCount', 0)
+        used_min_price = aladin_used.get('minPrice', 0)
+
+        realtime_map[item['isbn13']] = {
+            "price": item.get('priceSales', 0),
+            "sales_point": item.get('salesPoint', 0),
+            # "stock": item.get('stockStatus', ''), # 새책 재고는 보통 '예약판매' 아니면 다 있음
+            "used_count": used_count,  # 👈 중고 재고 수량
+            "used_price": used_min_price  # 👈 중고 최저가
+        }
     return realtime_map
 
 
-def search_books_by_context(query_context: str, filters: dict = None) -> str:
+async def fetch_realtime_infos(isbns: list, budget: float | None = None) -> dict:
+    """
+    [Hybrid] 여러 ISBN의 최신 정보(가격, 판매지수, 중고재고)를 조회.
+    캐시 miss 인 ISBN 만 한 번의 API 요청으로 묶고, 같은 ISBN 을 조회 중인 동시 요청은 그 결과를 공유합니다.
+    budget(초)이 주어지면 그 안에 끝나지 않은 값은 마지막으로 알려진 값(stale)으로 대신합니다.
+    각 값에는 출처(source: fresh/cached/stale)와 나이(age, 초)가 붙습니다.
+    """
+    if not isbns: return {}
+    refresh = asyncio.create_task(realtime_cache.get_many(isbns, _lookup_realtime))
+    started = time.perf_counter()
+    try:
+        cached = await asyncio.wait_for(asyncio.shield(refresh), budget)
+        metrics.record("realtime.merge", time.perf_counter() - started)
+    except asyncio.TimeoutError:
+        metrics.record("realtime.merge", time.perf_counter() - started)
+        # Stale-while-revalidate: 갱신 태스크는 살려 두어 완료 시 캐시를 채우고, 지금은 캐시에 남은 값으로 응답
+        global budget_timeouts
+        budget_timeouts += 1
+        _background_refreshes.add(refresh)
+        refresh.add_done_callback(_background_refreshes.discard)
+        print(f"⏱️ 실시간 조회 {budget}s 예산 초과 → 마지막 값으로 응답, 백그라운드 갱신 계속")
+        cached = {}
+        for isbn in isbns:
+            last = realtime_cache.peek(isbn)
+            if last is not None:
+                if last.state == STALE:
+                    realtime_cache.stale_served += 1
+                cached[isbn] = last
+    return {isbn: {**r.value, "source": r.state, "age": r.age} for isbn, r in cached.items()}
+
+
+def _fmt_age(seconds: float) -> str:
+    if seconds < 60: return f"{int(seconds)}초 전"
+    if seconds < 3600: return f"{int(seconds // 60)}분 전"
+    return f"{int(seconds // 3600)}시간 전"
+
+
+def _realtime_badge(rt: dict) -> str:
+    """데이터 신선도 배지: 방금 조회 / 캐시 / (API 장애로) 오래된 값"""
+    if rt["source"] == FRESH: return "✅[실시간]"
+    if rt["source"] == CACHED: return f"✅[실시간·{_fmt_age(rt['age'])}]"
+    return f"⚠️[지연·{_fmt_age(rt['age'])} 가격]"
+
+
+def _keyphrases(document: str | None, title: str, k: int = COMPACT_KEYWORDS) -> str:
+    """문서의 설명 부분에서 자주 나온 단어 k 개 (조사/불용어를 떼고, 제목에 이미 있는 단어는 제외)"""
+    if not document or k <= 0:
+        return ""
+    skip = set(content_words(title))
+    counts = Counter(w for w in content_words(document.split("설명:", 1)[-1]) if w not in skip)
+    return ",".join(w for w, _ in counts.most_common(k))
+
+
+def _project(fields) -> tuple:
+    """요청한 필드 중 아는 것만 순서대로 (없으면 COMPACT_FIELDS)"""
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    chosen = [f.strip() for f in fields or () if isinstance(f, str) and f.strip() in RESULT_FIELDS]
+    return tuple(dict.fromkeys(chosen)) or COMPACT_FIELDS
+
+
+def _compact_table(rows: list[dict], fields=None, note: str | None = None) -> str:
+    """필드 헤더 + 한 줄에 한 권 (구분자 |). 값 안의 | 와 줄바꿈은 바꿔 표가 깨지지 않게 합니다."""
+    fields = _project(fields)
+    lines = ["|".join(fields)]
+    for row in rows:
+        lines.append("|".join(str(row.get(f, "")).replace("|", "/").replace("\n", " ") for f in fields))
+    if note:
+        lines.append(note)
+    return "\n".join(lines)
+
+
+def _meta_row(meta: dict, src: str = "db") -> dict:
+    """books 메타데이터 → 간결 결과 한 행 (실시간 정보/핵심어 제외). src 는 가격 정보의 출처 (알라딘 API 에서 바로 받았으면 live)"""
+    return {"isbn": meta.get('isbn'), "title": meta.get('title', ''), "author": meta.get('author', ''),
+            "category": meta.get('category', ''), "price": int(meta.get('price', 0) or 0), "used": "", "src": src,
+            "rating": meta.get('rating', ''), "sales": meta.get('sales_point', ''),
+            "pub_date": meta.get('pub_date', ''), "keywords": "", "link": meta.get('link', '')}
+
+
+_SOURCES = {FRESH: "live", CACHED: "cache", STALE: "stale"}
+
+
+def _merge_realtime(meta: dict, rt: dict | None) -> tuple[dict, str, str]:
+    """books 메타데이터에 실시간 정보를 덮어쓴 (간결 결과 행, 신선도 배지, 중고 정보 문자열). 실시간 정보가 없으면 DB 값."""
+    row = _meta_row(meta)
+    row["sales"] = meta.get('sales_point', 0)
+    if rt is None:
+        return row, "[DB]", ""
+    row.update(price=int(rt['price']), sales=rt['sales_point'], src=_SOURCES[rt['source']])
+    u_count = rt.get('used_count', 0)
+    u_price = rt.get('used_price', 0)
+    if u_count > 0:
+        row["used"] = f"{u_count}권 {u_price}원"
+        return row, _realtime_badge(rt), f" | 📦중고(알라딘): {u_price:,}원 ({u_count}개)"
+    row["used"] = "없음"
+    return row, _realtime_badge(rt), " | 🚫중고재고 없음"
+
+
+def _stale_note(realtime_data: dict) -> str | None:
+    if any(rt["source"] == STALE for rt in realtime_data.values()):
+        return "※ 일부 가격은 API 지연으로 최신이 아닐 수 있음"
+    return None
+
+
+async def search_books_by_context(query_context: str, filters: dict = None, format: str = "text",
+                                  fields=None) -> str:
     print(f"[Tool] Context Search: '{query_context}' | Filters: {filters}")
-    where_clause = _build_chroma_filter(filters)
 
     try:
-        results = collection.query(
-            query_texts=[query_context], n_results=5, where=where_clause
-        )
+        metas, docs = await _hybrid_search(query_context, filters, n_results=5)
     except Exception as e:
         print(f"⚠️ Chroma Error: {e}")
         return "검색 중 오류가 발생했습니다."
 
-    if not results['documents'] or not results['documents'][0]:
+    if not docs:
         return "조건에 맞는 책을 찾을 수 없습니다."
 
     # Hybrid RAG: 실시간 정보 병합
-    metas = results['metadatas'][0]
-    docs = results['documents'][0]
     isbns = [m['isbn'] for m in metas if m.get('isbn')]
-    realtime_data = fetch_realtime_infos(isbns)
+    realtime_data = await fetch_realtime_infos(isbns, budget=REALTIME_BUDGET)
 
-    formatted = []
+    formatted, rows = [], []
     for i, meta in enumerate(metas):
         isbn = meta['isbn']
-
-        # 기본값 (DB)
-        price = meta.get('price', 0)
-        sp = meta.get('sales_point', 0)
-        badge = "[DB]"
-        used_info_str = ""  # 중고 정보 문자열 초기화
-
-        # 실시간 업데이트
-        if isbn in realtime_data:
-            rt = realtime_data[isbn]
-            price = rt['price']
-            sp = rt['sales_point']
-            badge = "✅[실시간]"
-
-            # 👈 [추가] 중고 재고 표시 로직
-            u_count = rt.get('used_count', 0)
-            u_price = rt.get('used_price', 0)
-            if u_count > 0:
-                used_info_str = f" | 📦중고(알라딘): {u_price:,}원 ({u_count}개)"
-            else:
-                used_info_str = " | 🚫중고재고 없음"
+        # DB 값에 실시간 가격/판매지수/중고 재고를 덮어씀
+        row, badge, used_info_str = _merge_realtime(meta, realtime_data.get(isbn))
+        price, sp = row["price"], row["sales"]
+        row["keywords"] = _keyphrases(docs[i], meta['title'])
+        rows.append(row)
 
         # 판매지수 힌트
         sp_hint = ""
@@ -134,7 +460,7 @@ def search_books_by_context(query_context: str, filters: dict = None) -> str:
 
         info = (
             f"[{i + 1}] {meta['title']} {badge} {sp_hint}\n"
-            f"- 저자: {meta['author']} | 분야: {meta['category']}\n"
+            f"- ISBN: {isbn} | 저자: {meta['author']} | 분야: {meta['category']}\n"
             # 👇 가격 옆에 중고 정보를 붙여서 보여줍니다.
             f"- 판매지수: {sp:,} | 새책: {int(price):,}원{used_info_str} | 평점: {meta.get('rating')}\n"
             f"- 출간일: {meta.get('pub_date')}\n"
@@ -142,35 +468,196 @@ def search_books_by_context(query_context: str, filters: dict = None) -> str:
         )
         formatted.append(info)
 
+    if format == "compact":
+        return _compact_table(rows, fields, _stale_note(realtime_data))
     return "\n".join(formatted)
 
-def search_book_specifically(keyword: str, filters: dict = None) -> str:
-    # (API 키워드 검색 로직 - 기존과 동일하게 유지)
-    url = "http://www.aladin.co.kr/ttb/api/ItemSearch.aspx"
-    params = {
-        "ttbkey": ALADIN_TTB_KEY, "Query": keyword, "QueryType": "Keyword",
-        "MaxResults": 5, "SearchTarget": "Book", "Output": "js", "Version": "20131101"
-    }
+async def search_book_specifically(keyword: str, filters: dict = None, format: str = "text", fields=None) -> str:
+    """제목/저자 키워드 검색. 로컬 BM25 역색인에서 먼저 찾고, 일치하는 책이 없을 때만 알라딘 API 로 검색합니다."""
+    global keyword_local_hits, keyword_fallbacks
+    try:
+        index, columns = await _get_local_index()
+        with metrics.span("lexical.search"):
+            hits = await asyncio.to_thread(index.search, keyword, 5, allowed=columns.mask(filters),
+                                           min_match=LEXICAL_MIN_MATCH)
+    except Exception as e:
+        print(f"⚠️ Local index error: {e}")
+        hits = []
+    if hits:
+        keyword_local_hits += 1
+        # 로컬 메타데이터는 배치 시점 가격이므로 컨텍스트 검색과 같이 실시간 정보를 병합합니다
+        metas = [index.meta(d) for d, _ in hits]
+        realtime_data = await fetch_realtime_infos([m['isbn'] for m in metas if m.get('isbn')], budget=REALTIME_BUDGET)
+        merged = [_merge_realtime(m, realtime_data.get(m.get('isbn'))) for m in metas]
+        if format == "compact":
+            return _compact_table([row for row, _, _ in merged], fields, _stale_note(realtime_data))
+        return "\n".join(
+            f"- {m['title']} {badge} / {m['author']} / {row['price']:,}원{used_info_str} / ISBN {m.get('isbn')}"
+            for m, (row, badge, used_info_str) in zip(metas, merged)
+        )
+
+    # (API 키워드 검색 로직 - 로컬에 없을 때의 폴백)
+    keyword_fallbacks += 1
     try:
-        res = requests.get(url, params=params)
-        items = res.json().get('item', [])
+        # 필터가 있으면 넉넉히 받아와 로컬과 같은 규칙으로 모든 조건(가격/분야/평점/출간일)을 적용합니다
+        items = await aladin.item_search(keyword, max_results=KEYWORD_FALLBACK_FETCH if filters else 5)
         if not items: return "검색 결과가 없습니다."
 
-        results = []
-        for item in items:
-            # 파이썬 레벨 필터링
-            if filters and filters.get("max_price") and item['priceSales'] > int(filters["max_price"]):
-                continue
-            results.append(f"- {item['title']} / {item['author']} / {item['priceSales']:,}원")
+        mask = MetadataColumns([item.get('isbn13') for item in items], [_item_meta(item) for item in items]).mask(filters)
+        if mask is not None:
+            items = [item for item, ok in zip(items, mask) if ok]
+        if format == "compact":
+            rows = [_meta_row({**_item_meta(item), "isbn": item.get('isbn13'), "title": item['title'],
+                               "author": item['author'], "sales_point": item.get('salesPoint', ''),
+                               "link": item.get('link', '')}, src="live") for item in items[:5]]
+            return _compact_table(rows, fields) if rows else "조건에 맞는 결과가 없습니다."
+        results = [f"- {item['title']} / {item['author']} / {item['priceSales']:,}원 / ISBN {item.get('isbn13')}"
+                   for item in items[:5]]
         return "\n".join(results) if results else "조건에 맞는 결과가 없습니다."
     except Exception as e:
         return f"API Error: {e}"
 
 
-def get_book_details(isbn: str) -> str:
-    # (상세 조회 로직 - 기존과 동일)
-    return f"ISBN {isbn} 상세 조회 기능 (구현됨)"  # 지면상 생략, 이전 코드 사용
+def _item_meta(item: dict) -> dict:
+    """알라딘 item → 필터 적용용 메타데이터 (배치 작업이 저장하는 필드와 같은 이름)"""
+    return {
+        "price": item.get('priceSales', 0),
+        "rating": float(item.get('customerReviewRank', 0) or 0),
+        "pub_date": to_int_date(item.get('pubDate', '')) or 0,
+        "category": item.get('categoryName', ''),
+    }
+
+
+def _clean(text, limit: int = DETAILS_MAX_CHARS) -> str:
+    """HTML 태그/엔티티를 걷어내고 길이를 제한합니다 (목차·책소개는 HTML 로 옵니다)."""
+    text = re.sub(r"<br\s*/?>|</p>", "\n", str(text or ""), flags=re.I)
+    text = re.sub(r"<[^>]+>", "", text).replace("&nbsp;", " ").replace("&lt;", "<").replace("&gt;", ">")
+    text = re.sub(r"\n\s*\n+", "\n", text).strip()
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _format_details(item: dict) -> str:
+    sub = item.get("subInfo") or {}
+    lines = [
+        f"📖 {item.get('title', '')} (ISBN {item.get('isbn13')})",
+        f"- 저자: {item.get('author', '')} | 출판사: {item.get('publisher', '')} | 출간일: {item.get('pubDate', '')}",
+        f"- 분야: {item.get('categoryName', '')} | 새책: {int(item.get('priceSales', 0)):,}원 "
+        f"| 평점: {item.get('customerReviewRank', 0)} | 판매지수: {item.get('salesPoint', 0):,}",
+    ]
+    description = sub.get("fullDescription") or sub.get("fullDescription2") or item.get("description")
+    if description:
+        lines.append(f"- 책 소개: {_clean(description)}")
+    if sub.get("story"):
+        lines.append(f"- 줄거리: {_clean(sub['story'])}")
+    if sub.get("toc"):
+        lines.append(f"- 목차:\n{_clean(sub['toc'])}")
+    if sub.get("ratingInfo", {}).get("ratingCount"):
+        rating = sub["ratingInfo"]
+        lines.append(f"- 독자 평점: {rating.get('ratingScore')} ({rating.get('ratingCount')}명)")
+    return "\n".join(lines)
+
+
+async def get_book_details(isbns) -> str:
+    """
+    여러 ISBN 의 상세 정보(책 소개, 목차 등)를 한 번에 조회합니다.
+    로컬 상세 저장소를 한 번 읽고, 없거나 목록 정보뿐인 책만 모아 ItemLookUp 한 번(묶음)으로 채워 저장합니다.
+    """
+    global details_lookups
+    if isinstance(isbns, str):
+        isbns = isbns.split(",")
+    isbns = list(dict.fromkeys(i.strip().replace("-", "") for i in isbns if i and i.strip()))[:DETAILS_MAX_ISBNS]
+    if not isbns:
+        return "ISBN 이 필요합니다."
+    print(f"[Tool] Details: {isbns}")
+
+    with metrics.span("details.read"):
+        stored = await asyncio.to_thread(detail_store.get_many, isbns)
+    missing = [isbn for isbn in isbns if isbn not in stored or not stored[isbn][1]]
+    if missing:
+        details_lookups += 1
+        try:
+            items = await aladin.item_lookup(missing, opt_result=DETAIL_OPT_RESULT)
+            await asyncio.to_thread(detail_store.put_many, items, True)
+            stored.update({item["isbn13"]: (item, True, int(time.time())) for item in items if item.get("isbn13")})
+        except Exception as e:
+            # API 장애 시에도 저장소에 있는 목록 정보로라도 답합니다
+            print(f"⚠️ Detail lookup failed: {e}")
+
+    sections = [_format_details(stored[isbn][0]) if isbn in stored else f"❌ ISBN {isbn}: 상세 정보를 찾을 수 없습니다."
+                for isbn in isbns]
+    return "\n\n".join(sections)
+
+
+async def _details_status() -> str:
+    try:
+        # SQLite COUNT 는 행 수에 비례하므로 이벤트 루프 밖에서 (status 는 세션 풀의 헬스 체크로 자주 불림)
+        ds = await asyncio.to_thread(detail_store.stats)
+    except Exception as e:
+        return f"error={e}"
+    return f"rows={ds['rows']} full={ds['full']} reads={ds['reads']} hits={ds['hits']} lookups={details_lookups}"
+
+
+def _snapshot_status() -> str:
+    try:
+        snap = _active_snapshot()
+    except Exception as e:
+        return f"error={e}"
+    if snap is None:
+        return f"backend=chroma ({VECTOR_BACKEND})"
+    st = snap.stats()
+    return (f"backend=snapshot version={st['version']} rows={st['rows']} dtype={st['dtype']} space={st['space']} "
+            f"mapped_mb={st['mapped_mb']} searches={st['searches']}")
+
+
+async def get_system_status() -> str:
+    details = await _details_status()
+    rc = realtime_cache.stats()
+    ec, qc = embedding_cache.stats(), result_cache.stats()
+    em = embeddings.status()
+    eb = embeddings.batcher_stats()
+    return (
+        f"{'SYSTEM_NORMAL' if em['ready'] else 'SYSTEM_WARMING_UP'}\n"
+        f"embedding: ready={em['ready']} backend={em['backend']} load_seconds={em['load_seconds']}"
+        f"{' error=' + em['error'] if em['error'] else ''} "
+        f"batches={eb['batches']} avg_batch={eb['avg_batch']}\n"
+        f"realtime_cache: size={rc['size']} hits={rc['hits']} misses={rc['misses']} "
+        f"coalesced={rc['coalesced']} stale_served={rc['stale_served']} hit_rate={rc['hit_rate']} "
+        f"budget_timeouts={budget_timeouts} background_refreshes={len(_background_refreshes)}\n"
+        f"embedding_cache: size={ec['size']} hits={ec['hits']} misses={ec['misses']} hit_rate={ec['hit_rate']}\n"
+        f"result_cache: size={qc['size']} hits={qc['hits']} misses={qc['misses']} hit_rate={qc['hit_rate']}\n"
+        f"local_index: docs={len(_lexical_index) if _lexical_index else 0} "
+        f"categories={len(_columns.category_names) if _columns else 0} "
+        f"build_seconds={_lexical_build_seconds:.2f} rebuilds={_lexical_rebuilds} "
+        f"rebuild_pending={_lexical_rebuild is not None} keyword_local_hits={keyword_local_hits} "
+        f"keyword_fallbacks={keyword_fallbacks}\n"
+        f"details: {details}\n"
+        f"vectors: {_snapshot_status()}\n"
+        f"filters: prefilter={filter_stats['prefilter']} overfetch={filter_stats['overfetch']} "
+        f"overfetch_retries={filter_stats['overfetch_retries']} snapshot={filter_stats['snapshot']} "
+        f"empty={filter_stats['empty']}"
+    )
 
 
-def get_system_status() -> str:
-    return "SYSTEM_NORMAL"
\ No newline at end of file
+# /metrics: 이미 세고 있는 캐시/폴백 카운터를 스크레이프 시점에 읽어 내보냅니다 (요청 경로에 추가 비용 없음)
+_CACHES = {"realtime": realtime_cache, "embedding": embedding_cache, "result": result_cache}
+metrics.Collected("cache_hits_total", "Cache hits", lambda: {(n,): c.hits for n, c in _CACHES.items()},
+                  ("cache",), type="counter")
+metrics.Collected("cache_misses_total", "Cache misses", lambda: {(n,): c.misses for n, c in _CACHES.items()},
+                  ("cache",), type="counter")
+metrics.Collected("cache_entries", "Cache size", lambda: {(n,): len(c) for n, c in _CACHES.items()}, ("cache",))
+metrics.Collected("realtime_events_total", "Realtime merge events", lambda: {
+    ("coalesced",): realtime_cache.coalesced, ("stale_served",): realtime_cache.stale_served,
+    ("budget_timeout",): budget_timeouts}, ("event",), type="counter")
+metrics.Collected("keyword_search_total", "Keyword searches by source",
+                  lambda: {("local",): keyword_local_hits, ("aladin",): keyword_fallbacks}, ("source",), type="counter")
+metrics.Collected("filter_search_total", "Filtered context searches by strategy",
+                  lambda: {(k,): v for k, v in filter_stats.items()}, ("strategy",), type="counter")
+metrics.Collected("details_lookups_total", "Detail lookups that went to Aladin", lambda: details_lookups,
+                  type="counter")
+metrics.Collected("embedding_batches_total", "Query embedding batches",
+                  lambda: embeddings.batcher_stats()["batches"], type="counter")
+metrics.Collected("embedding_ready", "Embedding model loaded", lambda: int(embeddings.is_ready()))
+metrics.Collected("local_index_docs", "Books in the local lexical/columnar index",
+                  lambda: len(_lexical_index) if _lexical_index else 0)
+metrics.Collected("snapshot_rows", "Books in the memory-mapped vector snapshot (0 if not in use)",
+                  lambda: len(snap) if VECTOR_BACKEND != "chroma" and (snap := snapshot.current()) else 0)
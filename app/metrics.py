@@ -0,0 +1,148 @@
+import time
+import uuid
+import bisect
+import contextvars
+from contextlib import contextmanager
+
+# 지연 히스토그램 기본 버킷 (초). 임베딩/Chroma(ms 단위)부터 LLM(수 초)까지 한 히스토그램으로 봅니다.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGISTRY: list = []
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """단조 증가 카운터 (라벨별)"""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: dict = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {v:g}" for k, v in self._values.items()]
+        return lines
+
+
+class Histogram:
+    """누적 버킷 히스토그램 (라벨별). observe 는 bisect 한 번과 덧셈 몇 번이라 요청 경로에 둬도 부담이 없습니다."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values: dict = {}  # labels -> [버킷별 개수..., +Inf 개수, 합계]
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for key, series in self._values.items():
+            cumulative = 0
+            for bound, count in zip([*map(str, self.buckets), "+Inf"], series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-1]:g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Collected:
+    """
+    /metrics 요청 시점에 fn() 을 호출해 값을 읽는 지표 (캐시 적중률, 풀 상태처럼 이미 다른 곳에서 세고 있는 값용).
+    fn 은 숫자 하나 또는 {라벨 값 튜플: 숫자} 를 돌려줍니다.
+    """
+
+    def __init__(self, name: str, help: str, fn, labelnames: tuple = (), type: str = "gauge"):
+        self.name, self.help, self.fn, self.labelnames, self.type = name, help, fn, tuple(labelnames), type
+        REGISTRY.append(self)
+
+    def collect(self) -> list[str]:
+        try:
+            values = self.fn()
+        except Exception as e:
+            return [f"# {self.name} unavailable: {e}"]
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {float(v or 0):g}" for k, v in values.items()]
+        return lines
+
+
+def render() -> str:
+    """Prometheus 텍스트 포맷 (text/plain; version=0.0.4)"""
+    return "\n".join(line for metric in REGISTRY for line in metric.collect()) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 단계별 지연: stage = chat, llm, tool.<이름>, embed, chroma.query, aladin.<엔드포인트> ...
+STAGE_SECONDS = Histogram("stage_seconds", "Latency of each request stage", ("stage",))
+
+# ---------------------------------------------------------------------------
+# 요청 단위 트레이싱: contextvar 로 trace id 와 span 목록을 들고 다닙니다.
+# (asyncio 태스크/to_thread 는 컨텍스트를 복사하므로 gather 한 도구 호출도 같은 trace 에 기록됩니다)
+# ---------------------------------------------------------------------------
+_trace_id: contextvars.ContextVar = contextvars.ContextVar("trace_id", default=None)
+_spans: contextvars.ContextVar = contextvars.ContextVar("spans", default=None)
+
+
+def start_trace(trace_id: str | None = None) -> str:
+    """현재 컨텍스트에서 새 trace 를 시작합니다 (MCP 서버는 API 가 넘겨준 trace id 를 이어받음)."""
+    trace_id = trace_id or uuid.uuid4().hex[:16]
+    _trace_id.set(trace_id)
+    _spans.set([])
+    return trace_id
+
+
+def current_trace_id() -> str | None:
+    return _trace_id.get()
+
+
+def record(stage: str, seconds: float):
+    """이미 잰 구간을 히스토그램과 현재 trace 에 기록합니다."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def trace_spans() -> list[tuple[str, float]]:
+    """현재 trace 에 기록된 (단계, 초) 목록 (벤치마크에서 단계별 지연 분포를 낼 때 사용)"""
+    return list(_spans.get() or [])
+
+
+def trace_summary() -> str:
+    """현재 trace 의 단계별 소요 시간 한 줄 (같은 단계는 합산)"""
+    totals: dict = {}
+    for stage, seconds in _spans.get() or []:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    parts = " ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in totals.items())
+    return f"trace={_trace_id.get()} {parts}"
@@ -0,0 +1,319 @@
+import os
+import json
+import mmap
+import time
+import shutil
+import threading
+import numpy as np
+from dotenv import load_dotenv
+from app.store import CHROMA_DB_PATH
+from app.mcp_server.columns import MetadataColumns, to_int_date
+from app.mcp_server.lexical import BM25Index, PackedBM25Index, PostingsBuilder
+
+load_dotenv()
+# 벡터 스냅샷: 배치 작업이 수집을 마친 뒤 books 컬렉션을 읽기 전용 파일로 내보냅니다.
+#   vectors.npy (float16 또는 int8 + scales.npy), norms.npy, ids.npy, 열 지향 메타데이터(price/rating/pub_date/category),
+#   records.bin + offsets.npy (행마다 {"m": 메타데이터, "d": 문서} JSON), bm25_*.npy (하이브리드 검색용 역색인 CSR 배열)
+# MCP 서버는 이 파일들을 메모리 맵으로 열어 NumPy 로 top-k 를 계산합니다. 같은 호스트의 워커들은 페이지 캐시를 공유하므로
+# 워커를 늘려도 벡터/메타데이터 메모리는 한 벌입니다.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(CHROMA_DB_PATH, "snapshot"))
+# int8: 행별 스케일 양자화 (float32 의 1/4) / float16 / float32
+# NumPy 의 float16 → float32 변환은 CPU 에 따라 느려서(검색 시간 대부분) 기본은 int8 입니다.
+SNAPSHOT_DTYPE = os.getenv("SNAPSHOT_DTYPE", "int8")
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "2"))  # 남겨 둘 스냅샷 수 (이전 것을 열고 있는 워커가 있을 수 있음)
+SNAPSHOT_EXPORT_BATCH = int(os.getenv("SNAPSHOT_EXPORT_BATCH", "5000"))
+SNAPSHOT_CHUNK_ROWS = int(os.getenv("SNAPSHOT_CHUNK_ROWS", "2048"))  # 한 번에 float32 로 풀어 곱할 행 수 (CPU 캐시에 들어가게)
+# 마스크를 통과한 행이 이 비율 이하면 해당 행만 골라 계산하고, 넘으면 전체를 훑으며 마스크 밖을 버립니다
+SNAPSHOT_GATHER_RATIO = float(os.getenv("SNAPSHOT_GATHER_RATIO", "0.2"))
+
+CURRENT_FILE = "CURRENT"
+COLUMNS = {"price": np.int64, "rating": np.float32, "pub_date": np.int64, "category": np.int32}
+
+
+def _current_path(root: str) -> str:
+    return os.path.join(root, CURRENT_FILE)
+
+
+def _quantize(block: np.ndarray, dtype: str) -> tuple[np.ndarray, np.ndarray | None]:
+    if dtype in ("float16", "float32"):
+        return block.astype(dtype), None
+    if dtype == "int8":
+        scales = np.abs(block).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.round(block / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    raise ValueError(f"Unknown SNAPSHOT_DTYPE: {dtype}")
+
+
+def _collection_space(collection) -> str:
+    """컬렉션의 거리 기준 (Chroma 1.x 는 configuration, 이전 버전은 metadata 의 hnsw:space)"""
+    config = getattr(collection, "configuration_json", None) or {}
+    space = (config.get("hnsw") or {}).get("space") or (collection.metadata or {}).get("hnsw:space")
+    return space or "l2"
+
+
+def export_snapshot(collection=None, root: str = SNAPSHOT_DIR, dtype: str = SNAPSHOT_DTYPE,
+                    batch: int = SNAPSHOT_EXPORT_BATCH) -> str | None:
+    """
+    books 컬렉션 전체를 새 스냅샷 디렉터리로 내보내고 CURRENT 를 원자적으로 바꿉니다. 만든 디렉터리 경로(비어 있으면 None).
+    새 디렉터리를 다 쓴 뒤 rename 하고 CURRENT 를 os.replace 하므로, 읽는 쪽은 항상 완성된 스냅샷만 봅니다.
+    """
+    if collection is None:
+        from app.store import get_collection
+        collection = get_collection()
+    total = collection.count()
+    if total == 0:
+        return None
+    started = time.perf_counter()
+    version = str(time.time_ns())
+    final = os.path.join(root, version)
+    tmp = final + ".tmp"
+    os.makedirs(tmp)
+    try:
+        manifest = _write_snapshot(collection, tmp, total, version, dtype, batch)
+        if manifest is None:  # 첫 배치부터 비었음 (그 사이 모두 삭제됨)
+            shutil.rmtree(tmp, ignore_errors=True)
+            return None
+        os.rename(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)  # 실패한 내보내기의 .tmp 를 남기지 않음
+        raise
+    pointer = f"{_current_path(root)}.{os.getpid()}.tmp"  # 동시에 내보내는 워커끼리 임시 파일이 겹치지 않게
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer, _current_path(root))
+    _prune(root, keep=SNAPSHOT_KEEP)
+    size_mb = sum(e.stat().st_size for e in os.scandir(final)) / 1024 / 1024
+    print(f"🗂️ Snapshot exported: {manifest['count']} books ({dtype}, {size_mb:.0f}MB, "
+          f"{time.perf_counter() - started:.1f}s)")
+    return final
+
+
+def _write_snapshot(collection, tmp: str, total: int, version: str, dtype: str, batch: int) -> dict | None:
+    """컬렉션의 앞 total 행을 tmp 디렉터리에 스냅샷 파일로 씁니다. manifest (읽은 행이 없으면 None)."""
+    space = _collection_space(collection)
+    vectors = scales = norms = None
+    ids, columns, categories = [], {name: [] for name in COLUMNS}, {}
+    offsets = [0]
+    postings = PostingsBuilder()
+    with open(os.path.join(tmp, "records.bin"), "wb") as records:
+        # 한 번에 다 읽지 않고 batch 행씩: 100만 권이어도 내보내는 동안 메모리는 batch 만큼
+        # 읽는 도중 다른 배치 워커가 upsert 해 컬렉션이 늘어도 처음 센 total 행까지만 (memmap 크기)
+        for start in range(0, total, batch):
+            found = collection.get(include=["embeddings", "metadatas", "documents"],
+                                   limit=min(batch, total - start), offset=start)
+            if not found["ids"]:
+                break
+            block = np.asarray(found["embeddings"], dtype=np.float32)
+            if space == "cosine":
+                block /= np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+            if vectors is None:
+                vectors = np.lib.format.open_memmap(os.path.join(tmp, "vectors.npy"), mode="w+",
+                                                    dtype=dtype,
+                                                    shape=(total, block.shape[1]))
+                dim = block.shape[1]
+                norms = np.zeros(total, dtype=np.float32)
+                scales = np.zeros(total, dtype=np.float32) if dtype == "int8" else None
+            end = len(ids) + len(block)
+            quantized, block_scales = _quantize(block, dtype)
+            vectors[len(ids):end] = quantized
+            norms[len(ids):end] = (block ** 2).sum(axis=1)
+            if scales is not None:
+                scales[len(ids):end] = block_scales
+            for i, meta, doc in zip(found["ids"], found["metadatas"], found["documents"]):
+                meta = meta or {}
+                ids.append(i)
+                columns["price"].append(meta.get("price") or 0)
+                columns["rating"].append(meta.get("rating") or 0)
+                columns["pub_date"].append(to_int_date(meta.get("pub_date") or 0) or 0)
+                columns["category"].append(categories.setdefault(meta.get("category") or "", len(categories)))
+                postings.add(meta)
+                records.write(json.dumps({"m": meta, "d": doc}, ensure_ascii=False).encode("utf-8"))
+                offsets.append(records.tell())
+
+    # 컬렉션이 내보내는 도중 줄었으면(동시 삭제) 실제로 읽은 행까지만
+    count = len(ids)
+    if vectors is None:
+        return None
+    vectors.flush()
+    if count < total:
+        _truncate_rows(vectors, os.path.join(tmp, "vectors.npy"), count)
+    del vectors
+    np.save(os.path.join(tmp, "norms.npy"), norms[:count])
+    if scales is not None:
+        np.save(os.path.join(tmp, "scales.npy"), scales[:count])
+    id_array = np.array(ids, dtype=f"U{max(map(len, ids))}")
+    order = np.argsort(id_array, kind="stable")
+    np.save(os.path.join(tmp, "ids.npy"), id_array)
+    np.save(os.path.join(tmp, "id_order.npy"), order.astype(np.int64))
+    np.save(os.path.join(tmp, "ids_sorted.npy"), id_array[order])
+    np.save(os.path.join(tmp, "offsets.npy"), np.array(offsets, dtype=np.int64))
+    for name, dt in COLUMNS.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.array(columns[name], dtype=dt))
+    for name, array in postings.arrays().items():
+        np.save(os.path.join(tmp, f"bm25_{name}.npy"), array)
+    manifest = {"version": version, "count": count, "dim": dim, "dtype": dtype, "space": space,
+                "categories": list(categories), "created_at": time.time()}
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+
+def _truncate_rows(vectors: np.memmap, path: str, count: int, batch: int = SNAPSHOT_EXPORT_BATCH):
+    """memmap 의 앞 count 행만 남긴 .npy 로 바꿉니다. batch 행씩 옮겨 써서 전체 행렬을 메모리에 올리지 않습니다."""
+    trimmed = np.lib.format.open_memmap(path + ".trim", mode="w+", dtype=vectors.dtype, shape=(count, vectors.shape[1]))
+    for start in range(0, count, batch):
+        end = min(start + batch, count)
+        trimmed[start:end] = vectors[start:end]
+    trimmed.flush()
+    del trimmed
+    os.replace(path + ".trim", path)
+
+
+def _prune(root: str, keep: int):
+    """오래된 스냅샷 정리. 아직 열고 있는 워커가 있어도 안전합니다 (지운 파일도 매핑이 풀릴 때까지 유지됨)."""
+    versions = sorted((e.name for e in os.scandir(root) if e.is_dir() and e.name.isdigit()), key=int)
+    for name in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    for e in os.scandir(root):
+        # 내보내다 죽은 흔적 (다른 배치 워커가 지금 쓰는 중일 수 있어 한 시간 넘은 것만)
+        if e.is_dir() and e.name.endswith(".tmp") and time.time() - e.stat().st_mtime > 3600:
+            shutil.rmtree(e.path, ignore_errors=True)
+
+
+class VectorSnapshot:
+    """
+    읽기 전용 스냅샷 검색 엔진. 모든 배열을 mmap_mode="r" 로 열어 프로세스 사이에 페이지를 공유합니다.
+    거리는 Chroma 와 같은 기준(l2: 제곱 거리, cosine: 1 - 코사인, ip: 1 - 내적)이라 결과 순서가 같습니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest["version"]
+        self.space = self.manifest["space"]
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.vectors = load("vectors")
+        self.norms = load("norms")
+        self.scales = load("scales") if self.manifest["dtype"] == "int8" else None
+        self.ids = load("ids")
+        self._id_order, self._ids_sorted = load("id_order"), load("ids_sorted")
+        self.offsets = load("offsets")
+        with open(os.path.join(path, "records.bin"), "rb") as f:
+            self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._load = load
+        self.columns = MetadataColumns.from_arrays(self.ids, load("price"), load("rating"), load("pub_date"),
+                                                   load("category"), self.manifest["categories"])
+        self.searches = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _scores(self, q: np.ndarray, rows: slice | np.ndarray) -> np.ndarray:
+        """행들의 점수 (클수록 가까움). l2 는 ||q||² 를 뺀 -거리라 순위만 같습니다."""
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        dots = block @ q
+        if self.scales is not None:
+            dots *= self.scales[rows]
+        if self.space == "l2":
+            return 2 * dots - self.norms[rows]
+        return dots
+
+    def search(self, query: np.ndarray, k: int, mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(행 번호, Chroma 와 같은 기준의 거리) 상위 k 개. mask 가 있으면 True 인 행 중에서만 찾습니다."""
+        self.searches += 1
+        q = np.asarray(query, dtype=np.float32)
+        if self.space == "cosine":
+            q = q / max(float(np.linalg.norm(q)), 1e-12)
+        step = SNAPSHOT_CHUNK_ROWS
+        rows = np.flatnonzero(mask) if mask is not None else None
+        if rows is not None and len(rows) <= len(self) * SNAPSHOT_GATHER_RATIO:
+            # 조건이 까다로우면 통과한 행만 모아서 (행 번호가 정렬돼 있어 mmap 을 앞에서부터 읽음)
+            scores = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), step):
+                scores[start:start + step] = self._scores(q, rows[start:start + step])
+        else:
+            rows = None
+            scores = np.empty(len(self), dtype=np.float32)
+            for start in range(0, len(self), step):
+                scores[start:start + step] = self._scores(q, slice(start, start + step))
+            if mask is not None:
+                scores[~mask] = -np.inf
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.isfinite(scores[top])]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return (top if rows is None else rows[top]), self._distances(q, scores[top])
+
+    def _distances(self, q: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        if self.space == "l2":
+            return float(q @ q) - scores
+        return 1 - scores
+
+    def record(self, row: int) -> tuple[dict, str]:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        r = json.loads(self._records[start:end])
+        return r["m"], r["d"]
+
+    def records(self, rows) -> tuple[list, list, list]:
+        """행 번호들 → (ids, 메타데이터, 문서)"""
+        metas, docs = [], []
+        for row in rows:
+            meta, doc = self.record(int(row))
+            metas.append(meta)
+            docs.append(doc)
+        return [str(self.ids[int(r)]) for r in rows], metas, docs
+
+    def lexical_index(self):
+        """
+        BM25 역색인. 스냅샷에 저장된 CSR 배열을 메모리 맵으로 열고 메타데이터는 record() 로 필요한 행만 읽습니다.
+        역색인이 없는 이전 스냅샷이면 레코드를 모두 풀어 BM25Index 를 만듭니다 (워커마다 전용 메모리).
+        """
+        if not os.path.exists(os.path.join(self.path, "bm25_terms.npy")):
+            ids, metas, _ = self.records(range(len(self)))
+            return BM25Index(ids, metas)
+        arrays = {name: self._load(f"bm25_{name}") for name in ("terms", "offsets", "docs", "tfs", "lengths")}
+        return PackedBM25Index(self.ids, arrays, lambda d: self.record(d)[0])
+
+    def rows_of(self, ids: list) -> dict:
+        """ID → 행 번호 (스냅샷에 없는 ID 는 빠짐). 정렬된 ID 배열을 이진 탐색합니다."""
+        if not len(self) or not ids:
+            return {}
+        pos = np.searchsorted(self._ids_sorted, np.array(ids, dtype=self._ids_sorted.dtype))
+        pos = np.minimum(pos, len(self) - 1)
+        return {i: int(self._id_order[p]) for i, p in zip(ids, pos) if self._ids_sorted[p] == i}
+
+    def stats(self) -> dict:
+        return {"version": self.version, "rows": len(self), "dim": self.manifest["dim"],
+                "dtype": self.manifest["dtype"], "space": self.space, "searches": self.searches,
+                "mapped_mb": round(sum(e.stat().st_size for e in os.scandir(self.path)) / 1024 / 1024, 1)}
+
+
+_current: VectorSnapshot | None = None
+_current_mtime = None
+_open_lock = threading.Lock()
+
+
+def current(root: str = SNAPSHOT_DIR) -> VectorSnapshot | None:
+    """
+    CURRENT 가 가리키는 스냅샷 (없으면 None). CURRENT 가 바뀌면 새 스냅샷을 열어 교체합니다 (stat 한 번이라 검색마다 호출 가능).
+    이전 스냅샷은 진행 중인 검색이 참조를 놓으면 매핑이 풀립니다.
+    """
+    global _current, _current_mtime
+    try:
+        mtime = os.stat(_current_path(root)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if mtime != _current_mtime:
+        with _open_lock:
+            if mtime != _current_mtime:
+                with open(_current_path(root), encoding="utf-8") as f:
+                    version = f.read().strip()
+                started = time.perf_counter()
+                snap = VectorSnapshot(os.path.join(root, version))
+                _current, _current_mtime = snap, mtime
+                print(f"🗂️ Snapshot opened: v{version} {len(snap)} books ({snap.manifest['dtype']}, "
+                      f"{(time.perf_counter() - started) * 1000:.0f}ms)")
+    return _current
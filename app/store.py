@@ -0,0 +1,45 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+
+# books 컬렉션 버전 마커: 배치 작업이 upsert 후 갱신하고, MCP 서버는 이 값이 바뀌면 결과 캐시를 비웁니다.
+BOOKS_VERSION_FILE = os.path.join(CHROMA_DB_PATH, "books.version")
+
+
+def bump_books_version():
+    """books 컬렉션이 변경되었음을 기록합니다 (배치 작업에서 upsert 후 호출)."""
+    os.makedirs(CHROMA_DB_PATH, exist_ok=True)
+    # 배치 워커가 여럿이면 임시 파일을 따로 (다른 워커의 replace 에 임시 파일이 옮겨지지 않게)
+    tmp = f"{BOOKS_VERSION_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp, BOOKS_VERSION_FILE)
+
+
+def books_version() -> int:
+    """현재 books 컬렉션 버전 (stat 한 번이라 검색마다 호출해도 비용이 거의 없습니다)."""
+    try:
+        return os.stat(BOOKS_VERSION_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+_collection = None
+_collection_lock = threading.Lock()
+
+
+def get_collection():
+    """books 컬렉션 (첫 사용 시 PersistentClient 를 열고, 임베딩 모델은 실제 임베딩 시점에 로드)"""
+    global _collection
+    if _collection is None:
+        with _collection_lock:
+            if _collection is None:
+                import chromadb
+                from app.embeddings import embedding_function
+                client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+                _collection = client.get_or_create_collection(name="books", embedding_function=embedding_function)
+    return _collection
@@ -1,8 +1,9 @@
+import json
 import streamlit as st
 import requests
 from datetime import datetime, timedelta
 
-API_URL = "http://localhost:8000/chat"
+STREAM_API_URL = "http://localhost:8000/chat/stream"
 st.set_page_config(page_title="알라딘 AI 도서관", page_icon="📚", layout="wide")
 
 st.markdown("""
@@ -19,8 +20,9 @@ with st.sidebar:
     st.header("🔍 상세 필터")
     cat_opt = ["전체", "소설/시/희곡", "경제경영", "자기계발", "인문학", "과학", "컴퓨터/모바일"]
     sel_cat = st.selectbox("📂 카테고리", cat_opt)
+    # 0 은 '조건 없음' (건드리지 않은 슬라이더는 필터로 보내지 않아 평점 없는 책도 검색됩니다)
     max_price = st.slider("💰 최대 가격", 0, 100000, 0, 5000)
-    min_rating = st.slider("⭐ 최소 평점", 0.0, 10.0, 8.0, 0.5)
+    min_rating = st.slider("⭐ 최소 평점", 0.0, 10.0, 0.0, 0.5)
 
     pub_opt = st.selectbox("📅 출간 기간", ["전체 기간", "최근 3개월", "최근 6개월", "최근 1년", "최근 3년"])
     min_pub_date = None
@@ -28,34 +30,81 @@ with st.sidebar:
         days = {"최근 3개월": 90, "최근 6개월": 180, "최근 1년": 365, "최근 3년": 365 * 3}
         min_pub_date = (datetime.now() - timedelta(days=days.get(pub_opt))).strftime("%Y-%m-%d")
 
+    if st.button("🔍 이 조건으로 찾기"):
+        st.session_state.search_by_filters = True
+
     if st.button("🗑️ 초기화"):
         st.session_state.messages = []
         st.rerun()
 
 
 # --- 전송 로직 ---
-def send_query(txt):
+def current_filters() -> dict:
+    """사이드바 필터 → QueryRequest.filters (조건 없음은 보내지 않음)"""
+    filters = {}
+    if sel_cat != "전체": filters["category_name"] = sel_cat
+    if max_price > 0: filters["max_price"] = max_price
+    if min_rating > 0: filters["min_rating"] = min_rating
+    if min_pub_date: filters["min_pub_date"] = min_pub_date
+    return filters
+
+
+def send_query(txt, intent=None, query=None):
+    """txt 는 대화에 보일 문구, query 는 API 에 보낼 질문 (없으면 txt). intent="browse" 면 LLM 없이 바로 검색합니다."""
     st.session_state.messages.append({"role": "user", "content": txt})
 
-    # 필터 주입 (Stealth Context)
-    filters = []
-    if sel_cat != "전체": filters.append(f"category_name='{sel_cat}'")
-    if max_price > 0: filters.append(f"max_price={max_price}")
-    if min_rating > 0: filters.append(f"min_rating={min_rating}")
-    if min_pub_date: filters.append(f"min_pub_date='{min_pub_date}'")
-
-    final_query = f"{txt} (System Context: Filters -> {', '.join(filters)})" if filters else txt
+    # 필터는 질문 문장에 섞지 않고 구조화된 값으로 보냅니다
+    # 답변은 대화 목록을 그린 뒤 스트리밍으로 받아옵니다 (stream_reply)
+    st.session_state.pending = {
+        "query": txt if query is None else query, "history": st.session_state.messages[:-1],
+        "filters": current_filters(), "intent": intent,
+    }
+    st.rerun()
 
-    payload = {"query": final_query, "history": st.session_state.messages[:-1]}
 
-    with st.spinner("AI가 책을 찾는 중..."):
+def stream_reply(payload):
+    """/chat/stream SSE 를 읽어 진행 상태와 답변 토큰을 도착하는 대로 화면에 그립니다."""
+    done = {}
+
+    def render(res, status, placeholder) -> str:
+        text = ""
+        for line in res.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "): continue
+            event = json.loads(line[len("data: "):])
+            if event["type"] == "status":
+                status.update(label=event["message"])
+                status.write(event["message"])
+            elif event["type"] == "token":
+                text += event["content"]
+                placeholder.markdown(text + "▌")
+            elif event["type"] == "reset":  # 답변인 줄 알았던 말 뒤에 도구 호출이 옴 → 지우고 다시
+                text = ""
+                placeholder.empty()
+            elif event["type"] == "done":
+                done.update(event)
+        placeholder.markdown(text)
+        return text
+
+    with st.chat_message("assistant"):
+        status = st.status("AI가 질문을 이해하는 중...", expanded=False)
         try:
-            res = requests.post(API_URL, json=payload)
-            bot_reply = res.json().get("response", "오류") if res.status_code == 200 else f"Error {res.status_code}"
+            with requests.post(STREAM_API_URL, json=payload, stream=True, timeout=(5, 120)) as res:
+                if res.status_code == 200:
+                    res.encoding = "utf-8"
+                    bot_reply = render(res, status, st.empty())
+                else:
+                    bot_reply = f"Error {res.status_code}"
+                    st.markdown(bot_reply)
         except Exception as e:
             bot_reply = f"연결 실패: {e}"
-
-    st.session_state.messages.append({"role": "assistant", "content": bot_reply})
+            st.markdown(bot_reply)
+        status.update(label="완료", state="complete")
+
+    msg = {"role": "assistant", "content": bot_reply}
+    if done.get("ttft_ms") is not None:
+        msg["latency"] = f"⚡ 첫 토큰 {done['ttft_ms'] / 1000:.2f}s · 전체 {done['total_ms'] / 1000:.2f}s"
+    st.session_state.messages.append(msg)
+    st.session_state.pending = None
     st.rerun()
 
 
@@ -67,9 +116,16 @@ st.caption("Hybrid RAG: 벡터 검색 + 실시간 가격/재고 확인")
 cols = st.columns(4)
 keywords = ["🏆 베스트셀러", "🆕 최신 IT 트렌드", "💎 숨겨진 명작", "☕️ 자바 입문서"]
 for i, kw in enumerate(keywords):
-    if cols[i].button(kw): send_query(f"{kw} 추천해줘")
+    if cols[i].button(kw): send_query(f"{kw} 추천해줘", intent="browse")
+
+if st.session_state.pop("search_by_filters", False):
+    send_query("🔍 필터 조건으로 찾아줘", intent="browse", query="")
 
 for msg in st.session_state.messages:
-    with st.chat_message(msg["role"]): st.markdown(msg["content"])
+    with st.chat_message(msg["role"]):
+        st.markdown(msg["content"])
+        if msg.get("latency"): st.caption(msg["latency"])
+
+if st.session_state.get("pending"): stream_reply(st.session_state.pending)
 
 if prompt := st.chat_input("질문하세요..."): send_query(prompt)
\ No newline at end of file
@@ -0,0 +1,20 @@
+import time
+import socket
+import threading
+import uvicorn
+
+
+def free_port() -> int:
+    """비어 있는 로컬 포트를 하나 고릅니다."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app, port: int) -> uvicorn.Server:
+    """가짜 서버(FastAPI 앱)를 백그라운드 스레드에서 띄우고 준비될 때까지 기다립니다."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
@@ -0,0 +1,58 @@
+"""
+run_ai_agent 동시성 벤치마크.
+
+가짜 OpenAI 호환 서버(bench/fake_openai.py)를 띄우고, 동시 요청 수를 늘려가며
+처리량(req/s)을 측정합니다. 이벤트 루프가 LLM 호출에 막히지 않는다면
+처리량은 동시 요청 수에 비례해 증가해야 합니다.
+
+    python -m bench.bench_agent_concurrency
+"""
+import os
+import time
+import asyncio
+import mcp.types as types
+from bench._server import free_port, serve_in_thread
+
+LEVELS = [1, 2, 4, 8, 16, 32]
+REQUESTS_PER_LEVEL = int(os.getenv("BENCH_REQUESTS", "64"))
+
+
+class NoToolSession:
+    """도구가 없는 MCP 세션 대역 (LLM 구간만 측정)."""
+
+    async def list_tools(self):
+        return types.ListToolsResult(tools=[])
+
+
+async def _run_level(agent, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+    session = NoToolSession()
+
+    async def one():
+        async with sem:
+            await agent.run_ai_agent("벤치마크 질문", [], session)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(REQUESTS_PER_LEVEL)))
+    return REQUESTS_PER_LEVEL / (time.perf_counter() - start)
+
+
+async def main():
+    port = free_port()
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+
+    from bench.fake_openai import app as fake_app, FAKE_LLM_LATENCY_MS
+    import app.api.agent as agent
+
+    serve_in_thread(fake_app, port)
+    print(f"🧪 Fake LLM latency: {FAKE_LLM_LATENCY_MS:.0f}ms | requests/level: {REQUESTS_PER_LEVEL}")
+    print(f"{'concurrency':>12} | {'req/s':>8}")
+    for level in LEVELS:
+        rps = await _run_level(agent, level)
+        print(f"{level:>12} | {rps:>8.1f}")
+    await agent.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+긴 대화 리플레이: 턴이 쌓일수록 LLM 에 보내는 토큰이 얼마나 늘어나는지 비교.
+
+같은 대화(사용자 질문 + 책 5권 추천 답변)를 BENCH_TURNS 턴 동안 이어가며,
+대화 맥락 예산을 끈 경우(전체 history 전송)와 켠 경우(CONTEXT_TOKEN_BUDGET)의 턴별 전송 토큰(추정치)을 출력합니다.
+
+    python -m bench.bench_context_growth
+"""
+import os
+import asyncio
+import statistics
+from bench._server import free_port, serve_in_thread
+from bench.bench_agent_concurrency import NoToolSession
+from bench.synthetic import COMMON_QUERIES, make_books
+
+TURNS = int(os.getenv("BENCH_TURNS", "40"))
+UNBOUNDED = 10 ** 9
+
+
+def fake_answer(turn: int) -> str:
+    """답변 예시 포맷을 따른 추천 답변 (책 5권)"""
+    books = make_books(5, seed=turn)
+    lines = ["사용자님, 요청하신 조건에 맞는 책들을 찾아보았습니다.", ""]
+    for i, b in enumerate(books, start=1):
+        lines += [f"{i}. **{b['title']}** - {b['author']} ({b['priceSales']:,}원)",
+                  "   🔥 [베스트셀러]",
+                  f"   👉 **추천 이유:** {b['description']} 에 관심 있는 사용자님께 잘 맞는 책입니다.", ""]
+    lines.append("위 책들 중 더 자세한 목차나 리뷰가 궁금한 책이 있다면 말씀해 주세요!")
+    return "\n".join(lines)
+
+
+async def replay(agent, context, budget: int) -> list[int]:
+    context.CONTEXT_TOKEN_BUDGET = budget
+    session = NoToolSession()
+    history, sent = [], []
+    for turn in range(TURNS):
+        query = COMMON_QUERIES[turn % len(COMMON_QUERIES)]
+        timings = []
+        await agent.run_ai_agent(query, history, session, timings=timings)
+        sent.append(sum(t["prompt_tokens"] for t in timings))
+        history += [agent.ChatMessage(role="user", content=query),
+                    agent.ChatMessage(role="assistant", content=fake_answer(turn))]
+    return sent
+
+
+async def main():
+    port = free_port()
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+    os.environ.setdefault("FAKE_LLM_TOKEN_MS", "0")
+
+    from bench.fake_openai import app as fake_app
+    import app.api.agent as agent
+    import app.api.context as context
+
+    serve_in_thread(fake_app, port)
+    budget = context.CONTEXT_TOKEN_BUDGET
+    results = {"unbounded": await replay(agent, context, UNBOUNDED), f"budget={budget}": await replay(agent, context, budget)}
+    marks = sorted({0, 4, 9, 19, TURNS - 1} & set(range(TURNS)))
+    print("turn        | " + " | ".join(f"{m + 1:>6}" for m in marks) + " |   mean")
+    for name, sent in results.items():
+        print(f"{name:<11} | " + " | ".join(f"{sent[m]:>6}" for m in marks) + f" | {statistics.mean(sent):>6.0f}")
+    await agent.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,298 @@
+"""
+엔드투엔드 벤치마크 / 부하 테스트 (Groq·알라딘 없이 오프라인으로 재현 가능).
+
+로컬 대역:
+- LLM: bench/fake_openai.py (FAKE_LLM_SCRIPT 대로 search_books → get_details 도구 호출 후 답변)
+- 알라딘: bench/fake_aladin.py (ItemList/ItemLookUp/ItemSearch, 지연·오류 주입)
+- 임베딩: BENCH_EMBEDDER=hash 면 bench/fake_embeddings.py 의 HashEncoder (model 이면 실제 모델)
+- 도서 컬렉션: BENCH_SIZES 크기별로 BENCH_DATA_DIR 에 한 번 시드해 두고 재사용
+
+시나리오 (크기마다 새 프로세스에서 실행하므로 모듈 설정/캐시/RSS 가 서로 섞이지 않습니다):
+- chat : API(/chat) → MCP 세션 풀 → MCP 서버 → Chroma/상세 저장소/가짜 알라딘, LLM 은 가짜 서버
+- tools: MCP 도구(search_books 맥락/키워드, get_details)를 SSE 세션으로 직접 호출
+- batch: run_continuous_batch 를 가짜 알라딘 대상으로 실행 (빈 컬렉션에 전체 수집, 크기와 무관하게 한 번)
+
+결과는 시나리오별 처리량, 지연 백분위(ms), 최대 RSS(MB) 를 담은 JSON 입니다 (BENCH_OUT 이 있으면 파일로도 저장).
+서버들이 같은 프로세스의 스레드에서 돌기 때문에 RSS 는 가짜 서버를 포함한 전체 스택 기준입니다.
+
+    python -m bench.bench_e2e                 # 모든 시나리오
+    python -m bench.bench_e2e chat tools      # 일부만
+    BENCH_SIZES=10000,100000,1000000 BENCH_OUT=bench_e2e.json python -m bench.bench_e2e tools
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import asyncio
+import tempfile
+import resource
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("chat", "tools", "batch")
+BENCH_SIZES = [int(s) for s in os.getenv("BENCH_SIZES", "10000").split(",") if s.strip()]
+BENCH_REQUESTS = int(os.getenv("BENCH_REQUESTS", "200"))
+BENCH_CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "16"))
+BENCH_WARMUP = int(os.getenv("BENCH_WARMUP", "5"))  # 측정 전 요청 수 (로컬 인덱스 빌드/모델 로드를 측정에서 제외)
+BENCH_EMBEDDER = os.getenv("BENCH_EMBEDDER", "hash")  # hash: HashEncoder / model: EMBEDDING_MODEL
+BENCH_DATA_DIR = os.path.abspath(os.getenv("BENCH_DATA_DIR", os.path.join(PROJECT_ROOT, ".bench_data")))
+BENCH_OUT = os.getenv("BENCH_OUT")
+BENCH_SEED = int(os.getenv("BENCH_SEED", "7"))
+BENCH_MCP_SESSIONS = int(os.getenv("BENCH_MCP_SESSIONS", "4"))  # tools 시나리오에서 쓸 SSE 세션 수
+BENCH_BATCH_RATE = os.getenv("BENCH_BATCH_RATE", "50")  # batch 시나리오의 알라딘 초당 호출 상한
+
+
+def dataset_path(size: int) -> str:
+    return os.path.join(BENCH_DATA_DIR, f"books-{size}-{BENCH_EMBEDDER}")
+
+
+def percentiles(samples: list[float]) -> dict:
+    """초 단위 샘플 → ms 단위 p50/p90/p95/p99/max/mean (nearest-rank)"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))] * 1000
+
+    return {"p50": round(at(50), 2), "p90": round(at(90), 2), "p95": round(at(95), 2), "p99": round(at(99), 2),
+            "max": round(ordered[-1] * 1000, 2), "mean": round(sum(ordered) / len(ordered) * 1000, 2)}
+
+
+def rss_mb() -> dict:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        current = None
+    if current is None:
+        return {"peak": round(peak, 1), "current": None}
+    return {"peak": round(max(peak, current), 1), "current": round(current, 1)}
+
+
+async def run_load(op, items: list, concurrency: int) -> dict:
+    """items 를 동시 concurrency 개씩 op(item) 으로 처리하고 처리량/지연 분포를 냅니다."""
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], {}
+
+    async def one(item):
+        async with sem:
+            started = time.perf_counter()
+            try:
+                await op(item)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(item) for item in items))
+    elapsed = time.perf_counter() - started
+    return {"requests": len(items), "ok": len(latencies), "errors": errors, "elapsed_s": round(elapsed, 2),
+            "throughput_rps": round(len(latencies) / elapsed, 2), "latency_ms": percentiles(latencies)}
+
+
+# ---------------------------------------------------------------------------
+# 자식 프로세스: 환경 변수를 정한 뒤에야 app 모듈을 import 합니다 (모듈 상수가 import 시점에 읽히므로).
+# ---------------------------------------------------------------------------
+def start_fakes() -> dict:
+    from bench._server import free_port, serve_in_thread
+    llm_port, aladin_port = free_port(), free_port()
+    os.environ.update({
+        "GROQ_API_KEY": "bench", "GROQ_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "ALADIN_API_KEY": "bench", "ALADIN_BASE_URL": f"http://127.0.0.1:{aladin_port}",
+        "EMBEDDING_WARMUP": "0",
+    })
+    os.environ.setdefault("VECTOR_BACKEND", "chroma")  # 스냅샷 경로는 VECTOR_BACKEND=snapshot 으로 (bench_snapshot 이 내보낸 것)
+    os.environ.setdefault("FAKE_LLM_SCRIPT", "search_books,get_details")
+    from bench import fake_openai, fake_aladin
+    serve_in_thread(fake_openai.app, llm_port)
+    serve_in_thread(fake_aladin.app, aladin_port)
+    if BENCH_EMBEDDER == "hash":
+        from bench import fake_embeddings
+        fake_embeddings.install()
+    return {"llm_script": fake_openai.FAKE_LLM_SCRIPT, "aladin_latency_ms": fake_aladin.FAKE_ALADIN_LATENCY_MS,
+            "aladin_error_rate": fake_aladin.FAKE_ALADIN_ERROR_RATE, "llm_latency_ms": fake_openai.FAKE_LLM_LATENCY_MS}
+
+
+def start_mcp_server() -> str:
+    from bench._server import free_port, serve_in_thread
+    from app.mcp_server.server import app as mcp_app
+    port = free_port()
+    serve_in_thread(mcp_app, port)
+    return f"http://127.0.0.1:{port}/sse"
+
+
+async def scenario_chat(size: int) -> dict:
+    import httpx
+    from bench._server import free_port, serve_in_thread
+    from bench.synthetic import query_log
+    os.environ["MCP_SERVER_URL"] = start_mcp_server()
+    from app.api.main import app as api_app
+    port = free_port()
+    serve_in_thread(api_app, port)
+
+    queries = query_log(BENCH_REQUESTS, seed=BENCH_SEED)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as http:
+        async def ask(query):
+            res = await http.post("/chat", json={"query": query, "history": []})
+            res.raise_for_status()
+
+        warm_started = time.perf_counter()
+        for q in queries[:BENCH_WARMUP]:
+            await ask(q)
+        warmup = time.perf_counter() - warm_started
+        result = await run_load(ask, queries, BENCH_CONCURRENCY)
+    return {**result, "warmup_s": round(warmup, 2)}
+
+
+async def scenario_tools(size: int) -> dict:
+    from mcp.client.sse import sse_client
+    from mcp.client.session import ClientSession
+    from contextlib import AsyncExitStack
+    from bench.synthetic import query_log, WORDS
+    from bench.fake_openai import FILTER_SAMPLES, FAKE_LLM_FILTER_RATE
+    url = start_mcp_server()
+
+    # 호출 구성: 맥락 검색 60% (그중 일부는 필터), 키워드 검색 25%, 상세 조회 15%
+    rng = random.Random(BENCH_SEED)
+    calls = []
+    for q in query_log(BENCH_REQUESTS, seed=BENCH_SEED):
+        roll = rng.random()
+        if roll < 0.6:
+            args = {"query": q, "search_type": "context"}
+            h = zlib.crc32(q.encode())  # 가짜 LLM 과 같은 규칙으로 필터를 붙임
+            if (h % 1000) / 1000 < FAKE_LLM_FILTER_RATE:
+                args["filters"] = FILTER_SAMPLES[h % len(FILTER_SAMPLES)]
+            calls.append(("search_books", args))
+        elif roll < 0.85:
+            calls.append(("search_books", {"query": " ".join(rng.sample(WORDS, 2)), "search_type": "keyword"}))
+        else:
+            calls.append(("get_details", {"isbns": [f"979{rng.randrange(size):010d}" for _ in range(3)]}))
+
+    by_tool: dict = {}
+    async with AsyncExitStack() as stack:
+        sessions = []
+        for _ in range(BENCH_MCP_SESSIONS):
+            streams = await stack.enter_async_context(sse_client(url))
+            session = await stack.enter_async_context(ClientSession(*streams))
+            await session.initialize()
+            sessions.append(session)
+        counter = iter(range(len(calls) * 2))
+
+        async def call(item):
+            name, args = item
+            started = time.perf_counter()
+            result = await sessions[next(counter) % len(sessions)].call_tool(name, args)
+            if result.isError:
+                raise RuntimeError(result.content[0].text if result.content else name)
+            key = f"{name}:{args.get('search_type', '')}".rstrip(":")
+            by_tool.setdefault(key, []).append(time.perf_counter() - started)
+
+        warm_started = time.perf_counter()
+        for item in calls[:BENCH_WARMUP]:
+            await call(item)
+        warmup = time.perf_counter() - warm_started
+        by_tool.clear()
+        result = await run_load(call, calls, BENCH_CONCURRENCY)
+    return {**result, "warmup_s": round(warmup, 2),
+            "by_tool": {k: {"count": len(v), "latency_ms": percentiles(v)} for k, v in by_tool.items()}}
+
+
+def scenario_batch(size: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_batch_")
+    os.environ.update({"CHROMA_DB_PATH": workdir, "BATCH_STATE_PATH": os.path.join(workdir, "batch_state.json"),
+                       "BATCH_RATE_PER_SEC": BENCH_BATCH_RATE, "BATCH_RATE_BURST": BENCH_BATCH_RATE})
+    os.environ.setdefault("BATCH_MODE", "full")
+    from app import metrics
+    import app.batch_job_continuous as batch
+
+    metrics.start_trace()
+    stats, counts, by_type, written, elapsed = batch.run_continuous_batch()
+    pages = [seconds for stage, seconds in metrics.trace_spans() if stage == "aladin.ItemList"]
+    books = stats["write"].books
+    return {"mode": batch.BATCH_MODE, "query_types": batch.BATCH_QUERY_TYPES, "books": books,
+            "embedded": counts["embedded"], "elapsed_s": round(elapsed, 2),
+            "throughput_books_per_s": round(books / elapsed, 2), "pages": len(pages),
+            "page_latency_ms": percentiles(pages),
+            "stages": {name: {"books": s.books, "busy_s": round(s.busy, 2)} for name, s in stats.items()}}
+
+
+def run_child(scenario: str, size: int):
+    info = start_fakes()
+    if scenario != "batch":
+        os.environ["CHROMA_DB_PATH"] = dataset_path(size)
+    if scenario == "batch":
+        result = scenario_batch(size)
+    else:
+        result = asyncio.run({"chat": scenario_chat, "tools": scenario_tools}[scenario](size))
+    from bench import fake_aladin
+    report = {"scenario": scenario, "size": size if scenario != "batch" else 0, "embedder": BENCH_EMBEDDER,
+              "concurrency": BENCH_CONCURRENCY, **result, "rss_mb": rss_mb(), "fakes": info,
+              "aladin_calls": fake_aladin.calls}
+    print(json.dumps(report, ensure_ascii=False))  # 부모 프로세스가 마지막 줄을 읽습니다
+    sys.stdout.flush()
+    os._exit(0)  # 서버 스레드를 정리하지 않고 바로 종료 (측정은 끝났음)
+
+
+# ---------------------------------------------------------------------------
+# 부모 프로세스: 크기별 데이터셋 준비 → 시나리오마다 자식 프로세스 실행 → JSON 취합
+# ---------------------------------------------------------------------------
+def seed(size: int):
+    from bench.synthetic import seed_dataset
+    encode = None
+    if BENCH_EMBEDDER == "hash":
+        from bench.fake_embeddings import HashEncoder
+        encode = HashEncoder().encode
+    else:
+        from app import embeddings
+        encode = embeddings.encode
+    print(f"🌱 Seeding {size} books → {dataset_path(size)}", file=sys.stderr)
+    info = seed_dataset(dataset_path(size), size, encode)
+    print(f"   ✅ {info}", file=sys.stderr)
+
+
+def run_scenario(scenario: str, size: int) -> dict:
+    print(f"🧪 {scenario} (size={size}, concurrency={BENCH_CONCURRENCY}, requests={BENCH_REQUESTS})",
+          file=sys.stderr)
+    out = subprocess.run([sys.executable, "-m", "bench.bench_e2e", "--child", scenario, str(size)],
+                         cwd=PROJECT_ROOT, capture_output=True, text=True)
+    try:
+        return json.loads(out.stdout.strip().splitlines()[-1])
+    except (IndexError, json.JSONDecodeError):
+        tail = (out.stderr or out.stdout).strip().splitlines()[-5:]
+        return {"scenario": scenario, "size": size, "failed": True, "error": "\n".join(tail)}
+
+
+def main():
+    scenarios = [s for s in sys.argv[1:] if s in SCENARIOS] or list(SCENARIOS)
+    results = []
+    for size in BENCH_SIZES:
+        if {"chat", "tools"} & set(scenarios):
+            seed(size)
+        for scenario in scenarios:
+            if scenario == "batch" and size != BENCH_SIZES[0]:
+                continue  # 빈 컬렉션에서 시작하므로 크기별로 반복할 필요가 없음
+            r = run_scenario(scenario, size)
+            results.append(r)
+            summary = r.get("latency_ms") or r.get("page_latency_ms") or {}
+            print(f"   {'❌ ' + r['error'] if r.get('failed') else '✅'} "
+                  f"throughput={r.get('throughput_rps', r.get('throughput_books_per_s'))} "
+                  f"p50={summary.get('p50')}ms p99={summary.get('p99')}ms rss={r.get('rss_mb', {}).get('peak')}MB",
+                  file=sys.stderr)
+    report = {"requests": BENCH_REQUESTS, "concurrency": BENCH_CONCURRENCY, "embedder": BENCH_EMBEDDER,
+              "sizes": BENCH_SIZES, "results": results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if BENCH_OUT:
+        with open(BENCH_OUT, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
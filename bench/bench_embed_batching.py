@@ -0,0 +1,63 @@
+"""
+마이크로 배칭 임베딩 부하 테스트.
+
+합성 컬렉션에 대해 search_books_by_context 를 동시 요청 수별로 호출하여
+배칭 없음(max_batch=1) vs 마이크로 배칭의 처리량(queries/sec)을 비교합니다.
+결과 캐시 효과를 배제하기 위해 모든 질의는 서로 다릅니다.
+
+    python -m bench.bench_embed_batching
+"""
+import os
+import time
+import asyncio
+import tempfile
+
+N_BOOKS = int(os.getenv("BENCH_BOOKS", "2000"))
+N_QUERIES = int(os.getenv("BENCH_QUERIES", "256"))
+LEVELS = [1, 8, 32, 64]
+
+
+async def _run(tools, queries: list[str], concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(q):
+        async with sem:
+            await tools.search_books_by_context(q)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    return len(queries) / (time.perf_counter() - start)
+
+
+async def main():
+    os.environ["CHROMA_DB_PATH"] = tempfile.mkdtemp(prefix="bench_chroma_")
+    # 실시간 병합 구간은 측정에서 제외 (연결 거부 + 짧은 예산)
+    os.environ.setdefault("ALADIN_BASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("ALADIN_MAX_RETRIES", "0")
+    os.environ.setdefault("REALTIME_BUDGET", "0.01")
+
+    from bench.synthetic import make_books, query_log, seed_collection
+    from app import embeddings
+    from app.store import get_collection
+    import app.mcp_server.tools as tools
+
+    seed_collection(get_collection(), make_books(N_BOOKS))
+    embeddings.warm_up(background=False)
+    print(f"🧪 books={N_BOOKS} queries/level={N_QUERIES} cpus={os.cpu_count()}")
+    print(f"{'mode':>10} | " + " | ".join(f"c={c:<4}" for c in LEVELS) + "  (queries/sec)")
+
+    for label, max_batch in (("batch=1", 1), ("micro", embeddings.EMBEDDING_MAX_BATCH)):
+        row = []
+        for i, level in enumerate(LEVELS):
+            tools.embedding_cache.clear()
+            tools.result_cache.clear()
+            embeddings._batcher = embeddings.EmbeddingBatcher(max_batch=max_batch)
+            embeddings._batcher_loop = asyncio.get_running_loop()
+            queries = query_log(N_QUERIES, seed=100 * i + max_batch, unique_ratio=1.0)
+            row.append(await _run(tools, queries, level))
+        print(f"{label:>10} | " + " | ".join(f"{qps:>6.1f}" for qps in row)
+              + f"  avg_batch={embeddings._batcher.stats()['avg_batch']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""
+UI 키워드 칩 / 필터 검색: 에이전트(LLM 도구 선택 → 검색 → 답변) vs LLM 우회 경로(바로 검색 → 템플릿) 지연 비교.
+
+가짜 LLM(도구 선택 1회 + 답변 1회)과 가짜 알라딘, 합성 컬렉션으로 API(/chat)를 띄우고
+같은 요청을 intent="chat"(항상 에이전트)과 intent="browse"(fast path)로 보내 전체 지연과 LLM 호출 수를 비교합니다.
+
+    python -m bench.bench_fast_path
+"""
+import os
+import asyncio
+import statistics
+
+BENCH_REPEATS = int(os.getenv("BENCH_REPEATS", "5"))
+
+
+async def run(api_url: str, requests: list[dict]) -> dict:
+    import httpx
+    from bench.bench_e2e import percentiles
+    results = {}
+    async with httpx.AsyncClient(base_url=api_url, timeout=120) as http:
+        for intent in ("chat", "browse"):
+            latencies, llm_calls = [], []
+            for body in requests * BENCH_REPEATS:
+                res = await http.post("/chat", json={**body, "intent": intent})
+                res.raise_for_status()
+                data = res.json()
+                latencies.append(sum(t["llm_ms"] + t["tools_ms"] for t in data["timings"]) / 1000)
+                llm_calls.append(sum(1 for t in data["timings"] if t["round"] > 0 or t["prompt_tokens"]))
+            results[intent] = {"latency_ms": percentiles(latencies), "llm_calls": statistics.mean(llm_calls)}
+    return results
+
+
+def main():
+    os.environ["FAKE_LLM_SCRIPT"] = "search_books"
+    os.environ.setdefault("FAKE_LLM_FILTER_RATE", "0")
+    from bench.bench_e2e import BENCH_SIZES, start_fakes, start_mcp_server, seed, dataset_path
+    from bench._server import free_port, serve_in_thread
+
+    size = BENCH_SIZES[0]
+    os.environ["CHROMA_DB_PATH"] = dataset_path(size)  # app 모듈이 import 되기 전에
+    seed(size)
+    start_fakes()
+    os.environ["MCP_SERVER_URL"] = start_mcp_server()
+    from app.api.main import app as api_app
+    from app.api.fast_path import CHIP_PRESETS
+    port = free_port()
+    serve_in_thread(api_app, port)
+
+    requests = [{"query": f"{chip} 추천해줘"} for chip in CHIP_PRESETS] + \
+               [{"query": "", "filters": {"category_name": "경제경영", "max_price": 20000}}]
+    results = asyncio.run(run(f"http://127.0.0.1:{port}", requests))
+
+    print(f"🧪 books={size} requests={len(requests) * BENCH_REPEATS}/mode")
+    print(f"{'mode':>7} | {'llm calls':>9} | {'p50 ms':>7} | {'p90 ms':>7}")
+    for intent, r in results.items():
+        name = "agent" if intent == "chat" else "fast"
+        print(f"{name:>7} | {r['llm_calls']:>9.1f} | {r['latency_ms']['p50']:>7.0f} | {r['latency_ms']['p90']:>7.0f}")
+    print(f"💡 fast path p50 = {results['browse']['latency_ms']['p50'] / results['chat']['latency_ms']['p50'] * 100:.0f}% "
+          f"of agent")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+맥락 검색 캐시(쿼리 임베딩 + 검색 결과) 벤치마크.
+
+합성 도서로 임시 Chroma 컬렉션을 만들고, 반복이 많은 질의 로그를
+1) 캐시 없이 (collection.query(query_texts=...))
+2) 캐시 경로 (tools._query_books)
+로 리플레이하여 CPU 시간과 벽시계 시간을 비교합니다.
+
+    python -m bench.bench_query_cache
+"""
+import os
+import time
+import asyncio
+import tempfile
+
+N_BOOKS = int(os.getenv("BENCH_BOOKS", "2000"))
+N_QUERIES = int(os.getenv("BENCH_QUERIES", "500"))
+
+
+def _measure(fn) -> tuple[float, float]:
+    cpu, wall = time.process_time(), time.perf_counter()
+    fn()
+    return time.process_time() - cpu, time.perf_counter() - wall
+
+
+def main():
+    os.environ["CHROMA_DB_PATH"] = tempfile.mkdtemp(prefix="bench_chroma_")
+    from bench.synthetic import make_books, query_log, seed_collection
+    import app.mcp_server.tools as tools
+    from app.store import get_collection
+
+    seed_collection(get_collection(), make_books(N_BOOKS))
+    log = query_log(N_QUERIES)
+    print(f"🧪 books={N_BOOKS} queries={N_QUERIES} unique={len(set(log))}")
+
+    def baseline():
+        for q in log:
+            get_collection().query(query_texts=[q], n_results=5)
+
+    def cached():
+        async def run():
+            for q in log:
+                await tools._query_books(q, None, 5)
+        asyncio.run(run())
+
+    cpu0, wall0 = _measure(baseline)
+    cpu1, wall1 = _measure(cached)
+    print(f"{'mode':>9} | {'cpu s':>7} | {'wall s':>7}")
+    print(f"{'no cache':>9} | {cpu0:>7.2f} | {wall0:>7.2f}")
+    print(f"{'cached':>9} | {cpu1:>7.2f} | {wall1:>7.2f}")
+    print(f"💡 CPU saved: {(1 - cpu1 / cpu0) * 100:.0f}% | "
+          f"embedding_cache={tools.embedding_cache.stats()} result_cache={tools.result_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+벡터 검색 경로 비교: Chroma vs 메모리 맵 스냅샷 (NumPy top-k + 메타데이터 마스크).
+
+합성 컬렉션을 스냅샷으로 내보낸 뒤
+- 검색 지연: 필터 없음 / 느슨한 필터(가격) / 까다로운 필터(분야 + 평점)마다 _vector_search 한 번의 지연 (결과 캐시 제외)
+- 워커 메모리: MCP 도구 모듈을 띄운 워커 BENCH_WORKERS 개가 동시에 검색한 뒤의 RSS / PSS / 전용(private) 메모리
+  (스냅샷 파일은 페이지 캐시를 공유하므로 워커가 늘어도 PSS 합계가 거의 늘지 않아야 합니다)
+를 측정합니다.
+
+    python -m bench.bench_snapshot
+    BENCH_SIZES=100000 SNAPSHOT_DTYPE=float16 python -m bench.bench_snapshot
+"""
+import os
+import sys
+import time
+import asyncio
+import subprocess
+
+BENCH_REPEATS = int(os.getenv("BENCH_REPEATS", "5"))
+BENCH_WORKERS = int(os.getenv("BENCH_WORKERS", "3"))
+BACKENDS = ("chroma", "snapshot")
+FILTERS = {
+    "none": None,
+    "loose": {"max_price": 20000},
+    "narrow": {"category_name": "마케팅/세일즈", "min_rating": 9},
+}
+
+WORKER = """
+import sys, json, asyncio
+from bench import fake_embeddings
+fake_embeddings.install()
+import app.mcp_server.tools as tools
+from bench.bench_snapshot import FILTERS
+from bench.synthetic import CHIP_QUERIES, COMMON_QUERIES
+
+async def main():
+    for query in CHIP_QUERIES + COMMON_QUERIES:
+        for filters in FILTERS.values():
+            await tools._hybrid_search(query, filters, 5)
+
+asyncio.run(main())
+print("ready", flush=True)
+sys.stdin.readline()
+"""
+
+
+def memory_kb(pid: int) -> dict:
+    """/proc/<pid>/smaps_rollup 의 Rss / Pss / 전용 메모리 (kB)"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if rest.strip().endswith("kB"):
+                values[key] = int(rest.split()[0])
+    return {"rss": values["Rss"], "pss": values["Pss"],
+            "private": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def measure_workers(backend: str, workers: int) -> dict:
+    """워커들을 동시에 띄워 검색을 마치게 한 뒤 (아직 살아 있을 때) 메모리를 잽니다."""
+    env = {**os.environ, "VECTOR_BACKEND": backend, "HYBRID_SEARCH": "1"}
+    procs = [subprocess.Popen([sys.executable, "-c", WORKER], env=env, stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+             for _ in range(workers)]
+    try:
+        for p in procs:
+            while (line := p.stdout.readline()) and line.strip() != "ready":  # 도구 로그는 건너뜀
+                pass
+            if not line:
+                raise RuntimeError(f"{backend} worker failed (exit={p.poll()})")
+        mem = [memory_kb(p.pid) for p in procs]
+    finally:
+        for p in procs:
+            p.communicate("\n")
+    return {k: sum(m[k] for m in mem) / 1024 for k in ("rss", "pss", "private")}
+
+
+async def measure_latency(queries: list[str]) -> dict:
+    from bench.bench_e2e import percentiles
+    import app.mcp_server.tools as tools
+
+    results = {}
+    for backend in BACKENDS:
+        tools.VECTOR_BACKEND = backend
+        _, columns = await tools._get_local_index()
+        for query in queries:  # 질의 임베딩 캐시 예열 (임베딩 시간은 두 경로에 같으므로 빼고 잽니다)
+            await tools._embed_query(query)
+        for name, filters in FILTERS.items():
+            latencies = []
+            for query in queries * BENCH_REPEATS:
+                tools.result_cache.clear()
+                started = time.perf_counter()
+                await tools._vector_search(query, filters, 5, columns)
+                latencies.append(time.perf_counter() - started)
+            results[(backend, name)] = percentiles(latencies)
+    return results
+
+
+def main():
+    from bench.bench_e2e import BENCH_SIZES, seed, dataset_path
+    from bench.synthetic import CHIP_QUERIES, COMMON_QUERIES
+
+    size = BENCH_SIZES[0]
+    os.environ["CHROMA_DB_PATH"] = dataset_path(size)  # app 모듈이 import 되기 전에
+    os.environ["SNAPSHOT_DIR"] = os.path.join(dataset_path(size), f"snapshot-{os.getenv('SNAPSHOT_DTYPE', 'int8')}")
+    seed(size)
+    from bench import fake_embeddings
+    fake_embeddings.install()
+    from app import snapshot
+    from app.store import get_collection
+    if snapshot.current() is None or len(snapshot.current()) != size:
+        snapshot.export_snapshot(get_collection())
+    snap = snapshot.current()
+
+    latency = asyncio.run(measure_latency(CHIP_QUERIES + COMMON_QUERIES))
+    print(f"🧪 books={size} snapshot={snap.manifest['dtype']} ({snap.stats()['mapped_mb']}MB) "
+          f"queries={len(CHIP_QUERIES + COMMON_QUERIES) * BENCH_REPEATS}/filter")
+    print(f"{'backend':>9} | {'filter':>7} | {'p50 ms':>7} | {'p90 ms':>7} | {'p99 ms':>7}")
+    for (backend, name), p in latency.items():
+        print(f"{backend:>9} | {name:>7} | {p['p50']:>7.2f} | {p['p90']:>7.2f} | {p['p99']:>7.2f}")
+
+    print(f"\n👥 workers={BENCH_WORKERS} (합계)")
+    print(f"{'backend':>9} | {'RSS MB':>7} | {'PSS MB':>7} | {'private MB':>10}")
+    for backend in BACKENDS:
+        m = measure_workers(backend, BENCH_WORKERS)
+        print(f"{backend:>9} | {m['rss']:>7.0f} | {m['pss']:>7.0f} | {m['private']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+MCP 서버 콜드 스타트 / 메모리 측정.
+
+백엔드(torch, onnx, onnx-int8)마다 새 프로세스에서
+- server 모듈 import 시간 (지연 로딩 후: 모델 없이 바로 요청 수락 가능)
+- 모델 로드 + 첫 추론까지의 시간 (예전 방식: import 시점에 이만큼을 항상 기다림)
+- 최대 RSS
+를 측정합니다.
+
+    python -m bench.bench_startup
+"""
+import os
+import sys
+import json
+import subprocess
+
+BACKENDS = os.getenv("BENCH_BACKENDS", "torch,onnx,onnx-int8").split(",")
+
+PROBE = """
+import json, time, resource
+t0 = time.perf_counter()
+import app.mcp_server.server
+t1 = time.perf_counter()
+rss_import = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+from app import embeddings
+try:
+    embeddings.warm_up(background=False)
+except Exception:
+    pass
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "ready_s": t2 - t1, "rss_import_mb": rss_import,
+                  "rss_ready_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  "error": embeddings.status()["error"]}))
+"""
+
+
+def main():
+    print(f"{'backend':>10} | {'import s':>8} | {'ready s':>8} | {'eager s':>8} | {'RSS import':>10} | {'RSS ready':>9}")
+    for backend in BACKENDS:
+        env = {**os.environ, "EMBEDDING_BACKEND": backend, "EMBEDDING_WARMUP": "0"}
+        out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True)
+        try:
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+        except (IndexError, json.JSONDecodeError):
+            print(f"{backend:>10} | failed: {out.stderr.strip().splitlines()[-1:]}")
+            continue
+        if r["error"]:
+            print(f"{backend:>10} | model load failed: {r['error'][:80]}")
+            continue
+        print(f"{backend:>10} | {r['import_s']:>8.2f} | {r['ready_s']:>8.2f} | {r['import_s'] + r['ready_s']:>8.2f} | "
+              f"{r['rss_import_mb']:>8.0f}MB | {r['rss_ready_mb']:>7.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
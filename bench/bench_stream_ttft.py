@@ -0,0 +1,43 @@
+"""
+스트리밍 vs 비스트리밍 체감 지연 비교.
+
+가짜 OpenAI 호환 서버에 대해 stream_ai_agent 를 돌려 첫 토큰까지의 시간(TTFT)과
+전체 시간을 따로 측정합니다.
+
+    python -m bench.bench_stream_ttft
+"""
+import os
+import time
+import asyncio
+import statistics
+from bench._server import free_port, serve_in_thread
+from bench.bench_agent_concurrency import NoToolSession
+
+RUNS = int(os.getenv("BENCH_REQUESTS", "20"))
+
+
+async def main():
+    port = free_port()
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+
+    from bench.fake_openai import app as fake_app
+    import app.api.agent as agent
+
+    serve_in_thread(fake_app, port)
+    session = NoToolSession()
+    for stream in (False, True):
+        ttfts, totals = [], []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            async for event in agent.stream_ai_agent("벤치마크 질문", [], session, stream=stream):
+                if event["type"] == "token" and len(ttfts) < len(totals) + 1:
+                    ttfts.append((time.perf_counter() - start) * 1000)
+            totals.append((time.perf_counter() - start) * 1000)
+        print(f"{'stream' if stream else 'blocking':>9} | TTFT p50={statistics.median(ttfts):.0f}ms"
+              f" | total p50={statistics.median(totals):.0f}ms")
+    await agent.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+search_books 결과 형식별 LLM 프롬프트 토큰 / 완료 지연 비교 (text: 장식된 설명형, compact: 필드 헤더 표).
+
+벤치마크 질의(UI 칩 + 자주 쓰는 표현)마다 에이전트가 search_books 를 한 번 부르고 답변하도록
+가짜 LLM 을 스크립트하고, 도구 결과를 받은 두 번째 완료 요청의 프롬프트 토큰(추정치)과 지연을 형식별로 비교합니다.
+가짜 LLM 은 프롬프트 1k 토큰당 FAKE_LLM_PREFILL_MS 만큼 첫 토큰이 늦어집니다 (프롬프트 크기 → 지연 재현).
+
+    python -m bench.bench_tool_payload
+"""
+import os
+import asyncio
+import statistics
+
+BENCH_REPEATS = int(os.getenv("BENCH_REPEATS", "3"))
+FORMATS = ("text", "compact")
+
+
+async def replay(agent, session, tools, queries: list[str], fmt: str) -> dict:
+    agent.SEARCH_RESULT_FORMAT = fmt
+    tool_chars, prompt, llm_ms, total_ms = [], [], [], []
+    for query in queries:
+        timings = []
+        await agent.run_ai_agent(query, [], session, timings=timings, openai_tools=tools)
+        if len(timings) < 2:
+            continue
+        prompt.append(timings[1]["prompt_tokens"])
+        llm_ms.append(timings[1]["llm_ms"])
+        total_ms.append(sum(t["llm_ms"] + t["tools_ms"] for t in timings))
+        result = await session.call_tool("search_books", {"query": query, "format": fmt})
+        tool_chars.append(len(result.content[0].text))
+    return {"tool_chars": statistics.mean(tool_chars), "prompt_tokens": statistics.mean(prompt),
+            "llm_ms": statistics.median(llm_ms), "total_ms": statistics.median(total_ms)}
+
+
+async def run(queries: list[str]):
+    from mcp.client.sse import sse_client
+    from mcp.client.session import ClientSession
+    from bench.bench_e2e import start_mcp_server
+    from app.api.mcp_pool import to_openai_tools
+    import app.api.agent as agent
+
+    async with sse_client(start_mcp_server()) as streams:
+        async with ClientSession(*streams) as session:
+            await session.initialize()
+            tools = to_openai_tools((await session.list_tools()).tools)
+            await replay(agent, session, tools, queries[:len(queries) // BENCH_REPEATS], "text")  # 캐시/인덱스 예열
+            results = {fmt: await replay(agent, session, tools, queries, fmt) for fmt in FORMATS}
+    await agent.close_client()
+    return results
+
+
+def main():
+    os.environ["FAKE_LLM_SCRIPT"] = "search_books"
+    os.environ.setdefault("FAKE_LLM_PREFILL_MS", "100")
+    os.environ.setdefault("FAKE_LLM_FILTER_RATE", "0")
+    from bench.bench_e2e import BENCH_SIZES, start_fakes, seed, dataset_path
+    from bench.synthetic import CHIP_QUERIES, COMMON_QUERIES
+
+    size = BENCH_SIZES[0]
+    os.environ["CHROMA_DB_PATH"] = dataset_path(size)  # app 모듈이 import 되기 전에 (seed 가 app.store 를 import 함)
+    seed(size)
+    start_fakes()
+    queries = (CHIP_QUERIES + COMMON_QUERIES) * BENCH_REPEATS
+    results = asyncio.run(run(queries))
+
+    print(f"🧪 books={size} queries={len(queries)} prefill={os.environ['FAKE_LLM_PREFILL_MS']}ms/1k tok")
+    print(f"{'format':>8} | {'tool chars':>10} | {'prompt tok':>10} | {'llm ms (R2)':>11} | {'total ms':>8}")
+    for fmt, r in results.items():
+        print(f"{fmt:>8} | {r['tool_chars']:>10.0f} | {r['prompt_tokens']:>10.0f} | {r['llm_ms']:>11.0f} | "
+              f"{r['total_ms']:>8.0f}")
+    text, compact = results["text"], results["compact"]
+    print(f"💡 prompt tokens -{(1 - compact['prompt_tokens'] / text['prompt_tokens']) * 100:.0f}% | "
+          f"tool result chars -{(1 - compact['tool_chars'] / text['tool_chars']) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+import random
+import asyncio
+import uvicorn
+from functools import lru_cache
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from bench.synthetic import make_book, make_books
+
+# 가짜 알라딘 TTB API (ItemList / ItemLookUp / ItemSearch). ALADIN_BASE_URL 을 이 서버로 바꿔 씁니다.
+FAKE_ALADIN_BOOKS = int(os.getenv("FAKE_ALADIN_BOOKS", "5000"))  # 목록/검색 대상 카탈로그 크기
+FAKE_ALADIN_LIST_SIZE = int(os.getenv("FAKE_ALADIN_LIST_SIZE", "200"))  # 목록(분야 x 종류)마다 totalResults
+FAKE_ALADIN_LATENCY_MS = float(os.getenv("FAKE_ALADIN_LATENCY_MS", "50"))
+FAKE_ALADIN_JITTER_MS = float(os.getenv("FAKE_ALADIN_JITTER_MS", "20"))  # 지연에 더하는 균등 분포 지터
+FAKE_ALADIN_ERROR_RATE = float(os.getenv("FAKE_ALADIN_ERROR_RATE", "0"))  # 이 비율만큼 503 응답
+FAKE_ALADIN_TIMEOUT_RATE = float(os.getenv("FAKE_ALADIN_TIMEOUT_RATE", "0"))  # 이 비율만큼 FAKE_ALADIN_HANG_S 동안 응답 지연
+FAKE_ALADIN_HANG_S = float(os.getenv("FAKE_ALADIN_HANG_S", "30"))
+FAKE_ALADIN_SEED = int(os.getenv("FAKE_ALADIN_SEED", "7"))
+
+app = FastAPI(title="Fake Aladin TTB API")
+_rng = random.Random(FAKE_ALADIN_SEED)
+calls: dict = {}  # 엔드포인트 → {"ok": n, "error": n, "timeout": n}
+
+
+@lru_cache(maxsize=1)
+def catalog() -> list[dict]:
+    return make_books(FAKE_ALADIN_BOOKS)
+
+
+def book_by_isbn(isbn: str) -> dict | None:
+    """합성 ISBN(979 + 일련번호)이면 카탈로그 밖의 책도 만들어 줍니다 (시드된 100만 권 컬렉션 대응)."""
+    if not (len(isbn) == 13 and isbn.startswith("979") and isbn.isdigit()):
+        return None
+    i = int(isbn[3:])
+    if i < FAKE_ALADIN_BOOKS:
+        return catalog()[i]
+    return make_book(i, random.Random(i))
+
+
+@lru_cache(maxsize=1024)
+def _list_members(query_type: str, category_id: str) -> list[int]:
+    rng = random.Random(f"{query_type}:{category_id}")
+    size = min(FAKE_ALADIN_LIST_SIZE, FAKE_ALADIN_BOOKS)
+    members = rng.sample(range(FAKE_ALADIN_BOOKS), size)
+    if query_type == "Bestseller":
+        members.sort(key=lambda i: -catalog()[i]["salesPoint"])
+    return members
+
+
+async def _simulate(endpoint: str) -> JSONResponse | None:
+    """지연/오류 주입. 오류를 낼 차례면 응답을 돌려줍니다."""
+    stats = calls.setdefault(endpoint, {"ok": 0, "error": 0, "timeout": 0})
+    await asyncio.sleep((FAKE_ALADIN_LATENCY_MS + _rng.uniform(0, FAKE_ALADIN_JITTER_MS)) / 1000)
+    roll = _rng.random()
+    if roll < FAKE_ALADIN_TIMEOUT_RATE:
+        stats["timeout"] += 1
+        await asyncio.sleep(FAKE_ALADIN_HANG_S)
+    elif roll < FAKE_ALADIN_TIMEOUT_RATE + FAKE_ALADIN_ERROR_RATE:
+        stats["error"] += 1
+        return JSONResponse({"errorCode": 503, "errorMessage": "injected error"}, status_code=503)
+    stats["ok"] += 1
+    return None
+
+
+def _page(items: list, total: int, start: int, max_results: int) -> dict:
+    return {"version": "20131101", "totalResults": total, "startIndex": start, "itemsPerPage": max_results,
+            "item": items}
+
+
+@app.get("/ItemList.aspx")
+async def item_list(request: Request):
+    if error := await _simulate("ItemList"):
+        return error
+    p = request.query_params
+    max_results = min(int(p.get("MaxResults", 10)), 50)
+    start = max(int(p.get("start", 1)), 1)
+    members = _list_members(p.get("QueryType", "Bestseller"), p.get("CategoryId", "0"))
+    chunk = members[(start - 1) * max_results:start * max_results]
+    return _page([catalog()[i] for i in chunk], len(members), start, max_results)
+
+
+@app.get("/ItemLookUp.aspx")
+async def item_lookup(request: Request):
+    if error := await _simulate("ItemLookUp"):
+        return error
+    items = []
+    for isbn in request.query_params.get("ItemId", "").split(","):
+        book = book_by_isbn(isbn.strip())
+        if book:
+            items.append({**book, "subInfo": {
+                "toc": "<p>1장 시작하며<br>2장 본론<br>3장 마치며</p>",
+                "fullDescription": book["description"] * 3,
+                "usedList": {"aladinUsed": {"itemCount": book["salesPoint"] % 5, "minPrice": book["priceSales"] // 2}},
+            }})
+    return _page(items, len(items), 1, len(items))
+
+
+@app.get("/ItemSearch.aspx")
+async def item_search(request: Request):
+    if error := await _simulate("ItemSearch"):
+        return error
+    p = request.query_params
+    max_results = min(int(p.get("MaxResults", 10)), 50)
+    words = p.get("Query", "").lower().split()
+    hits = [b for b in catalog() if all(w in f"{b['title']} {b['author']}".lower() for w in words)]
+    return _page(hits[:max_results], len(hits), 1, max_results)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("FAKE_ALADIN_PORT", "8091")))
@@ -0,0 +1,39 @@
+import hashlib
+import numpy as np
+from app import embeddings
+from app.mcp_server.lexical import tokenize
+
+# 임베딩 모델 대역 (BENCH_EMBEDDER=hash). 모델 다운로드/추론 없이 오프라인으로 돌릴 수 있고,
+# 같은 단어를 공유하는 질의·문서가 가까워지므로 검색 결과도 그럴듯하게 나옵니다.
+DIM = 384  # paraphrase-multilingual-MiniLM-L12-v2 와 같은 차원 (실제 모델로 만든 컬렉션과 섞어 써도 오류가 나지 않도록)
+
+
+class HashEncoder:
+    """토큰 해싱 bag-of-words 인코더 (SentenceTransformer.encode 와 같은 호출 형태)"""
+
+    def __init__(self, dim: int = DIM):
+        self.dim = dim
+        self._slots: dict = {}  # 토큰 → (차원, 부호)
+
+    def _slot(self, token: str) -> tuple[int, float]:
+        slot = self._slots.get(token)
+        if slot is None:
+            h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            slot = self._slots[token] = (h % self.dim, 1.0 if h >> 63 else -1.0)
+        return slot
+
+    def encode(self, texts, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                col, sign = self._slot(token)
+                out[row, col] += sign
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+
+def install():
+    """app.embeddings 의 공유 모델을 HashEncoder 로 바꿉니다 (모델 로드 전에 호출)."""
+    embeddings._model = HashEncoder()
+    embeddings._load_seconds = 0.0
+    embeddings._ready.set()
@@ -0,0 +1,140 @@
+import os
+import re
+import time
+import uuid
+import json
+import asyncio
+import zlib
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from app.api.context import estimate_tokens, message_tokens
+
+# 가짜 OpenAI 호환 서버 (Groq 대역). 응답 지연과 스크립트된 도구 호출을 흉내 냅니다.
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))  # 첫 토큰까지의 지연
+FAKE_LLM_TOKEN_MS = float(os.getenv("FAKE_LLM_TOKEN_MS", "20"))  # 스트리밍 시 토큰 간 간격
+FAKE_LLM_PREFILL_MS = float(os.getenv("FAKE_LLM_PREFILL_MS", "0"))  # 프롬프트 1k 토큰당 추가 지연 (프롬프트 크기 영향 재현)
+FAKE_ANSWER = "요청하신 조건에 맞는 책을 찾아보았습니다. 1. **가짜 도서** - 테스트 저자 (10,000원)"
+# 라운드별로 부를 도구 (쉼표 구분, "이름[:검색 방식]"). 예) "search_books,get_details" → 검색 → 상세 조회 → 답변
+# 비어 있으면 도구 없이 바로 답변합니다.
+FAKE_LLM_SCRIPT = [s.strip() for s in os.getenv("FAKE_LLM_SCRIPT", "").split(",") if s.strip()]
+FAKE_LLM_FILTER_RATE = float(os.getenv("FAKE_LLM_FILTER_RATE", "0.3"))  # search_books 호출 중 filters 를 붙이는 비율
+# 도구 호출 앞에 흘려보낼 말 (일부 모델처럼 "검색해 볼게요" 를 먼저 쓰고 도구를 부르는 경우 재현, 비스트리밍은 content 로)
+FAKE_LLM_PREAMBLE = os.getenv("FAKE_LLM_PREAMBLE", "")
+FAKE_LLM_DETAIL_ISBNS = int(os.getenv("FAKE_LLM_DETAIL_ISBNS", "3"))  # get_details 에 넘길 ISBN 수
+FILTER_SAMPLES = [{"max_price": 20000}, {"min_rating": 8}, {"category_name": "경제경영"},
+                  {"min_pub_date": "2020-01-01", "max_price": 30000}]
+_ISBN = re.compile(r"\b97[89]\d{10}\b")
+
+app = FastAPI(title="Fake OpenAI-compatible LLM")
+
+
+def _next_tool_call(body: dict) -> dict | None:
+    """스크립트의 다음 도구 호출 (이번 질문에서 이미 끝낸 라운드 수로 차례를 정합니다). 차례가 끝났으면 None"""
+    messages = body.get("messages", [])
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+    done = sum(1 for m in messages[last_user + 1:] if m.get("role") == "assistant" and m.get("tool_calls"))
+    available = {t["function"]["name"] for t in body.get("tools") or []}
+    if done >= len(FAKE_LLM_SCRIPT):
+        return None
+    name, _, variant = FAKE_LLM_SCRIPT[done].partition(":")
+    if name not in available:
+        return None
+    query = messages[last_user]["content"] if last_user >= 0 else ""
+    if name == "search_books":
+        args = {"query": query, "search_type": variant or "context"}
+        # 같은 질의는 항상 같은 필터를 받도록 질의 해시로 정합니다 (캐시 효과를 재현 가능하게)
+        h = zlib.crc32(query.encode())
+        if (h % 1000) / 1000 < FAKE_LLM_FILTER_RATE:
+            args["filters"] = FILTER_SAMPLES[h % len(FILTER_SAMPLES)]
+    elif name == "get_details":
+        tool_text = " ".join(m.get("content") or "" for m in messages[last_user + 1:] if m.get("role") == "tool")
+        isbns = list(dict.fromkeys(_ISBN.findall(tool_text)))[:FAKE_LLM_DETAIL_ISBNS]
+        if not isbns:
+            return None
+        args = {"isbns": isbns}
+    else:
+        args = {}
+    return {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)}}
+
+
+def _usage(body: dict, completion: str) -> dict:
+    """토크나이저 없이 추정한 토큰 수 (에이전트의 llm_tokens_total 지표와 프롬프트 크기 비교용)"""
+    prompt = message_tokens(body.get("messages", [])) + estimate_tokens(json.dumps(body.get("tools") or [],
+                                                                                   ensure_ascii=False))
+    done = estimate_tokens(completion)
+    return {"prompt_tokens": prompt, "completion_tokens": done, "total_tokens": prompt + done}
+
+
+def _completion(content: str, model: str, tool_call: dict | None = None, usage: dict | None = None) -> dict:
+    message = {"role": "assistant", "content": FAKE_LLM_PREAMBLE or None, "tool_calls": [tool_call]} if tool_call else \
+        {"role": "assistant", "content": content}
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": "tool_calls" if tool_call else "stop",
+        }],
+        "usage": usage or {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def _chunk(delta: dict | None, model: str, finish_reason: str | None = None, usage: dict | None = None) -> str:
+    data = {
+        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+        "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage:
+        data["usage"] = usage
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _first_token_delay(usage: dict) -> float:
+    return (FAKE_LLM_LATENCY_MS + FAKE_LLM_PREFILL_MS * usage["prompt_tokens"] / 1000) / 1000
+
+
+async def _stream(content: str, model: str, tool_call: dict | None, usage: dict, include_usage: bool):
+    await asyncio.sleep(_first_token_delay(usage))
+    yield _chunk({"role": "assistant", "content": ""}, model)
+    if tool_call:
+        for word in FAKE_LLM_PREAMBLE.split():
+            yield _chunk({"content": word + " "}, model)
+            await asyncio.sleep(FAKE_LLM_TOKEN_MS / 1000)
+        # 실제 API 처럼 이름과 인자를 나눠 보냅니다 (에이전트가 index 기준으로 다시 합침)
+        fn = tool_call["function"]
+        yield _chunk({"tool_calls": [{"index": 0, "id": tool_call["id"], "type": "function",
+                                      "function": {"name": fn["name"], "arguments": ""}}]}, model)
+        yield _chunk({"tool_calls": [{"index": 0, "function": {"arguments": fn["arguments"]}}]}, model)
+        yield _chunk({}, model, "tool_calls")
+    else:
+        for word in content.split(" "):
+            yield _chunk({"content": word + " "}, model)
+            await asyncio.sleep(FAKE_LLM_TOKEN_MS / 1000)
+        yield _chunk({}, model, "stop")
+    if include_usage:  # 실제 API 처럼 stream_options.include_usage 를 요청했을 때만 마지막 usage 청크
+        yield _chunk(None, model, usage=usage)
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+    tool_call = _next_tool_call(body)  # 최종 답변만 요구할 때는 에이전트가 tools 를 빼고 보내므로 None
+    usage = _usage(body, json.dumps(tool_call, ensure_ascii=False) if tool_call else FAKE_ANSWER)
+    if body.get("stream"):
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(_stream(FAKE_ANSWER, model, tool_call, usage, include_usage),
+                                 media_type="text/event-stream")
+    words = 1 if tool_call else len(FAKE_ANSWER.split(" "))
+    await asyncio.sleep(_first_token_delay(usage) + FAKE_LLM_TOKEN_MS * words / 1000)
+    return _completion(FAKE_ANSWER, model, tool_call, usage)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("FAKE_LLM_PORT", "8090")))
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import random
+import itertools
+
+# 합성 도서 데이터 (알라딘 ItemList 응답의 item 형태). 벤치마크용 컬렉션/가짜 API 에서 공용으로 사용합니다.
+CATEGORIES = [
+    "국내도서>소설/시/희곡>한국소설", "국내도서>경제경영>마케팅/세일즈", "국내도서>자기계발>성공/처세",
+    "국내도서>인문학>철학 일반", "국내도서>과학>교양 과학", "국내도서>컴퓨터/모바일>프로그래밍 언어",
+]
+WORDS = [
+    "트렌드", "마케팅", "자바", "파이썬", "위로", "습관", "우주", "철학", "역사", "사랑", "불안", "경제",
+    "투자", "리더십", "데이터", "알고리즘", "여행", "마음", "성장", "미래", "과학", "소설", "인공지능", "글쓰기",
+]
+SURNAMES = ["김", "이", "박", "최", "정", "강", "조", "윤", "장", "임"]
+
+# 리플레이용 질의 로그: UI 키워드 칩 + 자주 쓰이는 표현이 대부분을 차지합니다.
+CHIP_QUERIES = ["🏆 베스트셀러 추천해줘", "🆕 최신 IT 트렌드 추천해줘", "💎 숨겨진 명작 추천해줘", "☕️ 자바 입문서 추천해줘"]
+COMMON_QUERIES = [
+    "요즘 마음이 허전해", "마케팅 초보자가 볼만한 책", "잠 안 올 때 읽기 좋은 책", "파이썬 입문서 추천",
+    "불안할 때 읽을 책", "경제 공부 시작하는 책", "우주에 관한 교양 과학책", "글쓰기 실력 늘리는 책",
+]
+
+
+def make_book(i: int, rng: random.Random) -> dict:
+    """i 번째 합성 도서 (ISBN 은 i 로부터 정해지므로 가짜 API 에서 ISBN → 도서를 역으로 만들 수 있습니다)"""
+    return {
+        "isbn13": f"979{i:010d}",
+        "title": " ".join(rng.sample(WORDS, 2)) + f" {i}",
+        "author": rng.choice(SURNAMES) + rng.choice(["민수", "서연", "지훈", "하은", "도윤"]),
+        "categoryName": rng.choice(CATEGORIES),
+        "description": " ".join(rng.choices(WORDS, k=20)),
+        "priceSales": rng.randrange(8000, 40000, 500),
+        "customerReviewRank": rng.randint(0, 10),
+        "salesPoint": int(rng.paretovariate(1.2) * 1000),
+        "pubDate": f"{rng.randint(2000, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "link": f"http://www.aladin.co.kr/shop/wproduct.aspx?ItemId={i}",
+    }
+
+
+def iter_books(n: int, seed: int = 42):
+    """make_books 와 같은 순서/내용을 하나씩 만듭니다 (100만 권 규모에서 전체를 메모리에 올리지 않기 위함)"""
+    rng = random.Random(seed)
+    for i in range(n):
+        yield make_book(i, rng)
+
+
+def make_books(n: int, seed: int = 42) -> list[dict]:
+    return list(iter_books(n, seed))
+
+
+def query_log(n: int, seed: int = 7, unique_ratio: float = 0.2) -> list[str]:
+    """반복이 많은 실제 트래픽을 흉내 낸 질의 로그 (unique_ratio 만큼은 한 번뿐인 질의)"""
+    rng = random.Random(seed)
+    popular = CHIP_QUERIES + COMMON_QUERIES
+    weights = [1 / (rank + 1) for rank in range(len(popular))]  # Zipf 분포
+    log = []
+    for i in range(n):
+        if rng.random() < unique_ratio:
+            log.append(" ".join(rng.sample(WORDS, 3)) + f" 관련 책 {i}")
+        else:
+            q = rng.choices(popular, weights)[0]
+            log.append(q if rng.random() < 0.7 else f"  {q.upper()} ")  # 공백/대소문자만 다른 표현
+    return log
+
+
+def seed_collection(collection, books: list[dict], batch: int = 500, encode=None):
+    """
+    합성 도서를 배치 작업과 같은 문서/메타데이터 형태로 컬렉션에 적재합니다.
+    encode(문서 목록) → 벡터 목록 을 주면 그 벡터로 저장하고, 없으면 컬렉션의 임베딩 함수를 씁니다.
+    """
+    for i in range(0, len(books), batch):
+        chunk = books[i:i + batch]
+        documents = [f"도서명: {b['title']}\n저자: {b['author']}\n장르: {b['categoryName']}\n설명: {b['description']}"
+                     for b in chunk]
+        collection.upsert(
+            ids=[b["isbn13"] for b in chunk],
+            documents=documents,
+            embeddings=encode(documents) if encode else None,
+            metadatas=[{"isbn": b["isbn13"], "title": b["title"], "author": b["author"],
+                        "category": b["categoryName"], "price": b["priceSales"], "link": b["link"],
+                        "rating": float(b["customerReviewRank"]), "pub_date": int(b["pubDate"].replace("-", ""))}
+                       for b in chunk],
+        )
+
+
+def seed_dataset(path: str, n: int, encode, batch: int = 2000) -> dict:
+    """
+    path 에 n 권짜리 books 컬렉션 + 상세 저장소를 만듭니다 (CHROMA_DB_PATH 로 그대로 쓸 수 있는 형태).
+    이미 같은 크기로 만들어 둔 디렉터리면 그대로 재사용합니다 (100만 권은 적재에만 수십 분이 걸림).
+    """
+    import chromadb
+    from app.details import DetailStore
+    from app.embeddings import embedding_function
+
+    marker = os.path.join(path, "seeded.json")
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("books") == n:
+            return info
+    started = time.perf_counter()
+    collection = chromadb.PersistentClient(path=path).get_or_create_collection(
+        name="books", embedding_function=embedding_function)
+    details = DetailStore(os.path.join(path, "details.sqlite3"))
+    done = 0
+    books = iter_books(n)
+    while chunk := list(itertools.islice(books, batch)):
+        seed_collection(collection, chunk, batch, encode)
+        details.put_many(chunk, full=False)
+        done += len(chunk)
+        if done % (batch * 25) == 0 or done == n:
+            print(f"   🌱 {done}/{n} ({done / (time.perf_counter() - started):.0f} books/sec)")
+    details.close()
+    info = {"books": collection.count(), "seed_seconds": round(time.perf_counter() - started, 1)}
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    return info